@@ -0,0 +1,123 @@
+"""
+Collects diagnosis requests from the agent workers into batched LLM calls.
+
+Each worker asks for the diagnosis of one event and blocks until it is ready.
+Requests arriving close together are sent to the LLM as one batch, bounded by
+a maximum batch size and a maximum wait, so under load the fixed few-shot
+preamble and the round trip are shared across many events.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchReasoner:
+    """Turns concurrent single-event diagnosis requests into batched calls."""
+
+    def __init__(self, reason_batch_fn, max_batch_size: int = 8, max_wait_seconds: float = 0.25):
+        """
+        Args:
+            reason_batch_fn (callable): Takes a list of events and returns a
+                                        dict of eventId to diagnosis, e.g.
+                                        `model.reason_batch` with its examples
+                                        bound.
+            max_batch_size (int): A batch is sent as soon as it is this big.
+            max_wait_seconds (float): The longest the first request in a batch
+                                      waits for others to join it.
+        """
+        self.reason_batch_fn = reason_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.batches_sent = 0
+        self.events_diagnosed = 0
+        self._pending = []
+        self._batch_started = None
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """Starts the background thread that sends batches."""
+        self._thread = threading.Thread(target=self._run, name="batch-reasoner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Sends whatever is pending and stops the background thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def diagnose(self, event: dict, timeout: float = None) -> str:
+        """
+        Returns the diagnosis for `event`, blocking until its batch completes.
+
+        Args:
+            event (dict): A validated event.
+            timeout (float, optional): How long to wait for the result.
+
+        Returns:
+            str: The LLM's diagnosis of the crisis.
+
+        Raises:
+            Exception: Whatever the batched call raised for this batch.
+        """
+        return self.submit(event).result(timeout)
+
+    def submit(self, event: dict) -> Future:
+        """Queues `event` for the next batch and returns a future diagnosis."""
+        future = Future()
+        with self._condition:
+            if not self._pending:
+                self._batch_started = time.monotonic()
+            self._pending.append((event, future))
+            self._condition.notify()
+        return future
+
+    def _take_batch(self) -> list:
+        with self._condition:
+            while True:
+                if self._pending:
+                    waited = time.monotonic() - self._batch_started
+                    if (
+                        len(self._pending) >= self.max_batch_size
+                        or waited >= self.max_wait_seconds
+                        or self._stopping
+                    ):
+                        batch = self._pending[: self.max_batch_size]
+                        self._pending = self._pending[self.max_batch_size:]
+                        self._batch_started = time.monotonic()
+                        return batch
+                    self._condition.wait(self.max_wait_seconds - waited)
+                elif self._stopping:
+                    return []
+                else:
+                    self._condition.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            # The same event may be queued twice; send it once.
+            unique_events = {event["eventId"]: event for event, _ in batch}
+            try:
+                diagnoses = self.reason_batch_fn(list(unique_events.values()))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches_sent += 1
+            self.events_diagnosed += len(unique_events)
+            for event, future in batch:
+                future.set_result(diagnoses[event["eventId"]])
+
+    def stats(self) -> dict:
+        """Returns how many batches were sent and the average batch size."""
+        return {
+            "batches_sent": self.batches_sent,
+            "events_diagnosed": self.events_diagnosed,
+            "avg_batch_size": self.events_diagnosed / self.batches_sent if self.batches_sent else 0.0,
+        }
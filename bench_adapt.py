@@ -0,0 +1,81 @@
+"""
+Measures the cost of `model.adapt` per event.
+
+Compares the old path, where the current plan is serialized with json.dumps
+and re-parsed and re-classified by `adapt()` for every event, with the
+current one, where the plan is classified once into a `ClassifiedPlan`.
+Both paths run over the same mixed stream of events, and the report shows
+the cost per event and the share of one CPU core that adapt() would use at
+the target event rate.
+
+Usage:
+    python bench_adapt.py [--events 100000] [--rate 10000]
+
+adapt() logs every decision with print(); stdout is sent to os.devnull while
+timing, so the figures include writing those lines but not a terminal.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+
+from data_schema import VALID_DATA_TYPES
+
+import model
+
+PLAN = {
+    "plan_title": "Mitigate Traffic Congestion at Silk Board Junction",
+    "priority": "HIGH",
+    "steps": [
+        {"action_id": 1, "action": "Deploy Traffic Police", "details": "Dispatch 4 officers to manage signals manually."},
+        {"action_id": 2, "action": "Activate Diversions", "details": "Divert traffic via HSR Layout and BTM Layout."},
+        {"action_id": 3, "action": "Issue Public Advisory", "details": "Publish a public advisory to avoid the area."},
+    ],
+}
+
+
+def make_events(count: int) -> list:
+    """Generates `count` minimal events over every dataType."""
+    rng = random.Random(42)
+    data_types = sorted(VALID_DATA_TYPES)
+    return [{"eventId": f"bench_{i}", "dataType": rng.choice(data_types)} for i in range(count)]
+
+
+def measure(label: str, events: list, adapt_one, rate: int) -> float:
+    """
+    Times `adapt_one(event)` over every event.
+
+    Returns:
+        float: Microseconds per event.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        for event in events:
+            adapt_one(event)
+        elapsed = time.perf_counter() - started
+
+    per_event_us = elapsed / len(events) * 1e6
+    core_share = per_event_us * rate / 1e6
+    print(f"{label:<18} {per_event_us:>7.2f} us/event  {core_share:>6.1%} of a core at {rate} events/s")
+    return per_event_us
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000, help="Events to run through adapt() per path.")
+    parser.add_argument("--rate", type=int, default=10_000, help="Target event rate for the CPU share column.")
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    classified = model.ClassifiedPlan(PLAN)
+
+    # The decisions must not change.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        assert all(model.adapt(json.dumps(PLAN), e) == model.adapt(classified, e) for e in events[:1000])
+
+    json_path = measure("json re-parse", events, lambda event: model.adapt(json.dumps(PLAN), event), args.rate)
+    cached_path = measure("classified plan", events, lambda event: model.adapt(classified, event), args.rate)
+    print(f"\nClassifying once: {json_path / cached_path:.1f}x less adapt() time per event.")
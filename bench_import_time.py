@@ -0,0 +1,84 @@
+"""
+Measures the import time of the entry-point modules against a budget.
+
+Each module is imported in a fresh interpreter with `-X importtime`, so the
+figure is the cold cost a restarted or autoscaled process pays before it can
+do any work. No module may initialize cloud clients at import time; heavy
+SDKs (firebase_admin, vertexai) must only be imported on first use.
+
+Usage:
+    python bench_import_time.py [--runs 3]
+
+Exits with status 1 if any module exceeds its budget or pulls in a deferred
+SDK at import time.
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+# Cold import budgets in milliseconds (best of --runs).
+IMPORT_BUDGETS_MS = {
+    "model": 50,
+    "main": 250,
+    "data_dispatcher": 100,
+    "protocol": 400,
+}
+
+# SDKs that must stay out of the import path.
+DEFERRED_SDKS = ("firebase_admin", "vertexai", "google.cloud.firestore")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module: str) -> tuple:
+    """
+    Imports `module` in a fresh interpreter.
+
+    Returns:
+        tuple: (cumulative import time in ms, set of every imported module).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={"LLM_BACKEND": "stub", "PLAN_LOG_DIR": "", "PATH": ""},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    cumulative_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        imported.add(match.group(3))
+        if match.group(3) == module and len(match.group(2)) == 1:
+            cumulative_us = int(match.group(1))
+    return cumulative_us / 1000, imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the best is reported.")
+    args = parser.parse_args()
+
+    failures = 0
+    for module, budget_ms in IMPORT_BUDGETS_MS.items():
+        best_ms = float("inf")
+        for _ in range(args.runs):
+            elapsed_ms, imported = measure_import(module)
+            best_ms = min(best_ms, elapsed_ms)
+        leaked = sorted(sdk for sdk in DEFERRED_SDKS if sdk in imported)
+
+        status = "OK"
+        if best_ms > budget_ms or leaked:
+            status = "OVER BUDGET" if best_ms > budget_ms else "SDK IMPORTED"
+            failures += 1
+        print(f"{module:<16} {best_ms:>7.1f} ms  (budget {budget_ms} ms)  {status}")
+        if leaked:
+            print(f"    imports deferred SDK(s) at import time: {', '.join(leaked)}")
+
+    sys.exit(1 if failures else 0)
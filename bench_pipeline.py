@@ -0,0 +1,362 @@
+"""
+Measures how fast the whole system turns events into plans on the dashboard.
+
+Replays the `static/*_events.json` stories and/or a generated event stream
+through the full pipeline in one process: publish -> validation ->
+coalescing -> adapt -> reason -> plan -> delivery -> protocol layer. Only
+the outside services are replaced: events go over the in-memory transport
+instead of Firestore, the LLM is the stub backend, and the protocol layer's
+Flask app is served on a local port.
+
+Reported per run:
+- event-to-plan latency (p50/p95/p99): from publishing an event until the
+  protocol layer has stored the final plan that covers it (as source event
+  or merged event); also until its first partial plan was stored (a
+  provisional plan from the plan library counts, see `--plan-library`).
+- decision latency: until the agent decided an event, including events that
+  the active plan already covered and that got no new plan; overall and per
+  severity class.
+- events/s: events decided divided by the time until every one of them
+  was decided and every plan was delivered.
+- LLM calls per event, and memory growth: the process's resident set size,
+  plus the Python heap measured with tracemalloc when `--tracemalloc` is
+  given (tracing slows allocation down, so it is off for latency runs).
+
+Usage:
+    python bench_pipeline.py [SOURCE ...] [--generated 5000] [--rate 500]
+                             [--plan-library plan_library.json]
+                             [--tracemalloc] [--json results.json]
+
+The agent's usual environment variables apply (AGENT_WORKERS,
+COALESCE_WINDOW_SECONDS, LLM_STUB_LATENCY_MS, ...). LLM_BACKEND defaults to
+"stub" here, e.g.:
+    LLM_STUB_LATENCY_MS=300 python bench_pipeline.py --generated 2000 --json -
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+# The pipeline runs without outside services; set before the agent and the
+# protocol layer read their configuration at import time.
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ["EVENT_TRANSPORT"] = "memory"
+os.environ["PLAN_LOG_DIR"] = ""
+os.environ["DELIVERY_SPILL_FILE"] = ""
+os.environ["EVENT_CHECKPOINT_FILE"] = ""
+os.environ["PLAN_LIBRARY_FILE"] = ""
+
+from werkzeug.serving import make_server
+
+import data_dispatcher
+import protocol
+from data_schema import VALID_SEVERITY_LEVELS
+from data_simulator import EventGenerator
+from validate_data import validate_batch
+
+
+def percentiles(values: list) -> dict:
+    """Returns p50/p95/p99/max of `values` in milliseconds."""
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": data_dispatcher.percentile(values, 0.50) * 1000,
+        "p95_ms": data_dispatcher.percentile(values, 0.95) * 1000,
+        "p99_ms": data_dispatcher.percentile(values, 0.99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def git_commit() -> str:
+    """Returns the current commit hash, or "" outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def resident_set_kib() -> float:
+    """Returns the process's current resident set size in KiB (Linux), else its peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def start_protocol_server():
+    """Serves the protocol layer's Flask app on a free local port."""
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, protocol.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="protocol-server", daemon=True).start()
+    return server
+
+
+class PipelineProbe:
+    """Timestamps each event as it is published, decided and planned."""
+
+    def __init__(self):
+        self.published_at = {}
+        self.decided_at = {}
+        self.first_plan_at = {}
+        self.final_plan_at = {}
+        self._lock = threading.Lock()
+
+    def _stamp(self, table: dict, event_ids, now: float, overwrite: bool = False):
+        with self._lock:
+            for event_id in event_ids:
+                if overwrite or event_id not in table:
+                    table[event_id] = now
+
+    def wrap_publish(self, publish):
+        def timed_publish(events: list):
+            self._stamp(self.published_at, [event["eventId"] for event in events], time.perf_counter(), overwrite=True)
+            publish(events)
+
+        return timed_publish
+
+    def wrap_process_event(self, process_event):
+        def timed_process_event(event_data: dict, merged_event_ids: list = (), queued_at: float = None):
+            decided = None
+            try:
+                decided = process_event(event_data, merged_event_ids, queued_at)
+                return decided
+            finally:
+                # A deferred event is decided when it is processed again.
+                if decided is not False:
+                    self._stamp(self.decided_at, [event_data["eventId"], *merged_event_ids], time.perf_counter())
+
+        return timed_process_event
+
+    def wrap_store_plan(self, store_plan):
+        def timed_store_plan(data: dict):
+            record = store_plan(data)
+            if record is not None:
+                now = time.perf_counter()
+                event_ids = [data["source_event"].get("eventId"), *data.get("merged_events", [])]
+                self._stamp(self.first_plan_at, event_ids, now)
+                if data.get("plan_status") != "streaming":
+                    self._stamp(self.final_plan_at, event_ids, now)
+            return record
+
+        return timed_store_plan
+
+    def latencies(self, table: dict, event_ids=None) -> list:
+        with self._lock:
+            return [
+                table[event_id] - published
+                for event_id, published in self.published_at.items()
+                if event_id in table and (event_ids is None or event_id in event_ids)
+            ]
+
+
+def load_stream(sources: list, generated: int, seed: int) -> list:
+    """Returns the valid events of every source, followed by `generated` new ones."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        events = data_dispatcher.load_events(sources) if sources else []
+    if generated:
+        events += validate_batch(EventGenerator(seed=seed).events(generated))[0]
+    return events
+
+
+def run_pipeline(events: list, rate: float, timeout: float, trace_memory: bool = False) -> dict:
+    """
+    Pushes `events` through the agent and the protocol layer.
+
+    Args:
+        events (list): Valid events with unique eventIds.
+        rate (float): Events published per second; 0 publishes them all at once.
+        timeout (float): The longest to wait for the pipeline to drain.
+        trace_memory (bool): Also measure Python heap growth with tracemalloc.
+
+    Returns:
+        dict: The measured figures.
+    """
+    server = start_protocol_server()
+    os.environ["PROTOCOL_URL"] = f"http://127.0.0.1:{server.server_port}"
+    import main
+    import model
+
+    probe = PipelineProbe()
+    main.process_event = probe.wrap_process_event(main.process_event)
+    protocol.store_plan = probe.wrap_store_plan(protocol.store_plan)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        model.warm_up(background=False)
+        main.plan_delivery.start()
+        main.agent_pool.start()
+        main.event_coalescer.start()
+        if main.batch_reasoner is not None:
+            main.batch_reasoner.start()
+        watch = main.event_transport.subscribe(main.on_event_snapshot)
+
+        if trace_memory:
+            tracemalloc.start()
+        heap_before, _ = tracemalloc.get_traced_memory()
+        rss_before = resident_set_kib()
+        calls_before = model.llm_usage["calls"]
+        started = time.perf_counter()
+
+        offsets = data_dispatcher.schedule_offsets(events, rate=rate or None)
+        report = asyncio.run(
+            data_dispatcher.replay(events, offsets, probe.wrap_publish(main.event_transport.publish), verbose=False)
+        )
+
+        # Every event is decided once the coalescer has emitted its last group
+        # and the pool is idle; the plans are stored once delivery has flushed.
+        deadline = time.monotonic() + timeout
+        drained = False
+        while time.monotonic() < deadline:
+            if (
+                main.event_coalescer.stats()["open_groups"] == 0
+                and main.agent_pool.join(timeout=0.05)
+                and main.event_coalescer.stats()["open_groups"] == 0
+            ):
+                drained = main.plan_delivery.flush(max(0.0, deadline - time.monotonic()))
+                break
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        heap_after, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = resident_set_kib()
+        llm_calls = model.llm_usage["calls"] - calls_before
+
+        watch.unsubscribe()
+        main.event_coalescer.stop(flush=False)
+        main.agent_pool.stop(drain=False)
+        main.plan_delivery.stop()
+        if main.batch_reasoner is not None:
+            main.batch_reasoner.stop()
+    server.shutdown()
+
+    decided = len(probe.latencies(probe.decided_at))
+    event_ids_by_severity = {}
+    for event in events:
+        event_ids_by_severity.setdefault(event.get("severity"), set()).add(event["eventId"])
+    return {
+        "events": len(events),
+        "drained": drained,
+        "elapsed_seconds": elapsed,
+        "events_per_second": decided / elapsed if elapsed else 0.0,
+        "publish_events_per_second": report["events_per_second"],
+        "events_decided": decided,
+        # Dropped or rejected by a full agent queue.
+        "events_undecided": len(events) - decided,
+        "events_planned": len(probe.latencies(probe.final_plan_at)),
+        "plans_stored": len(protocol.plan_store),
+        "llm_calls": llm_calls,
+        "llm_calls_per_event": llm_calls / len(events) if events else 0.0,
+        "event_to_plan": percentiles(probe.latencies(probe.final_plan_at)),
+        "event_to_first_partial_plan": percentiles(probe.latencies(probe.first_plan_at)),
+        "event_to_decision": percentiles(probe.latencies(probe.decided_at)),
+        "event_to_decision_by_severity": {
+            severity: percentiles(probe.latencies(probe.decided_at, event_ids_by_severity[severity]))
+            for severity in VALID_SEVERITY_LEVELS
+            if severity in event_ids_by_severity
+        },
+        "memory": {
+            "rss_growth_kib": rss_after - rss_before,
+            "rss_kib": rss_after,
+            # Zero unless tracemalloc was on.
+            "heap_growth_kib": (heap_after - heap_before) / 1024,
+            "heap_growth_bytes_per_event": (heap_after - heap_before) / len(events) if events else 0.0,
+            "heap_peak_kib": heap_peak / 1024,
+        },
+        "coalescer": main.event_coalescer.stats(),
+        "agent_pool": main.agent_pool.stats(),
+        "scheduler": main.agent_pool.queue_stats(),
+        "delivery": main.plan_delivery.stats(),
+        "llm_cache": model.llm_cache.stats(),
+    }
+
+
+def print_report(results: dict):
+    """Prints the headline figures of a run."""
+    print(
+        f"{results['events']} events: {results['events_decided']} decided ({results['events_undecided']} dropped), "
+        f"{results['events_planned']} planned, "
+        f"{results['plans_stored']} plans stored in {results['elapsed_seconds']:.2f} s "
+        f"({results['events_per_second']:.0f} events/s){'' if results['drained'] else ' -- TIMED OUT'}"
+    )
+    for label, key in (
+        ("event -> plan", "event_to_plan"),
+        ("event -> first partial", "event_to_first_partial_plan"),
+        ("event -> decision", "event_to_decision"),
+    ):
+        figures = results[key]
+        print(
+            f"{label:<24} p50 {figures['p50_ms']:>8.1f} ms  p95 {figures['p95_ms']:>8.1f} ms  "
+            f"p99 {figures['p99_ms']:>8.1f} ms  max {figures['max_ms']:>8.1f} ms  (n={figures['count']})"
+        )
+    for severity, figures in results["event_to_decision_by_severity"].items():
+        print(
+            f"{'  ' + severity + ' decision':<24} p50 {figures['p50_ms']:>8.1f} ms  p95 {figures['p95_ms']:>8.1f} ms  "
+            f"p99 {figures['p99_ms']:>8.1f} ms  max {figures['max_ms']:>8.1f} ms  (n={figures['count']})"
+        )
+    memory = results["memory"]
+    print(
+        f"LLM calls per event: {results['llm_calls_per_event']:.2f}. "
+        f"RSS grew {memory['rss_growth_kib']:.0f} KiB to {memory['rss_kib'] / 1024:.0f} MiB."
+    )
+    if memory["heap_peak_kib"]:
+        print(
+            f"Python heap grew {memory['heap_growth_kib']:.0f} KiB "
+            f"({memory['heap_growth_bytes_per_event']:.0f} B/event), peak {memory['heap_peak_kib']:.0f} KiB."
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", default=None, help="Event files or glob patterns (default: 'static/*_events.json').")
+    parser.add_argument("--generated", type=int, default=0, help="Also replay this many generated events.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the generated events.")
+    parser.add_argument("--rate", type=float, default=500, help="Events published per second; 0 publishes all at once.")
+    parser.add_argument("--timeout", type=float, default=300, help="The longest to wait for the pipeline to drain, in seconds.")
+    parser.add_argument("--plan-library", metavar="PATH", default="", help="Serve provisional plans from this plan library.")
+    parser.add_argument("--tracemalloc", action="store_true", help="Measure Python heap growth (slows the run down).")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON to PATH ('-' for stdout).")
+    args = parser.parse_args()
+    os.environ["PLAN_LIBRARY_FILE"] = args.plan_library
+
+    sources = args.sources if args.sources else ([] if args.generated else ["static/*_events.json"])
+    events = load_stream(sources, args.generated, args.seed)
+    if not events:
+        parser.error("no valid events to replay")
+    results = run_pipeline(events, args.rate, args.timeout, args.tracemalloc)
+    results["config"] = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sources": sources,
+        "generated": args.generated,
+        "seed": args.seed,
+        "rate": args.rate,
+        "tracemalloc": args.tracemalloc,
+        "env": {
+            name: os.environ[name]
+            for name in sorted(os.environ)
+            if name.startswith(("AGENT_", "COALESCE_", "LLM_", "REASON_", "PLAN_STREAMING", "DELIVERY_", "INCIDENT_", "CORRELATION_", "SCHEDULER_"))
+        },
+    }
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to '{args.json}'.")
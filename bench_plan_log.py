@@ -0,0 +1,123 @@
+"""
+Benchmarks the durable plan log used by the protocol layer.
+
+Measures ingest throughput (store + log append) with fsync on every plan,
+with batched fsyncs, and with syncing left to the OS, then times a restart
+replay of the resulting log, from the raw segments and from a snapshot, into a
+store capped like the protocol layer's and into an uncapped one. Replays are
+reported against REPLAY_TARGET_SECONDS; the exit status is 1 if a replay into
+the capped store misses it. Plans are sampled from the `static/` story files
+so record sizes match what the dashboard actually receives.
+
+Usage:
+    python bench_plan_log.py [--plans 100000] [--batch 64] [--max-plans 5000]
+"""
+
+import argparse
+import glob
+import json
+import sys
+import tempfile
+import time
+
+from plan_log import PlanLog
+from plan_store import PlanStore
+
+# The restart budget for rebuilding the store from 100k logged plans.
+REPLAY_TARGET_SECONDS = 0.5
+
+
+def load_sample_payloads() -> list:
+    """Loads every `/recommend` payload from the static story files."""
+    payloads = []
+    for path in sorted(glob.glob("static/*_events.json")):
+        with open(path, "r") as f:
+            payloads.extend(json.load(f))
+    return payloads
+
+
+def run_ingest(samples: list, count: int, fsync_every: int, directory: str) -> float:
+    """
+    Stores and logs `count` plans and returns the achieved plans per second.
+
+    Args:
+        samples (list): Payloads to cycle through.
+        count (int): How many plans to ingest.
+        fsync_every (int): The `PlanLog` fsync policy under test.
+        directory (str): The log directory.
+
+    Returns:
+        float: Plans ingested per second.
+    """
+    store = PlanStore(max_plans=0, retention_factor=0)
+    log = PlanLog(directory, fsync_every=fsync_every, compact_every=count + 1)
+    started = time.perf_counter()
+    for i in range(count):
+        sample = samples[i % len(samples)]
+        payload = {
+            "plan": sample["plan"],
+            "source_event": {**sample["source_event"], "eventId": f"bench_{i}"},
+        }
+        log.append(store.add(payload))
+    log.close()
+    return count / (time.perf_counter() - started)
+
+
+def run_replay(directory: str, compact: bool, max_plans: int) -> tuple:
+    """
+    Rebuilds a store from `directory` and returns (plans restored, seconds).
+
+    Args:
+        directory (str): A log directory written by `run_ingest`.
+        compact (bool): Snapshot the log first, so replay reads the snapshot
+                        instead of the raw segments. The snapshot holds what
+                        a store with `max_plans` retains, as in the server.
+        max_plans (int): The store's cap; 0 keeps every plan.
+    """
+    if compact:
+        store = PlanStore(max_plans=max_plans, retention_factor=0)
+        log = PlanLog(directory)
+        log.replay(store)
+        log.compact(store.since(0), store.latest_seq)
+
+    store = PlanStore(max_plans=max_plans, retention_factor=0)
+    started = time.perf_counter()
+    PlanLog(directory).replay(store)
+    return len(store), time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=100000, help="Plans to ingest for the batched/OS runs.")
+    parser.add_argument("--sync-plans", type=int, default=2000, help="Plans to ingest with fsync on every plan.")
+    parser.add_argument("--batch", type=int, default=64, help="Appends per fsync in the batched run.")
+    parser.add_argument("--max-plans", type=int, default=5000, help="The capped store's size (PLAN_STORE_MAX_PLANS).")
+    args = parser.parse_args()
+
+    samples = load_sample_payloads()
+    print(f"Loaded {len(samples)} sample payloads from static/.")
+
+    runs = [
+        ("fsync every plan", args.sync_plans, 1),
+        (f"fsync every {args.batch} plans", args.plans, args.batch),
+        ("no fsync (OS flush only)", args.plans, 0),
+    ]
+    for label, count, fsync_every in runs:
+        with tempfile.TemporaryDirectory() as directory:
+            rate = run_ingest(samples, count, fsync_every, directory)
+            print(f"INGEST  {label:<28} {count:>7} plans  {rate:>10,.0f} plans/s")
+
+    missed = False
+    for max_plans in (args.max_plans, 0):
+        with tempfile.TemporaryDirectory() as directory:
+            run_ingest(samples, args.plans, 0, directory)
+            for compact in (False, True):
+                restored, seconds = run_replay(directory, compact, max_plans)
+                within = seconds < REPLAY_TARGET_SECONDS
+                missed |= bool(max_plans) and not within
+                label = f"from {'snapshot' if compact else 'segments'}, {f'max {max_plans}' if max_plans else 'uncapped'}"
+                print(
+                    f"REPLAY  {label:<28} {restored:>7} plans  {seconds * 1000:>10,.0f} ms  "
+                    f"{'within' if within else 'MISSED'} the {REPLAY_TARGET_SECONDS * 1000:.0f} ms target"
+                )
+    sys.exit(1 if missed else 0)
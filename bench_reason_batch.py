@@ -0,0 +1,99 @@
+"""
+Compares single-event diagnosis against batched diagnosis.
+
+Runs the same set of events through `model.reason` one at a time and through
+`model.reason_batch` in batches, with the LLM cache disabled, and reports
+events per second, LLM calls and tokens per event for each path. Token
+counts are those reported by the LLM backend.
+
+Usage:
+    python bench_reason_batch.py [--events 32] [--batch-size 8]
+
+Runs offline against the stub backend unless LLM_BACKEND says otherwise, e.g.:
+    LLM_STUB_LATENCY_MS=800 python bench_reason_batch.py
+"""
+
+import argparse
+import os
+import random
+import time
+
+# Offline by default; set before `model` reads its configuration at import time.
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from data_simulator import generate_event
+
+import model
+
+
+def make_events(count: int) -> list:
+    """Generates `count` traffic and weather events with unique IDs."""
+    random.seed(42)
+    events = []
+    for i in range(count):
+        event = generate_event(random.choice(["traffic", "weather"]))
+        event["eventId"] = f"bench_{i}"
+        events.append(event)
+    return events
+
+
+def measure(label: str, events: list, run) -> dict:
+    """
+    Times `run(events)` and reports throughput and LLM usage per event.
+
+    Args:
+        label (str): The name printed for this path.
+        events (list): The events to diagnose.
+        run (callable): Diagnoses every event in the list.
+
+    Returns:
+        dict: The measured figures.
+    """
+    before = dict(model.llm_usage)
+    started = time.perf_counter()
+    run(events)
+    elapsed = time.perf_counter() - started
+    usage = {key: model.llm_usage[key] - before[key] for key in before}
+
+    result = {
+        "events_per_second": len(events) / elapsed,
+        "llm_calls_per_event": usage["calls"] / len(events),
+        "prompt_tokens_per_event": usage["prompt_tokens"] / len(events),
+        "response_tokens_per_event": usage["response_tokens"] / len(events),
+    }
+    print(
+        f"{label:<10} {result['events_per_second']:>8.2f} events/s  "
+        f"{result['llm_calls_per_event']:>5.2f} calls/event  "
+        f"{result['prompt_tokens_per_event']:>7.0f} prompt tok/event  "
+        f"{result['response_tokens_per_event']:>6.0f} response tok/event"
+    )
+    return result
+
+
+def run_single(events: list):
+    for event in events:
+        model.reason(model.perceive(event), model.REASONING_EXAMPLES)
+
+
+def run_batched(events: list, batch_size: int):
+    for start in range(0, len(events), batch_size):
+        model.reason_batch(events[start:start + batch_size], model.REASONING_EXAMPLES)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=32, help="Events to diagnose per path.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Events per batched call.")
+    args = parser.parse_args()
+
+    # Every event must reach the LLM for a fair comparison.
+    model.LLM_CACHE_SIZE = 0
+    events = make_events(args.events)
+
+    single = measure("single", events, run_single)
+    batched = measure("batched", events, lambda evs: run_batched(evs, args.batch_size))
+    print(
+        f"\nBatching {args.batch_size} events per call: "
+        f"{batched['events_per_second'] / single['events_per_second']:.1f}x events/s, "
+        f"{batched['prompt_tokens_per_event'] / max(single['prompt_tokens_per_event'], 1):.2f}x prompt tokens/event."
+    )
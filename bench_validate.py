@@ -0,0 +1,85 @@
+"""
+Measures event validation throughput.
+
+Generates a seeded stream of events with `data_simulator.EventGenerator`,
+corrupts a share of them (missing fields, unknown dataTypes, out-of-range
+coordinates, wrongly typed metadata), and runs the stream through:
+- `is_event_valid`, one call per event, printing a line per rejected event;
+- `validate_batch`, one call for the whole stream, returning error records.
+
+Both paths must accept exactly the same events. stdout is sent to os.devnull
+while timing `is_event_valid`, so its figure includes formatting and writing
+the rejection lines but not a terminal.
+
+Usage:
+    python bench_validate.py [--events 200000] [--invalid-share 0.05] [--repeat 3]
+"""
+
+import argparse
+import contextlib
+import copy
+import os
+import random
+import time
+
+from data_simulator import EventGenerator
+from validate_data import is_event_valid, validate_batch
+
+
+def corrupt(event: dict, rng: random.Random) -> dict:
+    """Returns a copy of `event` with one kind of schema violation."""
+    event = copy.deepcopy(event)
+    kind = rng.randrange(5)
+    if kind == 0:
+        del event["location"]["zone"]
+    elif kind == 1:
+        event["dataType"] = "alien_invasion"
+    elif kind == 2:
+        event["location"]["coordinates"]["lat"] = 191.2
+    elif kind == 3:
+        event["metadata"]["confidence"] = "high"
+    else:
+        del event["severity"]
+    return event
+
+
+def make_events(count: int, invalid_share: float, seed: int = 42) -> list:
+    """Generates `count` events, about `invalid_share` of them invalid."""
+    rng = random.Random(seed)
+    events = list(EventGenerator(seed=seed).events(count))
+    return [corrupt(event, rng) if rng.random() < invalid_share else event for event in events]
+
+
+def best_of(repeat: int, run) -> float:
+    """Returns the fastest of `repeat` timed calls to `run()`, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000, help="Events per run.")
+    parser.add_argument("--invalid-share", type=float, default=0.05, help="Share of events made invalid.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the fastest is reported.")
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.invalid_share)
+
+    def run_single():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return [event for event in events if is_event_valid(event)]
+
+    valid_events, rejected = validate_batch(events)
+    assert run_single() == valid_events, "is_event_valid and validate_batch disagree"
+    print(f"{len(events)} events, {len(rejected)} invalid.")
+
+    for label, run in (
+        ("is_event_valid", run_single),
+        ("validate_batch", lambda: validate_batch(events)),
+    ):
+        elapsed = best_of(args.repeat, run)
+        print(f"{label:<16} {len(events) / elapsed:>10,.0f} events/s  {elapsed / len(events) * 1e6:>6.2f} us/event")
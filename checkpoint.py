@@ -0,0 +1,236 @@
+"""
+A persistent record of the events the agent has already handled.
+
+On startup Firestore's listener delivers every document in the collection as
+ADDED, and touching a document re-delivers it as MODIFIED. Without a record
+of what was handled, every restart re-runs perceive/reason/plan over the
+whole collection. `EventCheckpoint` remembers each handled event's eventId
+with a hash of its content, so an event is skipped when the same content
+comes around again and handled again only when its content changed.
+
+The checkpoint is one append-only file with a tab-separated line per handled
+event: the content hash, the LLM calls handling it took, and the eventId.
+Later lines for an eventId supersede earlier ones. When the file holds far
+more lines than live entries it is rewritten (to a temporary file, then
+atomically renamed). Only the most recent `max_entries` eventIds are kept.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def event_digest(event: dict) -> str:
+    """Returns a hash of an event's content, independent of key order."""
+    canonical = json.dumps(event, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EventCheckpoint:
+    """Handled eventIds and content hashes, persisted to an append-only file."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100_000,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+    ):
+        """
+        Args:
+            path (str): The checkpoint file. "" keeps the checkpoint in memory
+                        only, so it does not survive a restart.
+            max_entries (int): The most eventIds remembered.
+            fsync_every (int): fsync after this many appends. 0 leaves syncing
+                               to the OS.
+            fsync_interval (float): Also fsync when this many seconds have
+                                    passed since the last sync.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.skipped = 0
+        self.llm_calls_avoided = 0
+        self._entries = OrderedDict()  # eventId -> (digest, llm_calls)
+        self._pending = OrderedDict()  # eventId -> digests admitted but not handled, oldest first
+        self._lines = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """
+        Restores the checkpoint from its file and opens it for appending.
+
+        A truncated or malformed line (e.g. from a crash mid-write) is skipped.
+
+        Returns:
+            int: The number of eventIds restored.
+        """
+        with self._lock:
+            if not self.path:
+                return 0
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.endswith("\n"):
+                            continue
+                        parts = line[:-1].split("\t", 2)
+                        if len(parts) != 3 or not parts[1].isdigit():
+                            continue
+                        digest, llm_calls, event_id = parts
+                        self._remember(event_id, digest, int(llm_calls))
+                        self._lines += 1
+            self._file = open(self.path, "a", encoding="utf-8")
+            if self._needs_compaction():
+                self._compact()
+            return len(self._entries)
+
+    def _remember(self, event_id: str, digest: str, llm_calls: int):
+        self._entries[event_id] = (digest, llm_calls)
+        self._entries.move_to_end(event_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def admit(self, event: dict) -> bool:
+        """
+        Decides whether a received event needs handling.
+
+        An event already handled (or admitted and not yet handled) with the
+        same content is skipped and counted, together with the LLM calls
+        handling it took the first time, which the skip avoided. Any other
+        event is admitted; its content hash is held until `mark_handled` (or
+        `forget`) is called for it.
+
+        Args:
+            event (dict): A validated event.
+
+        Returns:
+            bool: True if the event should be handled, False to skip it.
+        """
+        event_id = event.get("eventId")
+        digest = event_digest(event)
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is not None and entry[0] == digest:
+                self.skipped += 1
+                self.llm_calls_avoided += entry[1]
+                return False
+            pending = self._pending.get(event_id)
+            if pending is not None and digest in pending:
+                # Re-delivered while the first copy is still being handled.
+                self.skipped += 1
+                return False
+            if pending is None:
+                pending = self._pending[event_id] = []
+            pending.append(digest)
+            self._pending.move_to_end(event_id)
+            # Admitted events that are never handled (e.g. dropped from a full
+            # queue) must not accumulate.
+            while len(self._pending) > self.max_entries:
+                self._pending.popitem(last=False)
+        return True
+
+    def _take_pending(self, event_id: str, digest: str = None):
+        """Removes and returns an admitted copy's digest: `digest`, or the oldest one."""
+        pending = self._pending.get(event_id)
+        if not pending:
+            return None
+        if digest is None:
+            digest = pending.pop(0)
+        elif digest in pending:
+            pending.remove(digest)
+        else:
+            return None
+        if not pending:
+            del self._pending[event_id]
+        return digest
+
+    def mark_handled(self, event_id: str, llm_calls: int = 0, digest: str = None):
+        """
+        Records that an admitted event was handled.
+
+        Args:
+            event_id (str): The event's eventId.
+            llm_calls (int): LLM calls spent on it, reported as avoided when
+                             the event is skipped later.
+            digest (str, optional): The handled copy's `event_digest`, when
+                                    several copies with different content may
+                                    be in flight. Defaults to the oldest
+                                    admitted copy.
+        """
+        with self._lock:
+            digest = self._take_pending(event_id, digest)
+            if digest is None or not isinstance(event_id, str) or "\n" in event_id:
+                return
+            self._remember(event_id, digest, llm_calls)
+            if self._file is None:
+                return
+            self._file.write(f"{digest}\t{llm_calls}\t{event_id}\n")
+            self._file.flush()
+            self._lines += 1
+            self._unsynced += 1
+            if self.fsync_every and (
+                self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self._sync()
+            if self._needs_compaction():
+                self._compact()
+
+    def forget(self, event_id: str, digest: str = None):
+        """
+        Releases an admitted event that was not handled, e.g. dropped from a
+        full queue or whose plan was rejected, so that a re-delivery of it is
+        admitted again.
+
+        Args:
+            event_id (str): The event's eventId.
+            digest (str, optional): The released copy's `event_digest`.
+                                    Defaults to the oldest admitted copy.
+        """
+        with self._lock:
+            self._take_pending(event_id, digest)
+
+    def _needs_compaction(self) -> bool:
+        return self._lines > 2 * len(self._entries) + 10000
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{digest}\t{calls}\t{event_id}\n" for event_id, (digest, calls) in self._entries.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lines = len(self._entries)
+        self._unsynced = 0
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """Syncs and closes the checkpoint file."""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        """Returns the number of remembered events, skips and LLM calls avoided."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pending": len(self._pending),
+                "skipped": self.skipped,
+                "llm_calls_avoided": self.llm_calls_avoided,
+            }
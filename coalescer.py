@@ -0,0 +1,140 @@
+"""
+Coalesces bursts of related events before they reach the agentic loop.
+
+During a surge, many events for the same zone and crisis group arrive within
+seconds and each one could trigger a full reason/plan cycle. The coalescer
+collects events per key over a short window and then emits a single
+representative (the most severe, or simply the latest) together with the IDs
+of the events it supersedes, so one plan covers the whole burst. The added
+latency is bounded by the window length.
+"""
+
+import heapq
+import threading
+import time
+
+from data_schema import VALID_SEVERITY_LEVELS
+
+SEVERITY_RANK = {level: rank for rank, level in enumerate(VALID_SEVERITY_LEVELS)}
+REPRESENTATIVE_POLICIES = ("most_severe", "latest")
+
+
+class EventCoalescer:
+    """Groups events by key over a fixed window and emits one per group."""
+
+    def __init__(self, emit, key_fn, window_seconds: float = 2.0, policy: str = "most_severe", clock=time.monotonic):
+        """
+        Args:
+            emit (callable): Called as `emit(representative, merged_event_ids)`
+                             when a window closes.
+            key_fn (callable): Maps an event to its grouping key.
+            window_seconds (float): How long a group collects events after its
+                                    first one arrives. 0 emits immediately.
+            policy (str): "most_severe" (ties go to the latest event) or
+                          "latest".
+            clock (callable): Returns the current time in seconds.
+
+        Raises:
+            ValueError: If `policy` is not a known policy.
+        """
+        if policy not in REPRESENTATIVE_POLICIES:
+            raise ValueError(f"Unknown policy '{policy}'. Use one of {REPRESENTATIVE_POLICIES}.")
+        self.emit = emit
+        self.key_fn = key_fn
+        self.window_seconds = window_seconds
+        self.policy = policy
+        self.clock = clock
+        self.events_in = 0
+        self.groups_out = 0
+        self.events_merged = 0
+        self._groups = {}
+        self._deadlines = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def add(self, event: dict):
+        """
+        Adds an event to its group, opening a new window if needed.
+
+        Args:
+            event (dict): A validated event.
+        """
+        if self.window_seconds <= 0:
+            with self._condition:
+                self.events_in += 1
+                self.groups_out += 1
+            self.emit(event, [])
+            return
+
+        key = self.key_fn(event)
+        with self._condition:
+            self.events_in += 1
+            group = self._groups.get(key)
+            if group is None:
+                self._groups[key] = [event]
+                heapq.heappush(self._deadlines, (self.clock() + self.window_seconds, key))
+                self._condition.notify()
+            else:
+                group.append(event)
+
+    def choose_representative(self, events: list) -> dict:
+        """Picks the event a coalesced group is planned on."""
+        if self.policy == "latest":
+            return events[-1]
+        # max() keeps the first of equal items, so scan from the latest event.
+        return max(reversed(events), key=lambda event: SEVERITY_RANK.get(event.get("severity"), -1))
+
+    def _emit_group(self, events: list):
+        representative = self.choose_representative(events)
+        merged_ids = [event.get("eventId") for event in events if event is not representative]
+        self.groups_out += 1
+        self.events_merged += len(merged_ids)
+        self.emit(representative, merged_ids)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and (
+                    not self._deadlines or self._deadlines[0][0] > self.clock()
+                ):
+                    timeout = self._deadlines[0][0] - self.clock() if self._deadlines else None
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+                _, key = heapq.heappop(self._deadlines)
+                events = self._groups.pop(key)
+            self._emit_group(events)
+
+    def start(self):
+        """Starts the background thread that closes windows."""
+        self._thread = threading.Thread(target=self._run, name="event-coalescer", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True):
+        """
+        Stops the background thread.
+
+        Args:
+            flush (bool): Emit the groups whose windows are still open.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            pending = list(self._groups.values()) if flush else []
+            self._groups.clear()
+            self._deadlines.clear()
+        if self._thread is not None:
+            self._thread.join()
+        for events in pending:
+            self._emit_group(events)
+
+    def stats(self) -> dict:
+        """Returns how many events came in and how many groups went out."""
+        with self._condition:
+            return {
+                "events_in": self.events_in,
+                "groups_out": self.groups_out,
+                "events_merged": self.events_merged,
+                "open_groups": len(self._groups),
+            }
@@ -0,0 +1,366 @@
+"""
+Correlates live events into incidents.
+
+Events name their causes in `interdependencies` ("caused_by",
+"escalation_of", "affected_by", ...), either as {"eventId", "relationship"}
+objects or as "relationship:eventId" / "eventId" strings. `IncidentCorrelator`
+joins every event to the incident of the events it names, and to the
+incidents of live events nearby (in the same or an adjacent cell of a
+`radius_km` grid) whose dataType is causally related (the same dataType, or
+linked in `data_schema.CAUSAL_LINKS`). A flood and the
+traffic jam it causes thus become one incident, which is diagnosed and
+planned once, with the earliest cause as its root.
+
+Incidents are the sets of a union-find structure, so joining one is nearly
+constant time. Nearby events are found through `SpatialGrid`, a hash of
+fixed-size cells that keeps the latest live event of each dataType per cell;
+joining it joins its incident, so correlating an event costs a bounded number
+of lookups however many events are live. An event stays
+live for its `validity_period_minutes`; an incident ends when its last
+event expires.
+"""
+
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from data_schema import CAUSAL_LINKS, VALID_SEVERITY_LEVELS, validity_seconds
+
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(VALID_SEVERITY_LEVELS)}
+# Kilometres per degree of latitude; a degree of longitude is this times
+# cos(latitude).
+KM_PER_DEGREE = 111.2
+
+
+def related_data_types(causal_links: dict = CAUSAL_LINKS) -> dict:
+    """Returns dataType -> the dataTypes it can cause or be caused by (itself included)."""
+    related = {}
+    for cause, effects in causal_links.items():
+        related.setdefault(cause, {cause})
+        for effect, _ in effects:
+            related.setdefault(effect, {effect})
+            related[cause].add(effect)
+            related[effect].add(cause)
+    return {data_type: frozenset(types) for data_type, types in related.items()}
+
+
+def linked_event_ids(event: dict) -> list:
+    """Returns the eventIds an event's `interdependencies` refer to."""
+    event_ids = []
+    for link in event.get("interdependencies") or ():
+        if isinstance(link, dict):
+            event_id = link.get("eventId")
+        elif isinstance(link, str):
+            # "caused_by:weat_123" or a bare "weat_123".
+            event_id = link.rpartition(":")[2]
+        else:
+            continue
+        if event_id:
+            event_ids.append(event_id)
+    return event_ids
+
+
+class SpatialGrid:
+    """
+    Live items hashed into square cells, grouped by kind within each cell.
+
+    A neighbourhood query looks at the 3x3 cells around a point and returns
+    the most recent item of each kind per cell, so it costs the same however
+    many items are live.
+    """
+
+    def __init__(self, cell_km: float):
+        """
+        Args:
+            cell_km (float): The cell size.
+        """
+        self.cell_km = cell_km
+        self._cells = {}  # (x, y) -> {kind: {item: None}}, in insertion order
+        self._cell_of = {}  # item -> ((x, y), kind)
+
+    def cell(self, lat: float, lon: float) -> tuple:
+        """Returns the cell of a point; planar km are accurate enough across one city."""
+        x_km = lon * KM_PER_DEGREE * math.cos(math.radians(lat))
+        y_km = lat * KM_PER_DEGREE
+        return math.floor(x_km / self.cell_km), math.floor(y_km / self.cell_km)
+
+    def add(self, item, kind, lat: float, lon: float):
+        cell = self.cell(lat, lon)
+        self._cells.setdefault(cell, {}).setdefault(kind, {})[item] = None
+        self._cell_of[item] = (cell, kind)
+
+    def remove(self, item):
+        entry = self._cell_of.pop(item, None)
+        if entry is None:
+            return
+        cell, kind = entry
+        kinds = self._cells[cell]
+        del kinds[kind][item]
+        if not kinds[kind]:
+            del kinds[kind]
+            if not kinds:
+                del self._cells[cell]
+
+    def nearby(self, lat: float, lon: float) -> list:
+        """Returns (kind, latest item) per kind in the point's cell and the cells around it."""
+        cell_x, cell_y = self.cell(lat, lon)
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                kinds = self._cells.get((cell_x + dx, cell_y + dy))
+                if kinds:
+                    found.extend((kind, next(reversed(items))) for kind, items in kinds.items())
+        return found
+
+    def __len__(self):
+        return len(self._cell_of)
+
+
+class Incident:
+    """Live events correlated into one incident, led by its root cause."""
+
+    __slots__ = ("id", "sequence", "root_event", "events", "nodes", "planned_severity")
+
+    def __init__(self, incident_id: str, sequence: int, root_event: dict):
+        self.id = incident_id
+        self.sequence = sequence  # Order of creation; the older incident leads a merge.
+        self.root_event = root_event
+        self.events = {}  # eventId -> event, live members only
+        self.nodes = []  # eventIds in the union-find set, live or expired
+        # The highest severity the incident's current plan was made for.
+        self.planned_severity = None
+
+
+class IncidentCorrelator:
+    """Clusters live events into incidents by causal links and proximity."""
+
+    def __init__(
+        self,
+        radius_km: float = 1.0,
+        related_types: dict = None,
+        max_waiting: int = 10000,
+        clock=time.monotonic,
+    ):
+        """
+        Args:
+            radius_km (float): The grid cell size. Related events in the same
+                               or an adjacent cell join one incident. 0
+                               joins by `interdependencies` only.
+            related_types (dict, optional): dataType -> dataTypes that may be
+                                            joined by proximity. Defaults to
+                                            `related_data_types()`.
+            max_waiting (int): References to events not seen yet are kept
+                               (most recent first) so a cause that arrives
+                               after its effect is still joined.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.radius_km = radius_km
+        self.related_types = related_data_types() if related_types is None else related_types
+        self.max_waiting = max_waiting
+        self.clock = clock
+        self.grid = SpatialGrid(radius_km or 1.0)
+        self.events_correlated = 0
+        self.events_joined = 0
+        self.incidents_started = 0
+        self._parent = {}  # eventId -> parent eventId (union-find)
+        self._incidents = {}  # root node -> Incident
+        self._live = {}  # eventId -> (event, expires_at)
+        self._expiry = []  # heap of (expires_at, eventId); stale entries are skipped
+        self._waiting = OrderedDict()  # referenced eventId -> [referring eventIds]
+        self._lock = threading.Lock()
+
+    def _find(self, node):
+        root = node
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[node] != root:  # Path compression.
+            self._parent[node], node = root, self._parent[node]
+        return root
+
+    def _union(self, upstream, downstream):
+        """Joins two nodes' incidents; the upstream incident's root cause leads."""
+        upstream_root, downstream_root = self._find(upstream), self._find(downstream)
+        if upstream_root == downstream_root:
+            return
+        leader, absorbed = self._incidents[upstream_root], self._incidents.pop(downstream_root)
+        # Attach the smaller node set, keeping the leader's Incident object.
+        if len(absorbed.nodes) > len(leader.nodes):
+            self._parent[upstream_root] = downstream_root
+            self._incidents.pop(upstream_root)
+            self._incidents[downstream_root] = leader
+        else:
+            self._parent[downstream_root] = upstream_root
+        leader.events.update(absorbed.events)
+        leader.nodes.extend(absorbed.nodes)
+
+    def _expire(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, event_id = heapq.heappop(self._expiry)
+            entry = self._live.get(event_id)
+            if entry is None or entry[1] != expires_at:
+                continue  # The event was re-sent and lives on.
+            del self._live[event_id]
+            self.grid.remove(event_id)
+            root = self._find(event_id)
+            incident = self._incidents[root]
+            del incident.events[event_id]
+            if not incident.events:
+                del self._incidents[root]
+                for node in incident.nodes:
+                    del self._parent[node]
+            elif len(incident.nodes) > 2 * len(incident.events) + 64:
+                self._rebuild(root, incident)
+
+    def _rebuild(self, root, incident: Incident):
+        """Drops an incident's expired nodes, pointing its live ones at a new root."""
+        for node in incident.nodes:
+            del self._parent[node]
+        del self._incidents[root]
+        live = list(incident.events)
+        for node in live:
+            self._parent[node] = live[0]
+        incident.nodes = live
+        self._incidents[live[0]] = incident
+
+    def correlate(self, event: dict) -> Incident:
+        """
+        Adds an event and returns the incident it belongs to.
+
+        A re-sent event (same eventId) keeps its incident; its data is
+        updated and its validity restarted.
+
+        Args:
+            event (dict): A validated event.
+
+        Returns:
+            Incident: The event's incident.
+        """
+        event_id = event["eventId"]
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self.events_correlated += 1
+            expires_at = now + validity_seconds(event)
+            heapq.heappush(self._expiry, (expires_at, event_id))
+
+            if event_id in self._live:
+                incident = self._incidents[self._find(event_id)]
+                incident.events[event_id] = event
+                if incident.root_event.get("eventId") == event_id:
+                    incident.root_event = event
+                self._live[event_id] = (event, expires_at)
+                return incident
+
+            if event_id in self._parent:
+                # An expired event whose incident lives on rejoins it, keeping its node.
+                incident = self._incidents[self._find(event_id)]
+                incident.events[event_id] = event
+                if incident.root_event.get("eventId") == event_id:
+                    incident.root_event = event
+            else:
+                self._parent[event_id] = event_id
+                incident = Incident(f"incident_{event_id}", self.incidents_started, event)
+                incident.events[event_id] = event
+                incident.nodes.append(event_id)
+                self._incidents[event_id] = incident
+                self.incidents_started += 1
+            self._live[event_id] = (event, expires_at)
+
+            # Causes this event names, and effects that named it earlier.
+            for cause_id in linked_event_ids(event):
+                if cause_id in self._live:
+                    self._union(cause_id, event_id)
+                elif cause_id != event_id:
+                    self._waiting.setdefault(cause_id, []).append(event_id)
+                    self._waiting.move_to_end(cause_id)
+                    while len(self._waiting) > self.max_waiting:
+                        self._waiting.popitem(last=False)
+            for effect_id in self._waiting.pop(event_id, ()):
+                if effect_id in self._live:
+                    self._union(event_id, effect_id)
+
+            coordinates = event.get("location", {}).get("coordinates") or {}
+            lat, lon = coordinates.get("lat"), coordinates.get("lon")
+            if lat is not None and lon is not None and self.radius_km > 0:
+                data_type = event.get("dataType")
+                related = self.related_types.get(data_type, frozenset((data_type,)))
+                for neighbour_type, neighbour_id in self.grid.nearby(lat, lon):
+                    if neighbour_type not in related:
+                        continue
+                    # Proximity says nothing about direction; the older incident leads.
+                    mine, theirs = self._incidents[self._find(event_id)], self._incidents[self._find(neighbour_id)]
+                    if theirs.sequence <= mine.sequence:
+                        self._union(neighbour_id, event_id)
+                    else:
+                        self._union(event_id, neighbour_id)
+                self.grid.add(event_id, data_type, lat, lon)
+
+            incident = self._incidents[self._find(event_id)]
+            if len(incident.events) > 1:
+                self.events_joined += 1
+            return incident
+
+    def incident_of(self, event_id: str):
+        """Returns the live incident an event belongs to, or None."""
+        with self._lock:
+            if event_id not in self._live:
+                return None
+            return self._incidents[self._find(event_id)]
+
+    def related_events(self, event_id: str, limit: int = 10) -> list:
+        """
+        Returns the other live events of an event's incident, root cause first.
+
+        Args:
+            event_id (str): The event.
+            limit (int): The most events returned.
+        """
+        with self._lock:
+            if event_id not in self._live:
+                return []
+            incident = self._incidents[self._find(event_id)]
+            root = incident.root_event
+            others = [event for other_id, event in incident.events.items() if other_id != event_id and event is not root]
+            if root.get("eventId") != event_id and root.get("eventId") in incident.events:
+                others.insert(0, root)
+            return others[:limit]
+
+    def record_plan(self, event_id: str):
+        """Notes that the incident of an event was just planned, with all its live events."""
+        with self._lock:
+            if event_id not in self._live:
+                return
+            incident = self._incidents[self._find(event_id)]
+            incident.planned_severity = max(
+                SEVERITY_RANK.get(event.get("severity"), 0) for event in incident.events.values()
+            )
+
+    def covers(self, event: dict) -> bool:
+        """
+        Tells whether the plan of an event's incident already covers it.
+
+        True if the event joined an incident whose plan was made for at
+        least the event's severity, so a downstream effect of a planned
+        incident needs no new plan of its own.
+        """
+        with self._lock:
+            event_id = event.get("eventId")
+            if event_id not in self._live:
+                return False
+            incident = self._incidents[self._find(event_id)]
+            if len(incident.events) < 2 or incident.planned_severity is None:
+                return False
+            return SEVERITY_RANK.get(event.get("severity"), 0) <= incident.planned_severity
+
+    def stats(self) -> dict:
+        """Returns live event and incident counts and running totals."""
+        with self._lock:
+            return {
+                "live_events": len(self._live),
+                "incidents": len(self._incidents),
+                "events_correlated": self.events_correlated,
+                "events_joined": self.events_joined,
+                "incidents_started": self.incidents_started,
+            }
@@ -1,57 +1,316 @@
 """
-Streams synthetic event data to Firestore to simulate a real-time data feed.
+Streams event data to the agent to simulate a real-time data feed.
 
-This script reads events from `synthetic_data.json` and pushes them one by one
-to a Firestore collection, pausing between each dispatch to mimic a live stream.
+This script reads events from `synthetic_data.json` (or other sources) and
+publishes them on the event transport: the Firestore collection by default,
+or a local Unix socket with `--transport socket` (see transport.py). The
+in-memory transport only reaches subscribers in the same process, so it is
+available to `stream_data` callers (e.g. bench_pipeline.py) but not from the
+command line. By default it dispatches one event every 5 seconds to mimic a
+live stream; for load tests it doubles as a replay engine:
+- `--speed N` replays events on the schedule of their `timestamp`s, N times
+  faster than real time (`--speed max` sends them as fast as possible).
+- `--rate N` sends N events per second regardless of their timestamps.
+- Events are published in batches of up to `--batch-size` documents,
+  with `--concurrency` batches in flight at once.
+
+Sources may be `synthetic_data.json`-style event lists, NDJSON files with one
+event per line, or the `static/*_events.json` story files, whose entries'
+`source_event`s are replayed. At the end the achieved throughput and the lag
+behind the intended schedule are reported.
+
+Usage:
+    python data_dispatcher.py [SOURCE ...] [--speed 60 | --rate 500]
+                              [--batch-size 500] [--concurrency 4] [--dry-run]
+                              [--transport firestore|socket]
 """
 
+import argparse
 import asyncio
+import copy
+import glob
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
-from validate_data import is_event_valid
-
-# --- Firebase Initialization ---
-KEY_PATH = "credentials/agent-one-465916-c61b8803d4b8.json"
-try:
-    cred = credentials.Certificate(KEY_PATH)
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("DISPATCHER: Connected to Firestore.")
-except Exception as e:
-    print(f"DISPATCHER: Error connecting to Firestore: {e}")
-    exit()
-# -----------------------------
-
-
-async def stream_data():
-    """Reads events and streams them to the 'live_urban_events' collection."""
-    try:
-        with open("synthetic_data.json", "r") as f:
-            events = json.load(f)
-    except FileNotFoundError:
-        print("DISPATCHER ERROR: synthetic_data.json not found. Run data_simulator.py first.")
-        return
-
-    print("\n--- STARTING DATA DISPATCHER ---")
-    for event in events:
-        if is_event_valid(event):
+import math
+import os
+import time
+
+from data_schema import SCHEMA_TEMPLATE, parse_timestamp
+from transport import TRANSPORT_NAMES, create_transport
+from validate_data import format_errors, validate_batch
+
+# Firestore rejects batched writes with more than 500 operations.
+FIRESTORE_BATCH_LIMIT = 500
+DEFAULT_INTERVAL_SECONDS = 5
+# Invalid events listed per source file; the rest are only counted.
+MAX_REPORTED_INVALID = 20
+
+
+def event_from_entry(entry: dict) -> dict:
+    """
+    Returns the event to dispatch for one entry of a source file.
+
+    Story files hold `/recommend` payloads; their `source_event`s carry no
+    `data` or `severity`, so those are filled in (the severity from the
+    plan's priority) to make them valid events.
+    """
+    if "source_event" not in entry:
+        return entry
+    event = copy.deepcopy(entry["source_event"])
+    event.setdefault("data", {})
+    event.setdefault("severity", (entry.get("plan") or {}).get("priority") or SCHEMA_TEMPLATE["severity"])
+    event.setdefault("validity_period_minutes", SCHEMA_TEMPLATE["validity_period_minutes"])
+    event.setdefault("interdependencies", [])
+    return event
+
+
+def load_events(paths: list) -> list:
+    """
+    Reads, validates and time-orders the events from every source file.
+
+    Args:
+        paths (list): JSON or NDJSON files; glob patterns are expanded.
+
+    Returns:
+        list: The valid events, sorted by timestamp (stable for ties).
+    """
+    events = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, "r") as f:
+                if path.endswith((".ndjson", ".jsonl")):
+                    entries = (json.loads(line) for line in f if line.strip())
+                else:
+                    entries = json.load(f)
+                valid_events, rejected = validate_batch([event_from_entry(entry) for entry in entries])
+            events.extend(valid_events)
+            for record in rejected[:MAX_REPORTED_INVALID]:
+                print(f"Skipped Invalid Event: {record['eventId'] or 'Unknown ID'} ({format_errors(record['errors'])})")
+            if len(rejected) > MAX_REPORTED_INVALID:
+                print(f"Skipped {len(rejected) - MAX_REPORTED_INVALID} more invalid events in '{path}'.")
+    timestamps = [parse_timestamp(event.get("timestamp")) for event in events]
+    # Events without a usable timestamp keep their place at the end.
+    order = sorted(range(len(events)), key=lambda i: math.inf if math.isnan(timestamps[i]) else timestamps[i])
+    return [events[i] for i in order]
+
+
+def schedule_offsets(events: list, speed: float = None, rate: float = None) -> list:
+    """
+    Computes when each event is due, in seconds after the replay starts.
+
+    Args:
+        events (list): Time-ordered events.
+        speed (float, optional): Follow the events' timestamps, compressed by
+                                 this factor; `math.inf` sends at once.
+        rate (float, optional): Send this many events per second instead.
+
+    Returns:
+        list: One offset per event.
+    """
+    if rate:
+        return [i / rate for i in range(len(events))]
+    if not speed or math.isinf(speed):
+        return [0.0] * len(events)
+    timestamps = [parse_timestamp(event.get("timestamp")) for event in events]
+    first = next((t for t in timestamps if not math.isnan(t)), 0.0)
+    offsets = []
+    previous = 0.0
+    for timestamp in timestamps:
+        # Events without a usable timestamp go out with their predecessor.
+        previous = previous if math.isnan(timestamp) else max(previous, (timestamp - first) / speed)
+        offsets.append(previous)
+    return offsets
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def replay(events: list, offsets: list, write_batch, batch_size: int = 1, concurrency: int = 1, verbose: bool = True) -> dict:
+    """
+    Dispatches events on schedule through `concurrency` batch writers.
+
+    Each writer takes whatever due events are waiting (up to `batch_size`)
+    and writes them with one `write_batch` call on a worker thread. The
+    queue between the schedule and the writers is bounded, so a slow sink
+    shows up as lag instead of unbounded memory.
+
+    Args:
+        events (list): The events to send.
+        offsets (list): When each event is due (see `schedule_offsets`).
+        write_batch (callable): Writes a list of events; blocking is fine.
+        batch_size (int): The most events per write.
+        concurrency (int): Writes in flight at once.
+        verbose (bool): Print every dispatched event.
+
+    Returns:
+        dict: Throughput and lag figures.
+    """
+    pending = asyncio.Queue(maxsize=max(1, batch_size * concurrency * 2))
+    lags = []
+    counters = {"written": 0, "failed": 0, "batches": 0}
+    started = time.perf_counter()
+
+    async def produce():
+        for event, offset in zip(events, offsets):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await pending.put((event, started + offset))
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def write():
+        finished = False
+        while not finished:
+            item = await pending.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+
+            batch_events = [event for event, _ in batch]
             try:
-                doc_ref = db.collection("live_urban_events").document(event["eventId"])
-                doc_ref.set(event)
-                severity = event.get("severity", "N/A")
-                print(
-                    f"Dispatched Event: {event['eventId']} ({event['dataType']}) | Severity: {severity}"
-                )
+                await asyncio.to_thread(write_batch, batch_events)
             except Exception as e:
-                print(f"DISPATCHER ERROR: Failed to write to Firestore: {e}")
-        else:
-            print(f"Skipped Invalid Event: {event.get('eventId', 'Unknown ID')}")
+                counters["failed"] += len(batch)
+                print(f"DISPATCHER ERROR: Failed to publish events: {e}")
+                continue
+            done = time.perf_counter()
+            lags.extend(done - due for _, due in batch)
+            counters["written"] += len(batch)
+            counters["batches"] += 1
+            if verbose:
+                for event in batch_events:
+                    severity = event.get("severity", "N/A")
+                    print(f"Dispatched Event: {event['eventId']} ({event['dataType']}) | Severity: {severity}")
+
+    await asyncio.gather(produce(), *(write() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    lags.sort()
+    return {
+        "events": len(events),
+        "written": counters["written"],
+        "failed": counters["failed"],
+        "batches": counters["batches"],
+        "elapsed_seconds": elapsed,
+        "events_per_second": counters["written"] / elapsed if elapsed else 0.0,
+        "lag_p50_ms": percentile(lags, 0.50) * 1000,
+        "lag_p95_ms": percentile(lags, 0.95) * 1000,
+        "lag_max_ms": (lags[-1] if lags else 0.0) * 1000,
+    }
 
-        await asyncio.sleep(5)
 
+async def stream_data(
+    sources: list = ("synthetic_data.json",),
+    speed: float = None,
+    rate: float = None,
+    batch_size: int = 1,
+    concurrency: int = 1,
+    dry_run: bool = False,
+    verbose: bool = True,
+    transport=None,
+):
+    """
+    Reads events and publishes them on the event transport.
+
+    Without `speed` or `rate`, one event is sent every 5 seconds. `transport`
+    is an `EventTransport` or a transport name; by default EVENT_TRANSPORT
+    decides. See `replay` for the other arguments.
+
+    Returns:
+        dict | None: The replay report, or None if nothing could be sent.
+    """
+    if not speed and not rate:
+        rate = 1 / DEFAULT_INTERVAL_SECONDS
+    try:
+        events = load_events(list(sources))
+    except FileNotFoundError as e:
+        print(f"DISPATCHER ERROR: {e.filename} not found. Run data_simulator.py first.")
+        return None
+
+    owns_transport = False
+    if dry_run:
+        def write_batch(batch):
+            pass
+    else:
+        if transport is None or isinstance(transport, str):
+            transport = create_transport(transport)
+            owns_transport = True
+        try:
+            transport.connect()
+        except Exception as e:
+            print(f"DISPATCHER: Error connecting to {transport.name}: {e}")
+            return None
+        write_batch = transport.publish
+
+    pacing = f"{rate:g} events/s" if rate else f"{speed:g}x speed" if speed else "max speed"
+    print(f"\n--- STARTING DATA DISPATCHER ({len(events)} events, {pacing}, batches of {batch_size}, concurrency {concurrency}) ---")
+    report = await replay(
+        events, schedule_offsets(events, speed, rate), write_batch, batch_size, concurrency, verbose
+    )
+    if owns_transport:
+        transport.close()
     print("--- DATA DISPATCHER FINISHED ---")
+    print(
+        f"Dispatched {report['written']}/{report['events']} events in {report['elapsed_seconds']:.2f} s "
+        f"({report['events_per_second']:.0f} events/s, {report['batches']} batches, {report['failed']} failed). "
+        f"Lag p50 {report['lag_p50_ms']:.0f} ms, p95 {report['lag_p95_ms']:.0f} ms, max {report['lag_max_ms']:.0f} ms."
+    )
+    return report
+
+
+def parse_speed(value: str) -> float:
+    """Parses `--speed`: a multiplier such as 60, or "max"."""
+    if value.lower() == "max":
+        return math.inf
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
 
 
 if __name__ == "__main__":
-    asyncio.run(stream_data())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", default=["synthetic_data.json"], help="Event files or glob patterns, e.g. 'static/*_events.json'.")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=parse_speed, help="Replay by event timestamps at this multiple of real time, or 'max'.")
+    pacing.add_argument("--rate", type=float, help=f"Events per second (default: one every {DEFAULT_INTERVAL_SECONDS} s).")
+    parser.add_argument("--batch-size", type=int, default=1, help=f"Events per published batch (at most {FIRESTORE_BATCH_LIMIT}).")
+    parser.add_argument("--concurrency", type=int, default=1, help="Batches written in parallel.")
+    parser.add_argument("--dry-run", action="store_true", help="Schedule and batch events without writing them.")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final report.")
+    parser.add_argument(
+        "--transport",
+        choices=[name for name in TRANSPORT_NAMES if name != "memory"],
+        help="Where to publish (default: $EVENT_TRANSPORT or firestore).",
+    )
+    args = parser.parse_args()
+
+    if (args.transport or os.getenv("EVENT_TRANSPORT", "firestore")).lower() == "memory" and not args.dry_run:
+        parser.error("the memory transport has no subscribers outside this process; use --transport socket or firestore")
+
+    if not 1 <= args.batch_size <= FIRESTORE_BATCH_LIMIT:
+        parser.error(f"--batch-size must be between 1 and {FIRESTORE_BATCH_LIMIT}")
+    asyncio.run(
+        stream_data(
+            args.sources,
+            speed=args.speed,
+            rate=args.rate,
+            batch_size=args.batch_size,
+            concurrency=max(1, args.concurrency),
+            dry_run=args.dry_run,
+            verbose=not args.quiet,
+            transport=args.transport,
+        )
+    )
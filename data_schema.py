@@ -5,6 +5,9 @@ This module acts as a single source of truth for event formats, ensuring
 consistency across data simulation, validation, and processing.
 """
 
+import math
+from datetime import datetime
+
 SCHEMA_TEMPLATE = {
     "eventId": "",
     "dataType": "",
@@ -43,3 +46,43 @@ VALID_DATA_TYPES = [
     "public_event",
     "crime_report",
 ]
+
+
+# Follow-up events a severe event can set off in the same zone:
+# dataType -> [(follow-up dataType, relationship)].
+CAUSAL_LINKS = {
+    "weather": [("water_quality", "caused_by"), ("power_outage", "caused_by")],
+    "water_quality": [("traffic", "affected_by")],
+    "power_outage": [("public_transit_metro", "caused_by"), ("traffic", "affected_by")],
+    "fire_emergency": [("ambulance_dispatch", "caused_by"), ("air_quality_index", "caused_by"), ("traffic", "affected_by")],
+    "public_event": [("traffic", "caused_by"), ("public_transit_bus", "affected_by"), ("crime_report", "related_to")],
+    "public_transit_metro": [("public_transit_bus", "affected_by")],
+    "traffic": [("ambulance_dispatch", "affected_by")],
+}
+
+
+def validity_seconds(event: dict) -> float:
+    """
+    Returns how long an event (and any answer or plan made for it) stays
+    valid, in seconds.
+
+    `validity_period_minutes` is taken as a number even when it arrives as a
+    string (e.g. "15" in a hand-posted payload); a missing, non-numeric or
+    non-positive value falls back to the SCHEMA_TEMPLATE default.
+    """
+    value = event.get("validity_period_minutes") if isinstance(event, dict) else None
+    try:
+        minutes = None if isinstance(value, bool) else float(value)
+    except (TypeError, ValueError):
+        minutes = None
+    if minutes is None or not 0 < minutes < math.inf:
+        minutes = SCHEMA_TEMPLATE["validity_period_minutes"]
+    return minutes * 60
+
+
+def parse_timestamp(value: str) -> float:
+    """Parses an ISO-8601 event timestamp into epoch seconds (NaN if unreadable)."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return math.nan
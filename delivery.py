@@ -0,0 +1,327 @@
+"""
+Delivers the agent's plans to the protocol layer in the background.
+
+Posting each plan with a fresh `requests.post` costs a TCP handshake per plan
+and blocks the worker that generated it until the protocol layer answers.
+`PlanDelivery` instead queues payloads and sends them from one thread over a
+pooled keep-alive session. A batch of queued payloads goes out as one NDJSON
+request to `/recommend/batch`.
+
+Failed requests (connection errors, timeouts, 5xx answers) are retried with
+exponential backoff. Batches that still fail, and payloads that arrive while
+the queue is full, are appended to a spill-over JSONL file. That file is
+re-sent once the protocol layer accepts requests again, including after a
+restart of the agent, so a protocol outage does not lose plans. The file is
+moved aside while it is re-sent; if the agent stops before that finishes, the
+moved file is sent again, ahead of newer spills, on the next re-send. Payloads go
+out in the order they were queued, except that spilled payloads follow the
+newer ones that were delivered first.
+
+A request that timed out may still have been stored, so delivery is
+at-least-once. Each payload carries a `delivery_id` that the protocol layer
+uses to ignore the duplicates this can cause.
+"""
+
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY, SIZE_BUCKETS
+
+DELIVERY_QUEUE_SECONDS = REGISTRY.histogram(
+    "bureaux_delivery_queue_seconds", "Time plans wait in the delivery queue before being sent."
+)
+DELIVERY_REQUEST_SECONDS = REGISTRY.histogram(
+    "bureaux_delivery_request_seconds", "Duration of delivery requests to the protocol layer."
+)
+DELIVERY_BATCH_PLANS = REGISTRY.histogram(
+    "bureaux_delivery_batch_plans", "Plans per delivery request.", buckets=SIZE_BUCKETS
+)
+
+
+class PlanDelivery:
+    """A bounded queue of plan payloads drained by one sender thread."""
+
+    def __init__(
+        self,
+        batch_url: str,
+        batch_size: int = 200,
+        batch_wait_seconds: float = 0.05,
+        queue_size: int = 10000,
+        timeout_seconds: float = 5.0,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        backoff_max_seconds: float = 30.0,
+        spill_path: str = "delivery_spill.jsonl",
+        session=None,
+    ):
+        """
+        Args:
+            batch_url (str): The protocol layer's NDJSON bulk endpoint.
+            batch_size (int): The most payloads per request.
+            batch_wait_seconds (float): How long the sender waits for more
+                                        payloads after the first one before
+                                        sending a partial batch.
+            queue_size (int): The most payloads waiting in memory. Further
+                              payloads go straight to the spill file.
+            timeout_seconds (float): The connect and read timeout per request.
+            max_retries (int): Retries for a batch before it is spilled.
+            backoff_seconds (float): The delay before the first retry; it
+                                     doubles (with jitter) on each retry.
+            backoff_max_seconds (float): The cap on the retry delay.
+            spill_path (str): The spill-over JSONL file. "" disables spilling,
+                              so undeliverable payloads are dropped.
+            session (requests.Session, optional): The session to send with.
+        """
+        self.batch_url = batch_url
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.queue_size = queue_size
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.spill_path = spill_path
+        if session is None:
+            session = requests.Session()
+            # One sender thread needs one connection to the protocol layer.
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session = session
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._sending = False
+        self._counters = {
+            "queued": 0,
+            "delivered": 0,
+            "rejected": 0,
+            "requests": 0,
+            "retries": 0,
+            "spilled": 0,
+            "unspilled": 0,
+            "dropped": 0,
+            "max_depth": 0,
+        }
+
+    def start(self):
+        """Starts the sender thread. Plans spilled by an earlier run are re-sent first."""
+        self._thread = threading.Thread(target=self._run, name="plan-delivery", daemon=True)
+        self._thread.start()
+
+    def send(self, payload: dict) -> bool:
+        """
+        Queues a payload for delivery without blocking the caller.
+
+        Args:
+            payload (dict): A `/recommend` payload.
+
+        Returns:
+            bool: True if the payload was queued or spilled to disk, False if
+                  it had to be dropped.
+        """
+        payload.setdefault("delivery_id", uuid.uuid4().hex)
+        with self._condition:
+            if len(self._queue) < self.queue_size:
+                self._queue.append((time.monotonic(), payload))
+                self._counters["queued"] += 1
+                self._counters["max_depth"] = max(self._counters["max_depth"], len(self._queue))
+                self._condition.notify()
+                return True
+        return self._spill([payload])
+
+    def _next_batch(self) -> list:
+        with self._condition:
+            while not self._queue and not self._stopping:
+                self._condition.wait()
+            if not self._queue:
+                return []
+            # Give a burst a moment to fill the batch.
+            deadline = time.monotonic() + self.batch_wait_seconds
+            while len(self._queue) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            count = min(self.batch_size, len(self._queue))
+            self._sending = True
+            entries = [self._queue.popleft() for _ in range(count)]
+        now = time.monotonic()
+        for queued_at, _ in entries:
+            DELIVERY_QUEUE_SECONDS.observe(now - queued_at)
+        return [payload for _, payload in entries]
+
+    def _run(self):
+        self._resend_spilled()
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            delivered = self._post_with_retries(batch)
+            if not delivered:
+                self._spill(batch)
+            elif os.path.exists(self.spill_path or ""):
+                self._resend_spilled()
+            with self._condition:
+                self._sending = False
+                self._condition.notify_all()
+
+    def _post(self, batch: list) -> bool:
+        """
+        Sends one batch as NDJSON.
+
+        Returns:
+            bool: True once the protocol layer has answered the batch (even if
+                  it rejected some of its lines), False if it should be retried.
+        """
+        body = "".join(json.dumps(payload) + "\n" for payload in batch)
+        with self._condition:
+            self._counters["requests"] += 1
+        DELIVERY_BATCH_PLANS.observe(len(batch))
+        try:
+            with DELIVERY_REQUEST_SECONDS.time():
+                response = self.session.post(
+                    self.batch_url,
+                    data=body.encode("utf-8"),
+                    headers={"Content-Type": "application/x-ndjson"},
+                    timeout=self.timeout_seconds,
+                )
+        except requests.RequestException as e:
+            print(f"DELIVERY: Request failed: {e}")
+            return False
+
+        if response.status_code >= 500:
+            print(f"DELIVERY: Protocol layer error {response.status_code}.")
+            return False
+        rejected = len(batch)
+        if response.status_code == 200:
+            try:
+                rejected = len(response.json().get("rejected", []))
+            except ValueError:
+                rejected = 0
+        else:
+            # A client error will not go away by retrying.
+            print(f"DELIVERY: Batch refused. Status: {response.status_code}, Body: {response.text}")
+        with self._condition:
+            self._counters["delivered"] += len(batch) - rejected
+            self._counters["rejected"] += rejected
+        return True
+
+    def _post_with_retries(self, batch: list) -> bool:
+        delay = self.backoff_seconds
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._condition:
+                    self._counters["retries"] += 1
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.backoff_max_seconds)
+            if self._post(batch):
+                return True
+            if self._stopping:
+                break
+        return False
+
+    def _spill(self, payloads: list) -> bool:
+        if not self.spill_path:
+            with self._condition:
+                self._counters["dropped"] += len(payloads)
+            print(f"DELIVERY: Dropped {len(payloads)} undeliverable plan(s).")
+            return False
+        with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(payload) + "\n" for payload in payloads))
+            f.flush()
+            os.fsync(f.fileno())
+        with self._condition:
+            self._counters["spilled"] += len(payloads)
+        print(f"DELIVERY: Spilled {len(payloads)} plan(s) to '{self.spill_path}'.")
+        return True
+
+    def _resend_spilled(self):
+        """Re-sends the spill file; whatever cannot be delivered is spilled again."""
+        if not self.spill_path:
+            return
+        sending_path = self.spill_path + ".sending"
+        with self._spill_lock:
+            if os.path.exists(sending_path):
+                # Left by a re-send that never finished; its plans go first.
+                if os.path.exists(self.spill_path):
+                    with open(self.spill_path, "rb") as src, open(sending_path, "ab") as dst:
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.spill_path)
+            elif os.path.exists(self.spill_path):
+                os.replace(self.spill_path, sending_path)
+            else:
+                return
+        payloads = []
+        with open(sending_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    payloads.append(json.loads(line))
+                except ValueError:
+                    pass  # A line cut short by a crash while spilling.
+        print(f"DELIVERY: Re-sending {len(payloads)} spilled plan(s).")
+
+        for start in range(0, len(payloads), self.batch_size):
+            batch = payloads[start:start + self.batch_size]
+            if not self._post(batch):
+                self._spill(payloads[start:])
+                break
+            with self._condition:
+                self._counters["unspilled"] += len(batch)
+        os.remove(sending_path)
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Waits until every queued payload has been sent (or spilled).
+
+        Returns:
+            bool: True if the queue emptied before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._sending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Sends what is queued and stops the sender thread.
+
+        Payloads still queued after `timeout` are spilled to disk.
+        """
+        self.flush(timeout)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._condition:
+            leftover = [payload for _, payload in self._queue]
+            self._queue.clear()
+        if leftover:
+            self._spill(leftover)
+
+    def stats(self) -> dict:
+        """Returns delivery counters and the current queue depth."""
+        with self._condition:
+            stats = dict(self._counters)
+            stats["queue_depth"] = len(self._queue)
+            stats["plans_per_request"] = (
+                (stats["delivered"] + stats["rejected"]) / stats["requests"] if stats["requests"] else 0.0
+            )
+            return stats
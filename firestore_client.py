@@ -0,0 +1,67 @@
+"""
+Lazily initialized Firestore client shared by the agent and the dispatcher.
+
+Importing `firebase_admin` and opening the client takes seconds, so nothing
+happens at import time: the client is created on first use, or ahead of time
+by `warm_up()` on a background thread while the process does other work.
+"""
+
+import threading
+import time
+
+KEY_PATH = "credentials/agent-one-465916-c61b8803d4b8.json"
+EVENT_COLLECTION = "live_urban_events"
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """
+    Returns the Firestore client, connecting on the first call.
+
+    Returns:
+        google.cloud.firestore.Client: The shared client.
+
+    Raises:
+        Exception: If the credentials cannot be loaded or the client cannot
+                   be created. The next call retries.
+    """
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                started = time.perf_counter()
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+
+                if not firebase_admin._apps:
+                    firebase_admin.initialize_app(credentials.Certificate(KEY_PATH))
+                _db = firestore.client()
+                print(f"FIRESTORE: Connected in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return _db
+
+
+def warm_up(background: bool = True):
+    """
+    Connects to Firestore ahead of first use.
+
+    Args:
+        background (bool): Connect on a daemon thread and return immediately.
+                           Errors are printed; `get_db()` will retry.
+    """
+    def connect():
+        try:
+            get_db()
+        except Exception as e:
+            print(f"FIRESTORE: Warm-up failed: {e}")
+
+    if background:
+        threading.Thread(target=connect, name="firestore-warm-up", daemon=True).start()
+    else:
+        connect()
+
+
+def is_ready() -> bool:
+    """True once the Firestore client exists."""
+    return _db is not None
@@ -0,0 +1,359 @@
+"""
+Pluggable LLM backends behind the agent's `generate_content` calls.
+
+`model.py` talks to whichever backend `create_backend()` selects, so the
+agentic loop can run without live credentials:
+- vertex: Gemini 1.5 Pro on Vertex AI (the production backend).
+- stub: a deterministic local model with a configurable latency
+  distribution, for load tests, profiling and benchmarks.
+- record: calls another backend and appends every response to a JSONL file.
+- replay: answers from such a file, keyed by prompt hash, without a network.
+
+Every backend returns an object with a `.text` attribute and a
+`.usage_metadata` carrying `prompt_token_count` and `candidates_token_count`,
+mirroring the Vertex AI response. `generate_content_stream` yields the same
+kind of object per chunk of text; usage is reported on the last chunk.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+BACKEND_NAMES = ("vertex", "stub", "record", "replay")
+
+
+def prompt_hash(prompt: str) -> str:
+    """Returns the SHA-256 hex digest used to key recorded responses."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates a token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class UsageMetadata:
+    """Token counts for one LLM call."""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class LLMResponse:
+    """A backend-independent LLM response."""
+
+    def __init__(self, text: str, usage_metadata: UsageMetadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class LLMBackend:
+    """The interface every backend implements."""
+
+    name = "base"
+
+    def generate_content(self, prompt: str):
+        """
+        Generates a response for `prompt`.
+
+        Args:
+            prompt (str): The full prompt.
+
+        Returns:
+            A response with `.text` and `.usage_metadata`.
+        """
+        raise NotImplementedError
+
+    def generate_content_stream(self, prompt: str):
+        """
+        Generates a response for `prompt` as a stream of text chunks.
+
+        Backends without native streaming yield the whole response at once.
+
+        Args:
+            prompt (str): The full prompt.
+
+        Yields:
+            Responses with `.text` (the next chunk) and `.usage_metadata`
+            (None except on the last chunk).
+        """
+        yield self.generate_content(prompt)
+
+
+class VertexBackend(LLMBackend):
+    """Gemini on Vertex AI, authenticated with a service account key."""
+
+    name = "vertex"
+
+    def __init__(self, key_path: str, project_id: str, location: str, model_name: str = "gemini-1.5-pro"):
+        """
+        Args:
+            key_path (str): Path to the service account JSON key.
+            project_id (str): The Google Cloud project.
+            location (str): The Vertex AI region.
+            model_name (str): The Gemini model to use.
+
+        Raises:
+            Exception: If the credentials cannot be loaded or Vertex AI
+                       cannot be initialized.
+        """
+        import vertexai
+        from google.oauth2 import service_account
+        from vertexai.generative_models import GenerativeModel
+
+        credentials = service_account.Credentials.from_service_account_file(key_path)
+        vertexai.init(project=project_id, location=location, credentials=credentials)
+        self.model = GenerativeModel(model_name)
+
+    def generate_content(self, prompt: str):
+        return self.model.generate_content(prompt)
+
+    def generate_content_stream(self, prompt: str):
+        return self.model.generate_content(prompt, stream=True)
+
+
+class StubBackend(LLMBackend):
+    """
+    A deterministic offline model that mimics the shape of Gemini's answers.
+
+    The same prompt always produces the same text (and, for a given seed, the
+    same simulated latency). Diagnosis prompts get a one-line "Crisis: ...
+    Severity: N/10." answer, planning prompts a valid JSON plan and batched
+    diagnosis prompts a JSON object keyed by event ID.
+    """
+
+    name = "stub"
+
+    LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        distribution: str = "fixed",
+        jitter: float = 0.5,
+        seed: int = 0,
+        stream_chunk_chars: int = 32,
+    ):
+        """
+        Args:
+            latency_ms (float): The mean simulated latency per call.
+            distribution (str): "fixed", "uniform" (mean ± jitter * mean) or
+                                "lognormal" (sigma = jitter).
+            jitter (float): The spread parameter of the distribution.
+            seed (int): Varies the simulated latencies between runs.
+            stream_chunk_chars (int): Characters per streamed chunk. The
+                                      latency is spread evenly over the
+                                      chunks, like token-by-token decoding.
+
+        Raises:
+            ValueError: If `distribution` is not supported.
+        """
+        if distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'. Use one of {self.LATENCY_DISTRIBUTIONS}.")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.jitter = jitter
+        self.seed = seed
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+
+    def sample_latency(self, digest: str) -> float:
+        """Returns the simulated latency in seconds for a prompt digest."""
+        if self.latency_ms <= 0:
+            return 0.0
+        rng = random.Random(f"{self.seed}:{digest}")
+        if self.distribution == "uniform":
+            latency = rng.uniform(1 - self.jitter, 1 + self.jitter) * self.latency_ms
+        elif self.distribution == "lognormal":
+            # Scaled so the mean stays at latency_ms.
+            latency = self.latency_ms * rng.lognormvariate(-(self.jitter ** 2) / 2, self.jitter)
+        else:
+            latency = self.latency_ms
+        return max(latency, 0.0) / 1000
+
+    @staticmethod
+    def _field(prompt: str, name: str, default: str) -> str:
+        # Matches both `'key': 'value'` (dict repr) and `"key":"value"` (JSON).
+        match = re.search(rf"""["']{name}["']\s*:\s*["']([^"']+)""", prompt)
+        return match.group(1) if match else default
+
+    def _diagnose(self, situation: str, digest: str) -> str:
+        data_type = self._field(situation, "dataType", "urban").replace("_", " ")
+        zone = self._field(situation, "zone", "the city")
+        severity = self._field(situation, "severity", "MEDIUM")
+        score = {"LOW": 3, "MEDIUM": 5, "HIGH": 8, "CRITICAL": 10}.get(severity, 5)
+        score = max(1, min(10, score + int(digest[0], 16) % 2))
+        return f"Crisis: {data_type} incident at {zone}. Severity: {score}/10."
+
+    def _plan(self, prompt: str) -> str:
+        diagnosis = prompt.rsplit("Diagnosis:", 1)[-1]
+        match = re.search(r"Crisis:\s*(.+?) incident at (.+?)\.", diagnosis)
+        crisis, zone = match.groups() if match else ("urban", "the affected area")
+        severity = re.search(r"Severity:\s*(\d+)", diagnosis)
+        score = int(severity.group(1)) if severity else 5
+        priority = "CRITICAL" if score >= 9 else "HIGH" if score >= 7 else "MEDIUM" if score >= 4 else "LOW"
+        plan = {
+            "plan_title": f"Contain {crisis} at {zone}",
+            "priority": priority,
+            "steps": [
+                {"action_id": 1, "action": "Dispatch Response Team", "details": f"Send the nearest {crisis} response unit to {zone}."},
+                {"action_id": 2, "action": "Coordinate Agencies", "details": f"Alert BBMP, traffic police and utilities about the {crisis} at {zone}."},
+                {"action_id": 3, "action": "Issue Public Advisory", "details": f"Publish an advisory for citizens around {zone}."},
+            ],
+        }
+        return json.dumps(plan, indent=2)
+
+    def _diagnose_batch(self, prompt: str) -> str:
+        diagnoses = {}
+        for event_id, situation in re.findall(r"^\s*\[([^\]]+)\]\s*(.+)$", prompt, re.MULTILINE):
+            diagnoses[event_id] = self._diagnose(situation, prompt_hash(situation))
+        return json.dumps(diagnoses)
+
+    def respond(self, prompt: str) -> str:
+        """Returns the deterministic response text for `prompt`."""
+        if "Diagnoses (JSON):" in prompt:
+            return self._diagnose_batch(prompt)
+        if "Action Plan (JSON):" in prompt:
+            return self._plan(prompt)
+        situation = prompt.rsplit("Data:", 1)[-1]
+        return self._diagnose(situation, prompt_hash(prompt))
+
+    def generate_content(self, prompt: str):
+        digest = prompt_hash(prompt)
+        latency = self.sample_latency(digest)
+        if latency:
+            time.sleep(latency)
+        text = self.respond(prompt)
+        return LLMResponse(text, UsageMetadata(estimate_tokens(prompt), estimate_tokens(text)))
+
+    def generate_content_stream(self, prompt: str):
+        digest = prompt_hash(prompt)
+        latency = self.sample_latency(digest)
+        text = self.respond(prompt)
+        size = self.stream_chunk_chars
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        for i, chunk in enumerate(chunks):
+            if latency:
+                time.sleep(latency / len(chunks))
+            usage = None
+            if i == len(chunks) - 1:
+                usage = UsageMetadata(estimate_tokens(prompt), estimate_tokens(text))
+            yield LLMResponse(chunk, usage)
+
+
+class RecordingBackend(LLMBackend):
+    """Wraps another backend and records each response to a JSONL file."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, path: str):
+        """
+        Args:
+            inner (LLMBackend): The backend that actually answers.
+            path (str): The JSONL file responses are appended to.
+        """
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _record(self, prompt: str, text: str, usage):
+        record = {
+            "prompt_sha256": prompt_hash(prompt),
+            "text": text,
+            "prompt_tokens": usage.prompt_token_count if usage else estimate_tokens(prompt),
+            "response_tokens": usage.candidates_token_count if usage else estimate_tokens(text),
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def generate_content(self, prompt: str):
+        response = self.inner.generate_content(prompt)
+        self._record(prompt, response.text, getattr(response, "usage_metadata", None))
+        return response
+
+    def generate_content_stream(self, prompt: str):
+        # Recorded once the stream completes, so replays see the whole text.
+        texts = []
+        usage = None
+        for chunk in self.inner.generate_content_stream(prompt):
+            texts.append(chunk.text)
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            yield chunk
+        self._record(prompt, "".join(texts), usage)
+
+
+class ReplayBackend(LLMBackend):
+    """Answers prompts from a file written by `RecordingBackend`."""
+
+    name = "replay"
+
+    def __init__(self, path: str, fallback: LLMBackend = None):
+        """
+        Args:
+            path (str): The JSONL recording to replay.
+            fallback (LLMBackend, optional): Answers prompts missing from the
+                                             recording. Without one they raise.
+        """
+        self.fallback = fallback
+        self.misses = 0
+        self._responses = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._responses[record["prompt_sha256"]] = record
+
+    def generate_content(self, prompt: str):
+        record = self._responses.get(prompt_hash(prompt))
+        if record is None:
+            self.misses += 1
+            if self.fallback is None:
+                raise KeyError("Prompt not found in the LLM recording; re-record with LLM_BACKEND=record.")
+            return self.fallback.generate_content(prompt)
+        return LLMResponse(
+            record["text"], UsageMetadata(record["prompt_tokens"], record["response_tokens"])
+        )
+
+
+def create_backend(name: str = None, **vertex_settings) -> LLMBackend:
+    """
+    Builds the backend selected by `name` or the LLM_BACKEND variable.
+
+    The stub is tuned with LLM_STUB_LATENCY_MS, LLM_STUB_DISTRIBUTION,
+    LLM_STUB_JITTER, LLM_STUB_SEED and LLM_STUB_CHUNK_CHARS. Recording wraps
+    Vertex AI unless LLM_RECORD_INNER=stub; both record and replay use
+    LLM_REPLAY_FILE.
+
+    Args:
+        name (str, optional): One of BACKEND_NAMES. Defaults to "vertex".
+        **vertex_settings: Passed to `VertexBackend` when it is used.
+
+    Returns:
+        LLMBackend: The configured backend.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    name = (name or os.getenv("LLM_BACKEND", "vertex")).lower()
+    replay_file = os.getenv("LLM_REPLAY_FILE", "llm_recording.jsonl")
+
+    if name == "vertex":
+        return VertexBackend(**vertex_settings)
+    if name == "stub":
+        return StubBackend(
+            latency_ms=float(os.getenv("LLM_STUB_LATENCY_MS", "0")),
+            distribution=os.getenv("LLM_STUB_DISTRIBUTION", "fixed"),
+            jitter=float(os.getenv("LLM_STUB_JITTER", "0.5")),
+            seed=int(os.getenv("LLM_STUB_SEED", "0")),
+            stream_chunk_chars=int(os.getenv("LLM_STUB_CHUNK_CHARS", "32")),
+        )
+    if name == "record":
+        inner = create_backend(os.getenv("LLM_RECORD_INNER", "vertex"), **vertex_settings)
+        return RecordingBackend(inner, replay_file)
+    if name == "replay":
+        return ReplayBackend(replay_file)
+    raise ValueError(f"Unknown LLM backend '{name}'. Use one of {BACKEND_NAMES}.")
@@ -0,0 +1,134 @@
+"""
+An LRU + TTL memoization cache for the agent's LLM calls.
+
+Bursts of near-identical events (e.g. the run of traffic events the simulator
+emits for a single flood) describe the same situation, so `reason()` and
+`plan()` can reuse a recent answer instead of paying another Gemini round
+trip. Events are keyed on a normalized signature: dataType, zone, severity
+and their data values rounded to a coarse precision. Entries live for the
+event's `validity_period_minutes`.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def coarsen_value(value, significant_digits: int = 1):
+    """
+    Rounds numbers to a few significant digits so nearby readings collide.
+
+    Args:
+        value: A data value from an event.
+        significant_digits (int): How many significant digits to keep.
+
+    Returns:
+        The coarsened number, the lower-cased string, or None for values that
+        should not take part in the signature (nested structures).
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if value == 0 or not math.isfinite(value):
+            return value
+        digits = significant_digits - 1 - int(math.floor(math.log10(abs(value))))
+        return round(value, digits)
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    return None
+
+
+def event_signature(event: dict, significant_digits: int = 1) -> tuple:
+    """
+    Builds a hashable signature describing the situation an event reports.
+
+    Args:
+        event (dict): The event data.
+        significant_digits (int): Precision used for numeric data values.
+
+    Returns:
+        tuple: (dataType, zone, severity, coarsened data items).
+    """
+    data = event.get("data") or {}
+    coarse_items = []
+    for key in sorted(data):
+        coarse = coarsen_value(data[key], significant_digits)
+        if coarse is not None:
+            coarse_items.append((key, coarse))
+    return (
+        str(event.get("dataType", "")).lower(),
+        " ".join(str((event.get("location") or {}).get("zone", "")).split()).lower(),
+        str(event.get("severity", "")).upper(),
+        tuple(coarse_items),
+    )
+
+
+class LLMCache:
+    """A thread-safe LRU cache whose entries also expire after a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, clock=time.monotonic):
+        """
+        Args:
+            max_entries (int): Entries kept before the least recently used
+                               one is evicted.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value for `key`, or None on a miss or expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value, ttl_seconds: float):
+        """
+        Stores `value` under `key` for `ttl_seconds`, evicting the LRU entry
+        if the cache is full.
+        """
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every entry; the statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
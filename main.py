@@ -1,114 +1,767 @@
 """
 The main entry point for the agentic engine.
 
-This script connects to Firestore, listens for new events in the
-'live_urban_events' collection, and triggers the agent's cognitive loop
+This script subscribes to the event transport (by default the Firestore
+'live_urban_events' collection; see transport.py), listens for new events,
+and triggers the agent's cognitive loop
 (perceive, reason, plan) when a significant new event is detected.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-import requests
+import os
 import time
 import threading
 import json
 
-from model import perceive, reason, plan, adapt, REASONING_EXAMPLES, PLANNING_EXAMPLES
-from validate_data import is_event_valid
-
-# --- Firebase Initialization ---
-KEY_PATH = "credentials/agent-one-465916-c61b8803d4b8.json"
-try:
-    cred = credentials.Certificate(KEY_PATH)
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("MAIN: Connected to Firestore.")
-except Exception as e:
-    print(f"MAIN: Error connecting to Firestore: {e}")
-    exit()
-# -----------------------------
+import model
+from model import (
+    perceive,
+    reason,
+    reason_batch,
+    plan,
+    adapt,
+    ClassifiedPlan,
+    crisis_group_for,
+    llm_cache,
+    thread_llm_calls,
+    REASONING_EXAMPLES,
+    PLANNING_EXAMPLES,
+)
+from batch_reasoner import BatchReasoner
+from checkpoint import EventCheckpoint, event_digest
+from coalescer import EventCoalescer
+from correlation import IncidentCorrelator
+from data_schema import validity_seconds
+from delivery import PlanDelivery
+from metrics import REGISTRY, MetricsPusher
+from plan_library import PlanLibrary
+from plan_registry import ActivePlanRegistry
+from scheduler import PriorityScheduler
+from transport import create_transport
+from validate_data import format_errors, validate_batch
+from worker_pool import WorkerPool
+
+# --- Event Transport ---
+# EVENT_TRANSPORT selects where events come from: "firestore" (default),
+# "memory" (in-process) or "socket" (a Unix socket at EVENT_SOCKET_PATH, fed
+# by `data_dispatcher.py --transport socket`).
+EVENT_TRANSPORT = os.getenv("EVENT_TRANSPORT", "firestore")
+event_transport = create_transport(EVENT_TRANSPORT)
+# -----------------------
+
+# --- Event Checkpoint ---
+# Handled eventIds and content hashes are kept in EVENT_CHECKPOINT_FILE, so a
+# restart (whose initial snapshot re-delivers the whole collection) or a
+# touched document does not re-plan events that did not change. Only events
+# that got a new plan or were covered by the active plan are recorded; events
+# that were dropped, expired or got an invalid plan are planned again when
+# re-delivered. "" keeps the checkpoint in memory only.
+EVENT_CHECKPOINT_FILE = os.getenv("EVENT_CHECKPOINT_FILE", "event_checkpoint.jsonl")
+event_checkpoint = EventCheckpoint(
+    EVENT_CHECKPOINT_FILE,
+    max_entries=int(os.getenv("EVENT_CHECKPOINT_MAX_ENTRIES", "100000")),
+)
+# --------------------------
+
+# --- Incident Correlation ---
+# Events linked through `interdependencies`, or of causally related types in
+# neighbouring CORRELATION_RADIUS_KM grid cells, form one incident (see
+# correlation.py). The incident is keyed, diagnosed and planned by its root
+# cause, and its downstream effects are covered by that plan.
+INCIDENT_CORRELATION = os.getenv("INCIDENT_CORRELATION", "1") == "1"
+CORRELATION_RADIUS_KM = float(os.getenv("CORRELATION_RADIUS_KM", "1.0"))
+incident_correlator = IncidentCorrelator(radius_km=CORRELATION_RADIUS_KM) if INCIDENT_CORRELATION else None
+# ------------------------------
+
+# --- Readiness ---
+# When set, a small JSON status file is written here once both the event
+# transport and the LLM backend are initialized (for container readiness probes)
+# and removed on shutdown.
+AGENT_READY_FILE = os.getenv("AGENT_READY_FILE", "")
+# -----------------
 
 # --- Global State ---
-current_plan = {}
+# One active plan per incident, keyed by (crisis group, zone); see
+# plan_registry.py.
+active_plans = ActivePlanRegistry()
 stop_event = threading.Event()
 # --------------------
 
+# --- Agent Worker Pool ---
+# Events are handed from the transport callback to a bounded queue and served
+# by a pool of workers, so LLM round trips run in parallel.
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "4"))
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "100"))
+AGENT_QUEUE_OVERFLOW = os.getenv("AGENT_QUEUE_OVERFLOW", "drop_oldest")
+# -------------------------
+
+# --- Agent Scheduler ---
+# With AGENT_SCHEDULER "priority" the workers take the most severe event
+# first; waiting SCHEDULER_AGING_SECONDS raises an event one severity class.
+# An event still queued after its validity period (counted from receipt) is
+# downgraded to a plan library template (SCHEDULER_EXPIRED_POLICY "downgrade")
+# or dropped ("drop"). With live sources, SCHEDULER_TIMESTAMP_DEADLINES=1 also
+# ends it that long after its timestamp, so an event stale on arrival is not
+# planned; leave it off for replayed or generated historical events.
+# A full queue evicts expired, then lowest-priority events. "fifo" serves in
+# arrival order. The LLM request rate limit is configured in model.py.
+AGENT_SCHEDULER = os.getenv("AGENT_SCHEDULER", "priority")
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "60"))
+SCHEDULER_EXPIRED_POLICY = os.getenv("SCHEDULER_EXPIRED_POLICY", "downgrade")
+SCHEDULER_TIMESTAMP_DEADLINES = os.getenv("SCHEDULER_TIMESTAMP_DEADLINES", "0") == "1"
+if AGENT_SCHEDULER not in ("priority", "fifo"):
+    raise ValueError(f"Unknown AGENT_SCHEDULER '{AGENT_SCHEDULER}'. Use 'priority' or 'fifo'.")
+if SCHEDULER_EXPIRED_POLICY not in ("downgrade", "drop"):
+    raise ValueError(f"Unknown SCHEDULER_EXPIRED_POLICY '{SCHEDULER_EXPIRED_POLICY}'. Use 'downgrade' or 'drop'.")
+# -----------------------
+
+# --- Event Coalescing ---
+# Events for the same (zone, crisis group) arriving within the window are
+# planned once, on the most severe (or latest) of them. 0 disables.
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "2.0"))
+COALESCE_POLICY = os.getenv("COALESCE_POLICY", "most_severe")
+# ------------------------
+
+# --- Plan Delivery ---
+# Plans are queued and posted to the protocol layer's NDJSON bulk endpoint by
+# a background sender over one keep-alive connection, with retries. Plans it
+# cannot deliver are kept in DELIVERY_SPILL_FILE and re-sent later.
+PROTOCOL_URL = os.getenv("PROTOCOL_URL", "http://127.0.0.1:5000")
+plan_delivery = PlanDelivery(
+    f"{PROTOCOL_URL}/recommend/batch",
+    batch_size=int(os.getenv("DELIVERY_BATCH_SIZE", "200")),
+    batch_wait_seconds=float(os.getenv("DELIVERY_BATCH_WAIT_SECONDS", "0.05")),
+    queue_size=int(os.getenv("DELIVERY_QUEUE_SIZE", "10000")),
+    timeout_seconds=float(os.getenv("DELIVERY_TIMEOUT_SECONDS", "5")),
+    max_retries=int(os.getenv("DELIVERY_MAX_RETRIES", "5")),
+    spill_path=os.getenv("DELIVERY_SPILL_FILE", "delivery_spill.jsonl"),
+)
+# ---------------------
+
+# --- Metrics ---
+# Per-stage timings and agent counters (see metrics.py), pushed to the
+# protocol layer's /metrics every METRICS_PUSH_SECONDS. 0 disables pushing.
+METRICS_PUSH_SECONDS = float(os.getenv("METRICS_PUSH_SECONDS", "10"))
+metrics_pusher = MetricsPusher(f"{PROTOCOL_URL}/metrics/push", interval_seconds=METRICS_PUSH_SECONDS)
+STAGE_SECONDS = REGISTRY.histogram("bureaux_stage_seconds", "Time spent per agent pipeline stage.", ("stage",))
+TRANSPORT_SECONDS = STAGE_SECONDS.labels("transport")
+QUEUE_WAIT_SECONDS = STAGE_SECONDS.labels("queue_wait")
+ADAPT_SECONDS = STAGE_SECONDS.labels("adapt")
+REASON_SECONDS = STAGE_SECONDS.labels("reason")
+PLAN_FIRST_STEP_SECONDS = STAGE_SECONDS.labels("plan_first_step")
+PLAN_SECONDS = STAGE_SECONDS.labels("plan")
+JSON_CLEANUP_SECONDS = STAGE_SECONDS.labels("json_cleanup")
+EVENT_SECONDS = STAGE_SECONDS.labels("event_total")
+SCHEDULER_WAIT_SECONDS = REGISTRY.histogram(
+    "bureaux_scheduler_wait_seconds", "Time events waited for an agent worker, by severity.", ("severity",)
+)
+EVENTS_RECEIVED = REGISTRY.counter("bureaux_events_received_total", "Events received from the transport.", ("result",))
+EVENT_DECISIONS = REGISTRY.counter("bureaux_event_decisions_total", "Agent decisions per processed event.", ("decision",))
+REGISTRY.gauge("bureaux_agent_queue_depth", "Events waiting for an agent worker.", callback=lambda: agent_pool.stats()["queue_depth"])
+REGISTRY.counter(
+    "bureaux_events_expired_total",
+    "Events that outlived their validity while queued.",
+    callback=lambda: agent_pool.stats()["expired"],
+)
+REGISTRY.counter(
+    "bureaux_llm_throttled_total",
+    "LLM calls that waited for the rate limit.",
+    callback=lambda: model.llm_rate_limiter.stats()["throttled"] if model.llm_rate_limiter else 0,
+)
+REGISTRY.gauge("bureaux_active_plans", "Incidents with an active plan.", callback=lambda: active_plans.stats()["active_plans"])
+REGISTRY.counter(
+    "bureaux_events_coalesced_total", "Events merged into another event's plan.", callback=lambda: event_coalescer.stats()["events_merged"]
+)
+REGISTRY.counter(
+    "bureaux_events_skipped_total", "Events skipped as already handled.", callback=lambda: event_checkpoint.stats()["skipped"]
+)
+REGISTRY.counter(
+    "bureaux_llm_calls_avoided_total",
+    "LLM calls avoided by skipping already handled events.",
+    callback=lambda: event_checkpoint.stats()["llm_calls_avoided"],
+)
+REGISTRY.counter(
+    "bureaux_plan_library_lookups_total",
+    "Template plan lookups by outcome.",
+    ("result",),
+    callback=lambda: {(result,): plan_library.stats()[result + "s"] for result in ("hit", "miss")} if plan_library else {},
+)
+REGISTRY.gauge(
+    "bureaux_live_incidents",
+    "Incidents with live correlated events.",
+    callback=lambda: incident_correlator.stats()["incidents"] if incident_correlator else 0,
+)
+REGISTRY.counter(
+    "bureaux_events_correlated_total",
+    "Events that joined an incident with other live events.",
+    callback=lambda: incident_correlator.stats()["events_joined"] if incident_correlator else 0,
+)
+REGISTRY.gauge("bureaux_delivery_queue_depth", "Plans waiting for delivery.", callback=lambda: plan_delivery.stats()["queue_depth"])
+REGISTRY.counter(
+    "bureaux_delivery_plans_total",
+    "Plans handed to the protocol layer by outcome.",
+    ("outcome",),
+    callback=lambda: {
+        (outcome,): count
+        for outcome, count in plan_delivery.stats().items()
+        if outcome in ("delivered", "rejected", "spilled", "dropped")
+    },
+)
+# ---------------
 
-def send_plan_to_protocol(plan_json: str, source_event: dict):
+# --- Streaming Plans ---
+# With PLAN_STREAMING on, the plan title, priority and each step are posted to
+# the protocol layer as soon as Gemini has generated them ("streaming"
+# records), and replaced by the complete plan ("final") when it is done. If
+# the complete plan is not valid JSON, a "cancelled" record removes them.
+PLAN_STREAMING = os.getenv("PLAN_STREAMING", "1") == "1"
+# -----------------------
+
+# --- Plan Library ---
+# A template plan from PLAN_LIBRARY_FILE (built offline by plan_library.py)
+# is posted as a provisional "streaming" plan as soon as an event for an
+# incident without an active plan arrives; the LLM's plan replaces it. If no
+# LLM plan will (the event is covered by a plan made meanwhile, dropped or
+# expired), the active plan or the template itself is posted as final.
+# Provisional plans are tracked by eventId, since correlation may re-root the
+# incident before it is planned; planning an incident takes every provisional
+# plan of its current events. A missing file disables this.
+PLAN_LIBRARY_FILE = os.getenv("PLAN_LIBRARY_FILE", "plan_library.json")
+plan_library = None
+if PLAN_LIBRARY_FILE and os.path.exists(PLAN_LIBRARY_FILE):
+    try:
+        plan_library = PlanLibrary.load(PLAN_LIBRARY_FILE)
+        print(f"MAIN: Loaded {len(plan_library)} template plans from {PLAN_LIBRARY_FILE}.")
+    except (OSError, ValueError) as e:
+        print(f"MAIN: Could not load the plan library {PLAN_LIBRARY_FILE}: {e}")
+provisional_plans = {}  # eventId -> (event its provisional plan was posted for, expires_at)
+provisional_plans_lock = threading.Lock()
+# --------------------
+
+# --- Batched Diagnosis ---
+# With REASON_BATCH_SIZE > 1, diagnoses requested by concurrent workers are
+# sent to Gemini together, waiting at most REASON_BATCH_WAIT_SECONDS. A batch
+# describes each event on its own, so an event with correlated related events
+# is diagnosed with a single-event reason() call that includes them instead.
+REASON_BATCH_SIZE = int(os.getenv("REASON_BATCH_SIZE", "1"))
+REASON_BATCH_WAIT_SECONDS = float(os.getenv("REASON_BATCH_WAIT_SECONDS", "0.25"))
+batch_reasoner = None
+if REASON_BATCH_SIZE > 1:
+    batch_reasoner = BatchReasoner(
+        lambda events: reason_batch(events, REASONING_EXAMPLES),
+        max_batch_size=REASON_BATCH_SIZE,
+        max_wait_seconds=REASON_BATCH_WAIT_SECONDS,
+    )
+# -------------------------
+
+
+def post_plan(
+    plan_dict: dict, source_event: dict, merged_event_ids: list = (), plan_status: str = None, plan_source: str = None
+) -> bool:
+    """
+    Queues a plan and its source event for delivery to the Flask API.
+
+    Args:
+        plan_dict (dict): The (possibly partial) plan.
+        source_event (dict): The event that triggered the plan generation.
+        merged_event_ids (list, optional): IDs of events coalesced into this
+                                           plan without being planned on.
+        plan_status (str, optional): "streaming" for a partial plan that a
+                                     later post replaces, "final" for the
+                                     plan that replaces it, "cancelled" to
+                                     remove the partial plans instead.
+        plan_source (str, optional): "library" for a template plan from the
+                                     plan library.
+
+    Returns:
+        bool: True if the plan was queued (or spilled to disk) for delivery.
+    """
+    payload = {"plan": plan_dict, "source_event": source_event}
+    if merged_event_ids:
+        payload["merged_events"] = list(merged_event_ids)
+    if plan_status:
+        payload["plan_status"] = plan_status
+    if plan_source:
+        payload["plan_source"] = plan_source
+    return plan_delivery.send(payload)
+
+
+def send_plan_to_protocol(plan_json: str, source_event: dict, merged_event_ids: list = (), plan_status: str = None):
     """
     Sends the generated plan and its source event to the Flask API.
 
     Args:
         plan_json (str): The raw JSON string output from the LLM.
         source_event (dict): The event that triggered the plan generation.
+        merged_event_ids (list, optional): IDs of events coalesced into this
+                                           plan without being planned on.
+        plan_status (str, optional): See `post_plan`.
     """
-    protocol_url = "http://127.0.0.1:5000/recommend"
     try:
         cleaned_plan_str = plan_json.strip().replace("```json", "").replace("```", "")
         plan_dict = json.loads(cleaned_plan_str)
+        if post_plan(plan_dict, source_event, merged_event_ids, plan_status):
+            print("MAIN: Queued new plan for the protocol layer.")
+    except Exception as e:
+        print(f"MAIN: Failed to send plan to protocol layer. Error: {e}")
+
+
+def stream_plan_updates(source_event: dict, merged_event_ids: list = ()):
+    """
+    Returns a `model.plan` update callback that posts each partial plan.
+
+    Updates are posted once the plan has a title; each post replaces the
+    previous one on the dashboard. The callback also records when the first
+    step arrived (`on_update.first_step_at`, a perf_counter value).
+    """
+    def on_update(field, value, partial_plan):
+        if field == "step" and on_update.first_step_at is None:
+            on_update.first_step_at = time.perf_counter()
+        if "plan_title" not in partial_plan:
+            return
+        partial = {**partial_plan, "steps": list(partial_plan.get("steps", []))}
+        try:
+            if post_plan(partial, source_event, merged_event_ids, "streaming"):
+                on_update.posted = True
+                print(f"MAIN: Queued partial plan ({field}) for the protocol layer.")
+        except Exception as e:
+            print(f"MAIN: Failed to stream partial plan. Error: {e}")
 
-        payload = {"plan": plan_dict, "source_event": source_event}
+    on_update.first_step_at = None
+    on_update.posted = False
+    return on_update
+
+
+def cancel_partial_plans(source_event: dict, merged_event_ids: list = ()):
+    """
+    Removes the partial plans posted for an event whose plan generation failed.
+
+    The "cancelled" record replaces the event's partial plans (and those of
+    `merged_event_ids`, e.g. a provisional plan), so none stays "streaming".
+    """
+    cancelled = {"plan_title": "Plan generation failed", "steps": []}
+    if post_plan(cancelled, source_event, merged_event_ids, "cancelled"):
+        print(f"MAIN: Queued cancellation of the partial plans for event {source_event['eventId']}.")
+
+
+def incident_key(event_data: dict) -> tuple:
+    """
+    Returns the incident an event belongs to: (crisis group, zone).
+
+    With incident correlation, an event is keyed by the root cause of its
+    correlated incident. Events whose dataType matches no crisis group form
+    their own group.
+    """
+    if incident_correlator is not None:
+        incident = incident_correlator.incident_of(event_data.get("eventId"))
+        if incident is not None:
+            event_data = incident.root_event
+    data_type = event_data.get("dataType", "")
+    zone = event_data.get("location", {}).get("zone", "")
+    return (crisis_group_for(data_type) or data_type, zone)
+
+
+def post_provisional_plan(event_data: dict) -> bool:
+    """
+    Posts the plan library's template for a newly received event.
+
+    Only the first event of an incident without an active plan gets one. It
+    is posted as a "streaming" plan, so the LLM's plans for the incident
+    replace it; see `take_provisional_plans`.
+
+    Returns:
+        bool: True if a template was queued for delivery.
+    """
+    if plan_library is None:
+        return False
+    key = incident_key(event_data)
+    now = time.monotonic()
+    with provisional_plans_lock:
+        # An entry outlives its validity only if its event was never planned
+        # (e.g. its worker failed).
+        stale_ids = [event_id for event_id, (_, expires_at) in provisional_plans.items() if expires_at <= now]
+        stale_events = [provisional_plans.pop(event_id)[0] for event_id in stale_ids]
+        pending = any(incident_key(event) == key for event, _ in provisional_plans.values())
+        if not pending:
+            provisional_plans[event_data["eventId"]] = (event_data, now + validity_seconds(event_data))
+    for stale_event in stale_events:
+        finalize_provisional_plan(stale_event)
+    if pending:
+        return False
+    posted = False
+    try:
+        if active_plans.get(key) is None:
+            provisional = plan_library.lookup(event_data)
+            if provisional is not None:
+                posted = post_plan(provisional, event_data, plan_status="streaming", plan_source="library")
+    finally:
+        if not posted:
+            with provisional_plans_lock:
+                provisional_plans.pop(event_data["eventId"], None)
+    if posted:
+        print(f"MAIN: Queued provisional plan '{provisional.get('plan_title')}' for incident {key}.")
+    return posted
+
+
+def take_provisional_plans(event_ids: list, key: tuple = None) -> list:
+    """
+    Returns (and forgets) the events a provisional plan was posted for.
+
+    Args:
+        event_ids (list): Events whose provisional plans are taken.
+        key (tuple, optional): Also take those of events now in this incident,
+                               whichever incident they were posted under.
+    """
+    with provisional_plans_lock:
+        taken = [
+            event_id
+            for event_id, (event, _) in provisional_plans.items()
+            if event_id in event_ids or (key is not None and incident_key(event) == key)
+        ]
+        return [provisional_plans.pop(event_id)[0] for event_id in taken]
+
+
+def finalize_provisional_plan(provisional_event: dict, key: tuple = None):
+    """
+    Replaces a provisional plan that no LLM plan is going to replace.
+
+    The incident's active plan, if there is one, is posted as the final plan
+    for the provisional plan's event; otherwise the template itself is, so
+    the dashboard card does not stay "streaming".
+    """
+    key = incident_key(provisional_event) if key is None else key
+    active_plan = active_plans.get(key)
+    if active_plan is not None:
+        final_plan, plan_source = active_plan.plan, None
+    else:
+        final_plan, plan_source = plan_library.lookup(provisional_event), "library"
+    if final_plan is not None and post_plan(final_plan, provisional_event, plan_status="final", plan_source=plan_source):
+        print(f"MAIN: Finalized the provisional plan for event {provisional_event['eventId']}.")
+    else:
+        cancel_partial_plans(provisional_event)
 
-        response = requests.post(protocol_url, json=payload)
-        if response.status_code == 200:
-            print("MAIN: Successfully sent new plan to protocol layer.")
+
+def release_events(event_data: dict, merged_event_ids: list = ()):
+    """
+    Releases admitted events that reached no decision (dropped, expired or
+    given an invalid plan), so the checkpoint admits a re-delivery of them.
+    """
+    event_checkpoint.forget(event_data["eventId"], digest=event_digest(event_data))
+    for event_id in merged_event_ids:
+        event_checkpoint.forget(event_id)
+
+
+def abandon_events(event_data: dict, merged_event_ids: list = ()):
+    """
+    Cleans up after events that will not be processed: releases them from the
+    checkpoint and finalizes any provisional plan posted for them.
+    """
+    release_events(event_data, merged_event_ids)
+    for provisional_event in take_provisional_plans([event_data["eventId"], *merged_event_ids]):
+        finalize_provisional_plan(provisional_event)
+
+
+def drop_queued_event(item: tuple):
+    """Handles an agent queue item dropped without being processed."""
+    print(f"MAIN: Dropped queued event {item[0]['eventId']}.")
+    abandon_events(item[0], item[1])
+
+
+def requeue_deferred(items: list):
+    """Queues events that were deferred while their incident was being planned."""
+    for item in items:
+        if not agent_pool.submit(item, enqueued_at=item[2]):
+            print(f"MAIN: Agent queue full, rejected deferred event {item[0]['eventId']}.")
+            abandon_events(item[0], item[1])
+
+
+def process_event(event_data: dict, merged_event_ids: list = (), queued_at: float = None) -> bool:
+    """
+    Runs the agentic loop for a single validated event on a worker thread.
+
+    The event is checked against the active plan for its own incident only.
+    If another worker is planning that incident, the event is deferred: it is
+    parked on that worker's claim and queued again once the plan is done, so
+    this worker moves on to other events. Other incidents are planned in
+    parallel.
+
+    Args:
+        event_data (dict): The event received from the event transport.
+        merged_event_ids (list, optional): IDs of events this one superseded
+                                           during coalescing.
+        queued_at (float, optional): When the event was first queued
+                                     (time.monotonic); kept if it is queued
+                                     again.
+
+    Returns:
+        bool: False if the event was deferred, True once it was decided.
+    """
+    started = time.perf_counter()
+    llm_calls_before = thread_llm_calls()
+    key = incident_key(event_data)
+    queued_at = time.monotonic() if queued_at is None else queued_at
+    claimed, plan_snapshot = active_plans.claim(key, park=(event_data, merged_event_ids, queued_at))
+    if not claimed:
+        print(f"MAIN: Incident {key} is being planned; deferred event {event_data['eventId']}.")
+        return False
+    decided = False
+    try:
+        with ADAPT_SECONDS.time():
+            needs_new_plan = adapt(plan_snapshot, event_data)
+            if needs_new_plan and plan_snapshot is not None and incident_correlator is not None:
+                if incident_correlator.covers(event_data):
+                    print(f"MAIN: Event {event_data['eventId']} is a correlated effect of incident {key}, already planned.")
+                    needs_new_plan = False
+
+        if plan_snapshot is None or needs_new_plan:
+            print(f"MAIN: Change detected for incident {key}. Running agentic loop...")
+            # The plan also covers the events provisional plans were posted
+            # for, so that it replaces the provisional ones.
+            covered_event_ids = list(merged_event_ids)
+            provisional_events = take_provisional_plans([event_data["eventId"], *merged_event_ids], key)
+            for provisional_event in provisional_events:
+                if provisional_event["eventId"] not in (event_data["eventId"], *covered_event_ids):
+                    covered_event_ids.append(provisional_event["eventId"])
+            related_events = incident_correlator.related_events(event_data["eventId"]) if incident_correlator else []
+            with REASON_SECONDS.time():
+                # Batched prompts carry no related events; see "Batched Diagnosis".
+                if batch_reasoner is not None and not related_events:
+                    diagnosis = batch_reasoner.diagnose(event_data)
+                else:
+                    # One diagnosis covers the root cause and its correlated effects.
+                    perceived_info = perceive(event_data, related_events)
+                    diagnosis = reason(perceived_info, REASONING_EXAMPLES, event=event_data, related_events=related_events)
+            on_update = stream_plan_updates(event_data, covered_event_ids) if PLAN_STREAMING else None
+            plan_started = time.perf_counter()
+            new_plan_raw_output = plan(
+                diagnosis, PLANNING_EXAMPLES, event=event_data, on_update=on_update, related_events=related_events
+            )
+            PLAN_SECONDS.observe(time.perf_counter() - plan_started)
+            if on_update is not None and on_update.first_step_at is not None:
+                PLAN_FIRST_STEP_SECONDS.observe(on_update.first_step_at - plan_started)
+                print(
+                    f"MAIN: First plan step streamed after {(on_update.first_step_at - plan_started) * 1000:.0f} ms, "
+                    f"full plan after {(time.perf_counter() - plan_started) * 1000:.0f} ms."
+                )
+
+            # --- LLM Safeguard: Validate JSON output before proceeding ---
+            try:
+                with JSON_CLEANUP_SECONDS.time():
+                    # Classified once here so adapt() never re-parses the plan.
+                    classified_plan = ClassifiedPlan.from_json(new_plan_raw_output, crisis_group=key[0])
+                    if classified_plan is None:
+                        raise json.JSONDecodeError("Empty plan", new_plan_raw_output, 0)
+                    active_plans.put(key, classified_plan, validity_seconds(event_data))
+                    if incident_correlator is not None:
+                        incident_correlator.record_plan(event_data["eventId"])
+                    send_plan_to_protocol(
+                        new_plan_raw_output,
+                        event_data,
+                        covered_event_ids,
+                        "final" if PLAN_STREAMING or provisional_events else None,
+                    )
+                EVENT_DECISIONS.labels("new_plan").inc()
+                decided = True
+
+            except json.JSONDecodeError:
+                EVENT_DECISIONS.labels("invalid_plan").inc()
+                print("LLM SAFEGUARD: AI output was not valid JSON. Skipping this plan.")
+                print(f"--- AI Raw Output ---\n{new_plan_raw_output}\n--------------------")
+                # Operators already saw the template if a provisional plan was
+                # posted, so it becomes the final plan; otherwise the partial
+                # plans are removed.
+                template = plan_library.lookup(event_data) if provisional_events else None
+                if template is not None and post_plan(template, event_data, covered_event_ids, "final", plan_source="library"):
+                    print(f"MAIN: Posted the plan library's template for event {event_data['eventId']} instead.")
+                elif (on_update is not None and on_update.posted) or provisional_events:
+                    cancel_partial_plans(event_data, covered_event_ids)
         else:
-            print(
-                f"MAIN: Error sending plan. Status: {response.status_code}, Body: {response.text}"
+            # Posted while another worker was planning the incident.
+            for provisional_event in take_provisional_plans([event_data["eventId"], *merged_event_ids], key):
+                finalize_provisional_plan(provisional_event, key)
+            EVENT_DECISIONS.labels("covered").inc()
+            print(f"MAIN: Event received, but the active plan for incident {key} is still sufficient.")
+            decided = True
+    finally:
+        # Only decided events are checkpointed; a rejected plan (or a failure)
+        # leaves the event to be planned again when it is re-delivered.
+        if decided:
+            # The event's own copy is marked by its content, since another
+            # copy of it may be in flight or merged into it.
+            event_checkpoint.mark_handled(
+                event_data["eventId"], thread_llm_calls() - llm_calls_before, digest=event_digest(event_data)
             )
-    except Exception as e:
-        print(f"MAIN: Failed to send plan to protocol layer. Error: {e}")
+            for merged_event_id in merged_event_ids:
+                event_checkpoint.mark_handled(merged_event_id)
+        else:
+            release_events(event_data, merged_event_ids)
+        requeue_deferred(active_plans.release(key))
+        EVENT_SECONDS.observe(time.perf_counter() - started)
+    return True
+
+
+def process_expired_event(event_data: dict, merged_event_ids: list = ()):
+    """
+    Handles an event that outlived its validity while queued, without the LLM.
+
+    The plan library's template for it, if there is one, is posted as its
+    final plan (replacing any provisional plan); otherwise it is dropped.
+    Either way it is not checkpointed, so a re-delivery is considered again.
+    """
+    provisional_events = take_provisional_plans([event_data["eventId"], *merged_event_ids])
+    EVENT_DECISIONS.labels("expired").inc()
+    template = plan_library.lookup(event_data) if plan_library is not None else None
+    if template is not None and post_plan(template, event_data, merged_event_ids, "final", plan_source="library"):
+        print(f"MAIN: Event {event_data['eventId']} expired while queued; posted the plan library's template instead.")
+    else:
+        print(f"MAIN: Event {event_data['eventId']} expired while queued; dropped.")
+        for provisional_event in provisional_events:
+            finalize_provisional_plan(provisional_event)
+    release_events(event_data, merged_event_ids)
+
+
+agent_queue = None
+if AGENT_SCHEDULER == "priority":
+    agent_queue = PriorityScheduler(
+        event_fn=lambda item: item[0],
+        aging_seconds=SCHEDULER_AGING_SECONDS,
+        observe_wait=lambda severity, seconds: SCHEDULER_WAIT_SECONDS.labels(severity).observe(seconds),
+        deadline_from_timestamp=SCHEDULER_TIMESTAMP_DEADLINES,
+    )
+agent_pool = WorkerPool(
+    lambda item: process_event(*item),
+    workers=AGENT_WORKERS,
+    queue_size=AGENT_QUEUE_SIZE,
+    overflow=AGENT_QUEUE_OVERFLOW,
+    observe_wait=QUEUE_WAIT_SECONDS.observe,
+    queue=agent_queue,
+    expired_handler=(lambda item: process_expired_event(*item[:2])) if SCHEDULER_EXPIRED_POLICY == "downgrade" else None,
+    dropped_handler=drop_queued_event,
+)
+
+
+def dispatch_coalesced(event_data: dict, merged_event_ids: list):
+    """Hands the representative of a coalesced group to the worker pool."""
+    if merged_event_ids:
+        print(f"MAIN: Coalesced {len(merged_event_ids)} event(s) into {event_data['eventId']}.")
+    queued_at = time.monotonic()
+    if not agent_pool.submit((event_data, merged_event_ids, queued_at), enqueued_at=queued_at):
+        print(f"MAIN: Agent queue full, rejected event {event_data['eventId']}.")
+        abandon_events(event_data, merged_event_ids)
+
+
+event_coalescer = EventCoalescer(
+    dispatch_coalesced,
+    key_fn=incident_key,
+    window_seconds=COALESCE_WINDOW_SECONDS,
+    policy=COALESCE_POLICY,
+)
 
 
 def on_event_snapshot(doc_snapshot, changes, read_time):
     """
-    A callback function that triggers whenever data changes in Firestore.
+    A callback function that triggers whenever events are published.
 
-    This is the core of the real-time listener. It validates new events
-    and runs the full agentic loop if necessary.
+    It has the signature of a Firestore `on_snapshot` listener; every
+    transport calls it that way.
+
+    This is the core of the real-time listener. It validates new events,
+    skips those the checkpoint shows were already handled unchanged,
+    correlates the rest into incidents, posts a provisional plan from the
+    plan library for new incidents, and hands the events to the coalescer,
+    which forwards one event per burst to the agent worker pool, so the
+    listener thread is never blocked by an LLM call.
     """
-    global current_plan
+    now = time.time()
+    received = []
     for change in changes:
         if change.type.name in ["ADDED", "MODIFIED"]:
-            event_data = change.document.to_dict()
-            print(f"\nMAIN: New event received from Firestore: {event_data['eventId']}")
-
-            if not is_event_valid(event_data):
-                print("MAIN: Received invalid event, skipping.")
-                continue
-
-            needs_new_plan = adapt(json.dumps(current_plan), event_data)
-
-            if not current_plan or needs_new_plan:
-                print("MAIN: Change detected. Running agentic loop...")
-                perceived_info = perceive(event_data)
-                diagnosis = reason(perceived_info, REASONING_EXAMPLES)
-                new_plan_raw_output = plan(diagnosis, PLANNING_EXAMPLES)
-
-                # --- LLM Safeguard: Validate JSON output before proceeding ---
-                try:
-                    cleaned_plan_str = (
-                        new_plan_raw_output.strip()
-                        .replace("```json", "")
-                        .replace("```", "")
-                    )
-                    plan_dict = json.loads(cleaned_plan_str)
-                    current_plan = plan_dict
-                    send_plan_to_protocol(new_plan_raw_output, event_data)
+            received.append(change.document.to_dict())
+            update_time = getattr(change.document, "update_time", None)
+            if update_time is not None:
+                TRANSPORT_SECONDS.observe(max(0.0, now - update_time.timestamp()))
+    if not received:
+        return
+    print(f"\nMAIN: {len(received)} new event(s) received from {EVENT_TRANSPORT}.")
+
+    valid_events, rejected = validate_batch(received)
+    EVENTS_RECEIVED.labels("valid").inc(len(valid_events))
+    EVENTS_RECEIVED.labels("invalid").inc(len(rejected))
+    for record in rejected:
+        print(f"MAIN: Received invalid event {record['eventId']}, skipping: {format_errors(record['errors'])}")
 
-                except json.JSONDecodeError:
-                    print("LLM SAFEGUARD: AI output was not valid JSON. Skipping this plan.")
-                    print(f"--- AI Raw Output ---\n{new_plan_raw_output}\n--------------------")
-            else:
-                print("MAIN: Event received, but current plan is still sufficient.")
+    skipped = 0
+    for event_data in valid_events:
+        if event_checkpoint.admit(event_data):
+            if incident_correlator is not None:
+                incident_correlator.correlate(event_data)
+            post_provisional_plan(event_data)
+            event_coalescer.add(event_data)
+        else:
+            skipped += 1
+    if skipped:
+        print(f"MAIN: Skipped {skipped} already handled event(s).")
+
+
+def readiness() -> dict:
+    """Reports which of the agent's external clients are initialized."""
+    status = {"transport": event_transport.is_ready(), "llm": model.is_ready()}
+    status["ready"] = all(status.values())
+    return status
+
+
+def wait_until_ready(timeout: float = 60.0) -> bool:
+    """
+    Waits for the background warm-up to finish and publishes readiness.
+
+    Args:
+        timeout (float): The longest to wait, in seconds.
+
+    Returns:
+        bool: True if every client became ready in time.
+    """
+    deadline = time.monotonic() + timeout
+    while not readiness()["ready"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    status = readiness()
+    if status["ready"] and AGENT_READY_FILE:
+        with open(AGENT_READY_FILE, "w") as f:
+            json.dump(status, f)
+    return status["ready"]
 
 
 def main():
-    """Sets up the Firestore listener and keeps the script running."""
-    print("MAIN: Setting up Firestore listener...")
-    event_collection_ref = db.collection("live_urban_events")
-    query_watch = event_collection_ref.on_snapshot(on_event_snapshot)
+    """Sets up the event listener and keeps the script running."""
+    started = time.perf_counter()
+    # Both clients connect concurrently instead of one after the other.
+    model.warm_up(background=True)
+    try:
+        event_transport.connect()
+    except Exception as e:
+        print(f"MAIN: Error connecting to the {EVENT_TRANSPORT} transport: {e}")
+        return
+
+    restored = event_checkpoint.load()
+    if restored:
+        print(f"MAIN: Resuming from checkpoint; {restored} handled event(s) will not be re-planned.")
+    plan_delivery.start()
+    if METRICS_PUSH_SECONDS > 0:
+        metrics_pusher.start()
+    agent_pool.start()
+    event_coalescer.start()
+    if batch_reasoner is not None:
+        batch_reasoner.start()
+    print(
+        f"MAIN: Started {AGENT_WORKERS} agent workers (queue size {AGENT_QUEUE_SIZE}, overflow: {AGENT_QUEUE_OVERFLOW}, "
+        f"scheduler: {AGENT_SCHEDULER})."
+    )
+
+    print(f"MAIN: Setting up {EVENT_TRANSPORT} listener...")
+    query_watch = event_transport.subscribe(on_event_snapshot)
 
+    if wait_until_ready():
+        print(f"MAIN: Ready in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    else:
+        print(f"MAIN: Not all clients are ready yet: {readiness()}")
     print("MAIN: System is live. Listening for events from the data dispatcher.")
     print("To stop, press Ctrl+C")
 
@@ -119,6 +772,32 @@ def main():
         print("\nMAIN: Shutting down...")
         stop_event.set()
         query_watch.unsubscribe()
+        event_transport.close()
+        event_coalescer.stop(flush=False)
+        agent_pool.stop(drain=False)
+        plan_delivery.stop()
+        if METRICS_PUSH_SECONDS > 0:
+            metrics_pusher.stop()
+        if batch_reasoner is not None:
+            batch_reasoner.stop()
+            print(f"MAIN: Batch reasoner stats: {batch_reasoner.stats()}")
+        print(f"MAIN: Coalescer stats: {event_coalescer.stats()}")
+        event_checkpoint.close()
+        print(f"MAIN: Checkpoint stats: {event_checkpoint.stats()}")
+        if incident_correlator is not None:
+            print(f"MAIN: Correlation stats: {incident_correlator.stats()}")
+        print(f"MAIN: Active plan stats: {active_plans.stats()}")
+        if plan_library is not None:
+            print(f"MAIN: Plan library stats: {plan_library.stats()}")
+        print(f"MAIN: Agent pool stats: {agent_pool.stats()}")
+        if agent_queue is not None:
+            print(f"MAIN: Scheduler stats: {agent_pool.queue_stats()}")
+        if model.llm_rate_limiter is not None:
+            print(f"MAIN: LLM rate limit stats: {model.llm_rate_limiter.stats()}")
+        print(f"MAIN: Delivery stats: {plan_delivery.stats()}")
+        print(f"MAIN: LLM cache stats: {llm_cache.stats()}")
+        if AGENT_READY_FILE and os.path.exists(AGENT_READY_FILE):
+            os.remove(AGENT_READY_FILE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,327 @@
+"""
+Lightweight counters and histograms with a Prometheus text exposition.
+
+The agent and the protocol layer record where time goes (transport, adapt,
+reason, plan, JSON cleanup, delivery) and how big LLM prompts and responses
+are. The figures go into fixed-bucket histograms and counters that cost a
+lock and a few additions per observation, so hooks can sit on the hot path.
+
+`REGISTRY.render()` produces the Prometheus text format (version 0.0.4). The
+protocol layer serves its own registry on `/metrics`. The agent runs in
+another process, so a `MetricsPusher` posts the agent's rendered registry to
+the protocol layer's `/metrics/push` every few seconds, and `/metrics` serves
+both.
+
+    STAGE_SECONDS = REGISTRY.histogram("bureaux_stage_seconds", "...", ("stage",))
+    ADAPT_SECONDS = STAGE_SECONDS.labels("adapt")  # bind once, outside the hot path
+    with ADAPT_SECONDS.time():
+        adapt(...)
+"""
+
+import bisect
+import math
+import threading
+import time
+
+# Seconds, from sub-millisecond bookkeeping up to slow LLM calls.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Prompt/response sizes in tokens or characters.
+SIZE_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Timer:
+    """Observes the seconds spent inside a `with` block."""
+
+    __slots__ = ("metric", "started")
+
+    def __init__(self, metric):
+        self.metric = metric
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metric.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _HistogramChild:
+    """One labelled series of a histogram."""
+
+    __slots__ = ("upper_bounds", "counts", "sum", "count", "lock")
+
+    def __init__(self, upper_bounds: tuple):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """Returns a context manager that observes its duration in seconds."""
+        return _Timer(self)
+
+    def snapshot(self) -> tuple:
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _CounterChild:
+    """One labelled series of a counter or gauge."""
+
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def set(self, value: float):
+        with self.lock:
+            self.value = value
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Returns the series for these label values, creating it on first use.
+
+        Args:
+            *values: One value per label name, in order.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, kept here or read from a callback."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        """
+        Args:
+            callback (callable, optional): Returns the current value (or a
+                                           {label values: value} dict for a
+                                           labelled metric) at render time,
+                                           for figures another component
+                                           already counts.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        """Increments the unlabelled series."""
+        self.labels().inc(amount)
+
+    def _samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            items = value.items() if isinstance(value, dict) else [((), value)]
+        else:
+            items = [(values, child.value) for values, child in list(self._children.items())]
+        for values, sample in items:
+            yield f"{self.name}{_label_text(self.labelnames, values)} {_format_value(sample)}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float):
+        """Sets the unlabelled series."""
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """Counts observations into fixed cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        """
+        Args:
+            buckets (tuple): The ascending upper bounds; +Inf is implied.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Records a value in the unlabelled series."""
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        """Times a `with` block into the unlabelled series."""
+        return _Timer(self.labels())
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(upper_bound))}"'
+                yield f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}"
+            labels = _label_text(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """A named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric '{metric.name}' is already registered differently.")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide registry the agent's and the protocol layer's hooks use.
+REGISTRY = Registry()
+
+
+class MetricsPusher:
+    """Posts a registry's exposition to the protocol layer at a fixed interval."""
+
+    def __init__(self, push_url: str, registry: Registry = REGISTRY, interval_seconds: float = 10.0, session=None):
+        """
+        Args:
+            push_url (str): The protocol layer's `/metrics/push` endpoint.
+            registry (Registry): The metrics to push.
+            interval_seconds (float): Seconds between pushes.
+            session (requests.Session, optional): The session to post with.
+        """
+        self.push_url = push_url
+        self.registry = registry
+        self.interval_seconds = interval_seconds
+        self.session = session
+        self.pushes = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def push(self) -> bool:
+        """Sends the current figures once; returns True if they were accepted."""
+        import requests
+
+        session = self.session or requests
+        try:
+            response = session.post(
+                self.push_url,
+                data=self.registry.render().encode("utf-8"),
+                headers={"Content-Type": "text/plain; version=0.0.4"},
+                timeout=5,
+            )
+            ok = response.status_code < 300
+        except requests.RequestException:
+            ok = False
+        if ok:
+            self.pushes += 1
+        else:
+            self.failures += 1
+        return ok
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.push()
+
+    def start(self):
+        """Starts pushing in the background."""
+        self._thread = threading.Thread(target=self._run, name="metrics-pusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background pushes after one last push."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        self.push()
@@ -1,5 +1,5 @@
 """
-Defines the core agentic functions and initializes the connection to Vertex AI.
+Defines the core agentic functions and initializes the LLM backend.
 
 This module contains the agent's cognitive capabilities:
 - perceive: Formats raw data for the LLM.
@@ -8,24 +8,89 @@ This module contains the agent's cognitive capabilities:
 - adapt: Decides if a new event requires a change to the current plan.
 """
 
-import vertexai
 import json
-from vertexai.generative_models import GenerativeModel
-from google.oauth2 import service_account
-
-# --- Vertex AI Initialization ---
+import os
+import re
+import threading
+import time
+
+from data_schema import validity_seconds
+from llm_backend import create_backend
+from llm_cache import LLMCache, event_signature
+from metrics import REGISTRY, SIZE_BUCKETS
+from plan_stream import PlanStreamParser
+from prompt_builder import PromptBuilder, canonical_event
+from scheduler import TokenBucket, current_priority
+
+# --- LLM Backend Initialization ---
+# LLM_BACKEND selects Vertex AI (default), the offline stub, or record/replay;
+# see llm_backend.py. The backend (and its SDK imports) is created on first
+# use or by warm_up(), so importing this module stays cheap.
 KEY_PATH = "credentials/agent-one-465916-c61b8803d4b8.json"
 PROJECT_ID = "agent-one-465916"
 LOCATION = "asia-south1"
 
-try:
-    credentials = service_account.Credentials.from_service_account_file(KEY_PATH)
-    vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
-    gemini_pro_model = GenerativeModel("gemini-1.5-pro")
-    print("MODEL: Connected to Vertex AI (Gemini 1.5 Pro).")
-except Exception as e:
-    print(f"MODEL: Error connecting to Vertex AI: {e}")
-    exit()
+llm_backend = None
+llm_backend_lock = threading.Lock()
+# -----------------------------
+
+# --- LLM Response Cache ---
+# Memoizes reason()/plan() answers per normalized event signature (and, for
+# plan(), the diagnosis). Plans that do not parse are not cached. Set
+# LLM_CACHE_SIZE=0 to disable.
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+llm_cache = LLMCache(max_entries=LLM_CACHE_SIZE)
+# -----------------------------
+
+# --- Prompt Construction ---
+# Prompts carry only the few-shot examples for the event's dataType and are
+# kept within an estimated PROMPT_TOKEN_BUDGET. Estimated sizes go to the
+# bureaux_prompt_estimated_tokens histogram; PROMPT_DEBUG=1 also prints them.
+prompt_builder = PromptBuilder(
+    token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "1500")),
+    max_examples=int(os.getenv("PROMPT_MAX_EXAMPLES", "2")),
+    observe_tokens=lambda kind, tokens: PROMPT_ESTIMATED_TOKENS.labels(kind).observe(tokens),
+    verbose=os.getenv("PROMPT_DEBUG", "0") == "1",
+)
+# -----------------------------
+
+# --- LLM Rate Limit ---
+# LLM requests are paced to LLM_RATE_LIMIT_PER_MINUTE (set it to the Vertex AI
+# requests-per-minute quota) with bursts of up to LLM_RATE_BURST. Calls over
+# the limit wait, those for the most severe events first. 0 disables.
+LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", "0"))
+llm_rate_limiter = None
+if LLM_RATE_LIMIT_PER_MINUTE > 0:
+    llm_rate_limiter = TokenBucket(LLM_RATE_LIMIT_PER_MINUTE / 60, burst=float(os.getenv("LLM_RATE_BURST", "5")))
+# -----------------------------
+
+# --- LLM Usage Accounting ---
+# Running totals of LLM calls and the token counts the backend reports.
+llm_usage = {"calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+llm_usage_lock = threading.Lock()
+# Calls made by the current thread, so a worker can tell what one event cost.
+llm_thread_usage = threading.local()
+# -----------------------------
+
+# --- LLM Metrics ---
+# Per-call latency and prompt/response sizes by cognitive step ("reason",
+# "reason_batch", "plan"); exported on the protocol layer's /metrics.
+LLM_CALL_SECONDS = REGISTRY.histogram("bureaux_llm_call_seconds", "LLM round-trip time per call.", ("kind",))
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "bureaux_llm_prompt_tokens", "Prompt tokens per LLM call, as reported by the backend.", ("kind",), SIZE_BUCKETS
+)
+LLM_RESPONSE_TOKENS = REGISTRY.histogram(
+    "bureaux_llm_response_tokens", "Response tokens per LLM call, as reported by the backend.", ("kind",), SIZE_BUCKETS
+)
+PROMPT_ESTIMATED_TOKENS = REGISTRY.histogram(
+    "bureaux_prompt_estimated_tokens", "Estimated prompt size as built, before any LLM call.", ("kind",), SIZE_BUCKETS
+)
+LLM_PROMPT_CHARS = REGISTRY.histogram("bureaux_llm_prompt_chars", "Prompt length per LLM call.", ("kind",), SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = REGISTRY.histogram("bureaux_llm_response_chars", "Response length per LLM call.", ("kind",), SIZE_BUCKETS)
+LLM_THROTTLE_SECONDS = REGISTRY.histogram(
+    "bureaux_llm_throttle_seconds", "Time LLM calls waited for the rate limit.", ("kind",)
+)
+LLM_CACHE_LOOKUPS = REGISTRY.counter("bureaux_llm_cache_lookups_total", "LLM cache lookups by outcome.", ("kind", "result"))
 # -----------------------------
 
 CRISIS_KEYWORDS = {
@@ -38,76 +103,424 @@ CRISIS_KEYWORDS = {
     "air_quality": ["air", "quality", "aqi", "pollution", "smog"],
 }
 
+
+def build_keyword_index(crisis_keywords: dict) -> dict:
+    """
+    Inverts CRISIS_KEYWORDS into a keyword -> group lookup.
+
+    A keyword listed under several groups (e.g. "flood") maps to the first
+    one, matching the first-match scan this index replaces.
+    """
+    index = {}
+    for group, keywords in crisis_keywords.items():
+        for keyword in keywords:
+            index.setdefault(keyword, group)
+    return index
+
+
+# Built once at import; see crisis_group_for() and classify_plan_title().
+CRISIS_GROUP_BY_KEYWORD = build_keyword_index(CRISIS_KEYWORDS)
+CRISIS_TITLE_PATTERNS = tuple(
+    (group, re.compile("|".join(re.escape(keyword) for keyword in keywords)))
+    for group, keywords in CRISIS_KEYWORDS.items()
+)
+
+
+def crisis_group_for(data_type: str):
+    """
+    Maps an event's dataType to its crisis group in CRISIS_KEYWORDS.
+
+    Compound dataTypes such as "power_outage" or "air_quality_index" that are
+    not keywords themselves fall back to their first underscore-separated
+    part that is.
+
+    Args:
+        data_type (str): The event's dataType, e.g. "traffic".
+
+    Returns:
+        str | None: The first matching group, or None if unrecognized.
+    """
+    data_type = data_type.lower()
+    group = CRISIS_GROUP_BY_KEYWORD.get(data_type)
+    if group is None and "_" in data_type:
+        group = next(
+            (CRISIS_GROUP_BY_KEYWORD[part] for part in data_type.split("_") if part in CRISIS_GROUP_BY_KEYWORD),
+            None,
+        )
+    return group
+
+
+def classify_plan_title(plan_title: str):
+    """
+    Finds the crisis group a plan title is about.
+
+    Args:
+        plan_title (str): The plan's title, e.g. "Mitigate Traffic Jam".
+
+    Returns:
+        str | None: The first group with a keyword in the title, or None.
+    """
+    plan_title = plan_title.lower()
+    return next(
+        (group for group, pattern in CRISIS_TITLE_PATTERNS if pattern.search(plan_title)),
+        None,
+    )
+
+
+class ClassifiedPlan:
+    """
+    An action plan together with its crisis group, classified once.
+
+    The agent keeps the current plan in this form so that `adapt()` does not
+    serialize, re-parse and re-classify it for every incoming event.
+    """
+
+    __slots__ = ("plan", "crisis_group")
+
+    def __init__(self, plan: dict, crisis_group: str = None):
+        """
+        Args:
+            plan (dict): The parsed action plan.
+            crisis_group (str, optional): The group the plan was made for.
+                                          Defaults to classifying its title.
+        """
+        self.plan = plan
+        self.crisis_group = crisis_group or classify_plan_title(plan.get("plan_title", ""))
+
+    @classmethod
+    def from_json(cls, plan_json: str, crisis_group: str = None):
+        """
+        Parses an LLM plan answer, tolerating Markdown code fences.
+
+        Args:
+            plan_json (str): The raw answer.
+            crisis_group (str, optional): See `__init__`.
+
+        Returns:
+            ClassifiedPlan | None: The plan, or None for an empty answer.
+
+        Raises:
+            json.JSONDecodeError: If the answer is not valid JSON.
+        """
+        cleaned_plan_str = plan_json.strip().replace("```json", "").replace("```", "")
+        if not cleaned_plan_str or cleaned_plan_str == "{}":
+            return None
+        return cls(json.loads(cleaned_plan_str), crisis_group)
+
+
+def is_valid_plan(plan_json: str) -> bool:
+    """True if an LLM plan answer parses into a plan (see `ClassifiedPlan.from_json`)."""
+    try:
+        return ClassifiedPlan.from_json(plan_json) is not None
+    except (json.JSONDecodeError, AttributeError):
+        return False
+
+
+def get_llm_backend():
+    """
+    Returns the LLM backend, creating it on the first call.
+
+    Raises:
+        Exception: If the backend cannot be initialized. The next call retries.
+    """
+    global llm_backend
+    if llm_backend is None:
+        with llm_backend_lock:
+            if llm_backend is None:
+                started = time.perf_counter()
+                llm_backend = create_backend(key_path=KEY_PATH, project_id=PROJECT_ID, location=LOCATION)
+                print(
+                    f"MODEL: Initialized the '{llm_backend.name}' LLM backend in "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms."
+                )
+    return llm_backend
+
+
+def warm_up(background: bool = True):
+    """
+    Initializes the LLM backend ahead of the first event.
+
+    Args:
+        background (bool): Initialize on a daemon thread and return
+                           immediately. Errors are printed; the first LLM call
+                           retries.
+    """
+    def initialize():
+        try:
+            get_llm_backend()
+        except Exception as e:
+            print(f"MODEL: Error initializing the LLM backend: {e}")
+
+    if background:
+        threading.Thread(target=initialize, name="llm-warm-up", daemon=True).start()
+    else:
+        initialize()
+
+
+def is_ready() -> bool:
+    """True once the LLM backend has been initialized."""
+    return llm_backend is not None
+
+
 # ==============================================================================
 # 1. AGENT COGNITIVE FUNCTIONS
 # ==============================================================================
 
 
-def perceive(raw_data: dict) -> str:
+def perceive(raw_data: dict, related_events: list = ()) -> str:
     """
     Takes a raw data dictionary and formats it into a string for the LLM.
 
+    Only the fields relevant to a diagnosis are kept, in a compact canonical
+    JSON form (see prompt_builder.canonical_event).
+
     Args:
         raw_data (dict): The event data.
+        related_events (list, optional): Other events of the same incident
+                                         (root cause first), so that one
+                                         diagnosis covers all of them.
 
     Returns:
         str: A formatted string describing the current situation.
     """
     print("AGENT-PERCEIVE: Reading data...")
-    return f"Current situation: {str(raw_data)}"
+    situation = f"Current situation: {canonical_event(raw_data)}"
+    if related_events:
+        situation += "\nCorrelated events in the same incident (root cause first):\n" + "\n".join(
+            canonical_event(event) for event in related_events
+        )
+    return situation
+
+
+def thread_llm_calls() -> int:
+    """Returns how many LLM calls the current thread has made."""
+    return getattr(llm_thread_usage, "calls", 0)
+
+
+def generate(prompt: str, on_chunk=None, kind: str = "other") -> str:
+    """
+    Sends a prompt to the LLM backend and records the call in `llm_usage`
+    and the LLM metrics.
+
+    Args:
+        prompt (str): The full prompt.
+        on_chunk (callable, optional): Streams the response, calling
+                                       `on_chunk(text)` for each chunk as it
+                                       arrives.
+        kind (str): Which cognitive step is asking; labels the metrics.
+
+    Returns:
+        str: The LLM's response text.
+    """
+    if llm_rate_limiter is not None:
+        throttle_started = time.perf_counter()
+        llm_rate_limiter.acquire(priority=current_priority())
+        LLM_THROTTLE_SECONDS.labels(kind).observe(time.perf_counter() - throttle_started)
+    started = time.perf_counter()
+    if on_chunk is None:
+        response = get_llm_backend().generate_content(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        text = response.text
+    else:
+        usage = None
+        chunks = []
+        for chunk in get_llm_backend().generate_content_stream(prompt):
+            chunks.append(chunk.text)
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            on_chunk(chunk.text)
+        text = "".join(chunks)
+    LLM_CALL_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    LLM_PROMPT_CHARS.labels(kind).observe(len(prompt))
+    LLM_RESPONSE_CHARS.labels(kind).observe(len(text))
+    llm_thread_usage.calls = thread_llm_calls() + 1
+    with llm_usage_lock:
+        llm_usage["calls"] += 1
+        if usage is not None:
+            llm_usage["prompt_tokens"] += usage.prompt_token_count
+            llm_usage["response_tokens"] += usage.candidates_token_count
+    if usage is not None:
+        LLM_PROMPT_TOKENS.labels(kind).observe(usage.prompt_token_count)
+        LLM_RESPONSE_TOKENS.labels(kind).observe(usage.candidates_token_count)
+    return text
+
+
+def generate_cached(
+    kind: str,
+    prompt: str,
+    event: dict = None,
+    on_chunk=None,
+    related_events: list = (),
+    context: str = None,
+    cache_if=None,
+) -> str:
+    """
+    Sends a prompt to Gemini, reusing a cached answer for a matching event.
 
+    Args:
+        kind (str): Which cognitive step is asking, e.g. "reason".
+        prompt (str): The full prompt.
+        event (dict, optional): The triggering event. Without it the call is
+                                never cached.
+        on_chunk (callable, optional): See `generate`. Not called when the
+                                       answer comes from the cache.
+        related_events (list, optional): Correlated events the prompt
+                                         describes; part of the cache key.
+        context (str, optional): Other prompt input the answer depends on,
+                                 e.g. the diagnosis a plan is made from;
+                                 part of the cache key.
+        cache_if (callable, optional): Called with a new answer; only
+                                       answers it accepts are cached, so a
+                                       malformed one is not reused.
 
-def reason(perceived_data: str, examples: list) -> str:
+    Returns:
+        str: The LLM's response text.
+    """
+    if event is None or not LLM_CACHE_SIZE:
+        return generate(prompt, on_chunk, kind)
+
+    key = (kind, event_signature(event))
+    if related_events:
+        key += (tuple(event_signature(related) for related in related_events),)
+    if context is not None:
+        key += (context,)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        LLM_CACHE_LOOKUPS.labels(kind, "hit").inc()
+        print(f"AGENT-CACHE: Reusing cached {kind} result for a matching situation.")
+        return cached
+
+    LLM_CACHE_LOOKUPS.labels(kind, "miss").inc()
+    text = generate(prompt, on_chunk, kind)
+    if cache_if is None or cache_if(text):
+        llm_cache.put(key, text, validity_seconds(event))
+    return text
+
+
+def reason(perceived_data: str, examples: list, event: dict = None, related_events: list = ()) -> str:
     """
     Analyzes the situation using Gemini to find the root cause and severity.
 
     Args:
         perceived_data (str): Formatted string from the perceive function.
         examples (list): A list of few-shot examples for the prompt.
+        event (dict, optional): The raw event. When given, only examples for
+                                its dataType are used and the diagnosis of a
+                                recent matching situation is reused.
+        related_events (list, optional): The correlated events included in
+                                         `perceived_data`, if any.
 
     Returns:
         str: The LLM's diagnosis of the crisis.
     """
     print("AGENT-REASON: Analyzing root cause...")
-    prompt = f"""
-    You are an Urban Crisis Diagnosis AI. Based on the following data, what is the primary crisis and its severity (1-10)?
-    Follow these examples:
-    {examples}
-    ---
-    Data:
-    {perceived_data}
-    Diagnosis:
+    prompt = prompt_builder.build(
+        "reason",
+        "You are an Urban Crisis Diagnosis AI. Based on the following data, what is the primary crisis and its severity (1-10)?",
+        examples,
+        [event.get("dataType")] if event else [],
+        f"Data:\n{perceived_data}",
+        "Diagnosis:",
+    )
+    return generate_cached("reason", prompt, event, related_events=related_events)
+
+
+def reason_batch(events: list, examples: list) -> dict:
     """
-    response = gemini_pro_model.generate_content(prompt)
-    return response.text
+    Diagnoses several events with a single Gemini call.
+
+    The few-shot preamble is sent once for the whole batch and the model is
+    asked for a JSON object mapping each eventId to its diagnosis. Cached
+    diagnoses are reused; events the batched response does not cover (or
+    all of them, if it cannot be parsed) fall back to single-event `reason`.
 
+    Args:
+        events (list): Validated event dictionaries with unique eventIds.
+        examples (list): A list of few-shot examples for the prompt.
 
-def plan(diagnosis: str, examples: list) -> str:
+    Returns:
+        dict: A mapping of eventId to the LLM's diagnosis.
+    """
+    print(f"AGENT-REASON: Analyzing root cause for a batch of {len(events)} events...")
+    diagnoses = {}
+    pending = []
+    for event in events:
+        cached = llm_cache.get(("reason", event_signature(event))) if LLM_CACHE_SIZE else None
+        if cached is not None:
+            diagnoses[event["eventId"]] = cached
+        else:
+            pending.append(event)
+    if not pending:
+        return diagnoses
+
+    situations = "\n".join(f"[{event['eventId']}] {perceive(event)}" for event in pending)
+    prompt = prompt_builder.build(
+        "reason_batch",
+        "You are an Urban Crisis Diagnosis AI. For each event below, what is the primary crisis and its severity (1-10)?",
+        examples,
+        [event.get("dataType") for event in pending],
+        f"Events:\n{situations}\nRespond only with a JSON object that maps each event ID to its diagnosis.",
+        "Diagnoses (JSON):",
+    )
+    batched = {}
+    raw_output = generate(prompt, kind="reason_batch")
+    try:
+        parsed = json.loads(raw_output.strip().replace("```json", "").replace("```", ""))
+        if isinstance(parsed, dict):
+            batched = parsed
+    except json.JSONDecodeError:
+        print("AGENT-REASON: Batched diagnosis was not valid JSON. Falling back to single calls.")
+
+    for event in pending:
+        diagnosis = batched.get(event["eventId"])
+        if not isinstance(diagnosis, str) or not diagnosis.strip():
+            diagnosis = reason(perceive(event), examples, event=event)
+        diagnoses[event["eventId"]] = diagnosis
+        if LLM_CACHE_SIZE:
+            llm_cache.put(("reason", event_signature(event)), diagnosis, validity_seconds(event))
+    return diagnoses
+
+
+def plan(diagnosis: str, examples: list, event: dict = None, on_update=None, related_events: list = ()) -> str:
     """
     Creates a multi-step action plan in JSON format based on the diagnosis.
 
     Args:
         diagnosis (str): The crisis diagnosis from the reason function.
         examples (list): A list of few-shot examples for the prompt.
+        event (dict, optional): The raw event. When given, only examples for
+                                its dataType are used and the plan for a
+                                recent matching situation is reused.
+        on_update (callable, optional): Streams the plan. Called as
+            `on_update(field, value, partial_plan)` as soon as a top-level
+            field (e.g. "plan_title") or a step ("step") has been generated;
+            `partial_plan` holds everything parsed so far.
+        related_events (list, optional): The correlated events the diagnosis
+                                         covers, if any.
 
     Returns:
         str: A raw string from the LLM, intended to be a valid JSON object.
     """
     print("AGENT-PLAN: Creating a step-by-step plan...")
-    prompt = f"""
-    You are an Urban Operations Planner AI. Based on the crisis diagnosis, create a clear, actionable, multi-step plan in JSON format.
-    Follow these examples:
-    {examples}
-    ---
-    Diagnosis:
-    {diagnosis}
-    Action Plan (JSON):
-    """
-    response = gemini_pro_model.generate_content(prompt)
-    return response.text
-
-
-def adapt(current_plan_json: str, new_event: dict) -> bool:
+    prompt = prompt_builder.build(
+        "plan",
+        "You are an Urban Operations Planner AI. Based on the crisis diagnosis, create a clear, actionable, multi-step plan in JSON format.",
+        examples,
+        [event.get("dataType")] if event else [],
+        f"Diagnosis:\n{diagnosis}",
+        "Action Plan (JSON):",
+    )
+    on_chunk = None
+    if on_update is not None:
+        parser = PlanStreamParser()
+
+        def on_chunk(text):
+            for field, value in parser.feed(text):
+                on_update(field, value, parser.plan)
+
+    return generate_cached("plan", prompt, event, on_chunk, related_events, context=diagnosis, cache_if=is_valid_plan)
+
+
+def adapt(current_plan, new_event: dict) -> bool:
     """
     Decides if the current plan is sufficient to handle a new event.
 
@@ -116,7 +529,9 @@ def adapt(current_plan_json: str, new_event: dict) -> bool:
     do not match or if no plan currently exists.
 
     Args:
-        current_plan_json (str): A JSON string of the current action plan.
+        current_plan (ClassifiedPlan | dict | str | None): The current action
+            plan. A ClassifiedPlan is compared without any parsing; a plan
+            dict or JSON string is classified on every call.
         new_event (dict): The newly received event data.
 
     Returns:
@@ -124,34 +539,24 @@ def adapt(current_plan_json: str, new_event: dict) -> bool:
     """
     print("AGENT-ADAPT: Checking if plan needs to change...")
     try:
-        cleaned_plan_str = (
-            current_plan_json.strip().replace("```json", "").replace("```", "")
-        )
-        if not cleaned_plan_str or cleaned_plan_str == "{}":
+        if isinstance(current_plan, str):
+            current_plan = ClassifiedPlan.from_json(current_plan)
+        elif isinstance(current_plan, dict):
+            current_plan = ClassifiedPlan(current_plan) if current_plan else None
+        if current_plan is None:
             print("ADAPTATION NEEDED: No current plan exists.")
             return True
 
-        plan_details = json.loads(cleaned_plan_str)
-        plan_title = plan_details.get("plan_title", "").lower()
         new_crisis_type = new_event.get("dataType", "").lower()
-
-        new_crisis_group = next(
-            (group for group, kw in CRISIS_KEYWORDS.items() if new_crisis_type in kw),
-            None,
-        )
+        new_crisis_group = crisis_group_for(new_crisis_type)
         if not new_crisis_group:
-            print(f"ADAPTATION NEEDED: Unrecognized new crisis type '{new_crisis_type}'.")
-            return True
-
-        old_plan_group = next(
-            (
-                group
-                for group, keywords in CRISIS_KEYWORDS.items()
-                if any(keyword in plan_title for keyword in keywords)
-            ),
-            None,
-        )
+            # A plan made for this exact dataType still covers it.
+            if current_plan.crisis_group != new_crisis_type:
+                print(f"ADAPTATION NEEDED: Unrecognized new crisis type '{new_crisis_type}'.")
+                return True
+            new_crisis_group = new_crisis_type
 
+        old_plan_group = current_plan.crisis_group
         if new_crisis_group == old_plan_group:
             print(
                 f"ADAPTATION NOT NEEDED: New '{new_crisis_group}' event is covered by the existing '{old_plan_group}' plan."
@@ -172,19 +577,41 @@ def adapt(current_plan_json: str, new_event: dict) -> bool:
 # 2. FEW-SHOT PROMPTING EXAMPLES
 # ==============================================================================
 
+# Each example may be tagged with the dataType it illustrates; prompts only
+# include the examples for the event's dataType (untagged ones are general
+# fallbacks). Inputs use the same canonical form as perceive().
+
 REASONING_EXAMPLES = [
     {
-        "input": "Current situation: {'type': 'traffic', 'location': 'Silk Board', 'value': '95% congestion', 'event': 'waterlogging'}",
+        "dataType": "traffic",
+        "input": 'Current situation: {"dataType":"traffic","zone":"Silk Board Junction","severity":"HIGH","data":{"congestion_level":0.95,"average_speed_kph":3},"interdependencies":["caused_by:wate_waterlogging"]}',
         "output": "Crisis: Severe traffic jam at Silk Board due to waterlogging. Severity: 9/10.",
     },
     {
-        "input": "Current situation: {'type': 'air_quality', 'location': 'Indiranagar', 'value': 'AQI 350', 'event': 'post_diwali'}",
+        "dataType": "air_quality_index",
+        "input": 'Current situation: {"dataType":"air_quality_index","zone":"Indiranagar 100 Feet Road","severity":"HIGH","data":{"aqi":350,"dominant_pollutant":"pm2_5","note":"post_diwali"}}',
         "output": "Crisis: Hazardous air quality in Indiranagar, likely from festival fireworks. Severity: 8/10.",
     },
+    {
+        "dataType": "power_outage",
+        "input": 'Current situation: {"dataType":"power_outage","zone":"Whitefield","severity":"HIGH","data":{"affected_households":18000,"feeder":"F-12","cause":"substation relay trip"}}',
+        "output": "Crisis: Substation relay trip has cut power to large parts of Whitefield. Severity: 8/10.",
+    },
+    {
+        "dataType": "water_quality",
+        "input": 'Current situation: {"dataType":"water_quality","zone":"HSR Layout","severity":"HIGH","data":{"description":"severe waterlogging reported"},"interdependencies":["caused_by:weat_heavy_rain"]}',
+        "output": "Crisis: Severe waterlogging in HSR Layout caused by continuous heavy rain. Severity: 7/10.",
+    },
+    {
+        "dataType": "fire_emergency",
+        "input": 'Current situation: {"dataType":"fire_emergency","zone":"MG Road","severity":"CRITICAL","data":{"structure":"commercial high-rise","floors_affected":3}}',
+        "output": "Crisis: Fire in a commercial high-rise on MG Road with multiple floors affected. Severity: 10/10.",
+    },
 ]
 
 PLANNING_EXAMPLES = [
     {
+        "dataType": "traffic",
         "input": "Crisis: Severe traffic jam at Silk Board due to waterlogging. Severity: 9/10.",
         "output": """
         {
@@ -197,5 +624,20 @@ PLANNING_EXAMPLES = [
           ]
         }
         """,
-    }
+    },
+    {
+        "dataType": "power_outage",
+        "input": "Crisis: Substation relay trip has cut power to large parts of Whitefield. Severity: 8/10.",
+        "output": """
+        {
+          "plan_title": "Restore Power Outage in Whitefield",
+          "priority": "High",
+          "steps": [
+            {"action_id": 1, "action": "Dispatch Repair Crew", "details": "Send BESCOM relay specialists to the tripped substation."},
+            {"action_id": 2, "action": "Protect Critical Facilities", "details": "Switch hospitals and emergency services to alternate feeders or generators."},
+            {"action_id": 3, "action": "Issue Outage Notice", "details": "Publish affected areas and the restoration ETA."}
+          ]
+        }
+        """,
+    },
 ]
@@ -0,0 +1,267 @@
+"""
+A precomputed library of template plans, served while the LLM plan is written.
+
+Crises repeat: traffic at the same junctions, power outages in the same
+zones. `build_library` runs the agent's own perceive -> reason -> plan loop
+offline for a representative event at every point of the
+(dataType x BENGALURU_LOCATIONS zone x severity) grid and writes the plans to
+one JSON file, keyed "dataType|zone|severity".
+
+At runtime `PlanLibrary.lookup(event)` finds the template for an event in
+microseconds: the exact grid point if there is one, otherwise the nearest
+library zone (by the event's coordinates) and the nearest severity built for
+that dataType. The agent posts the template as a provisional plan the moment
+a new plan is needed, and the LLM's plan replaces it on the dashboard as it
+streams in, so operators see a plan in milliseconds instead of seconds.
+
+Usage:
+    LLM_BACKEND=vertex python plan_library.py [--output plan_library.json]
+                                              [--workers 4]
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from data_schema import VALID_DATA_TYPES, VALID_SEVERITY_LEVELS
+from locations import BENGALURU_LOCATIONS
+
+LIBRARY_VERSION = 1
+# Tries at drawing a representative event whose simulated readings match the
+# grid point's severity before the severity is simply overwritten.
+REPRESENTATIVE_TRIES = 50
+
+
+def library_key(data_type: str, zone: str, severity: str) -> str:
+    """Returns the library key of a grid point."""
+    return f"{data_type}|{zone}|{severity}"
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance; accurate enough across one city."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371.0 * math.hypot(x, y)
+
+
+def _replace_zone(value, template_zone: str, zone: str):
+    """Returns a copy of a plan with every mention of one zone renamed."""
+    if isinstance(value, str):
+        return value.replace(template_zone, zone)
+    if isinstance(value, list):
+        return [_replace_zone(item, template_zone, zone) for item in value]
+    if isinstance(value, dict):
+        return {key: _replace_zone(item, template_zone, zone) for key, item in value.items()}
+    return value
+
+
+class PlanLibrary:
+    """Template plans indexed by (dataType, zone, severity)."""
+
+    def __init__(self, plans: dict, locations: list = BENGALURU_LOCATIONS):
+        """
+        Args:
+            plans (dict): Plan dictionaries keyed by `library_key`.
+            locations (list): The zones the library was built for, with
+                              their coordinates.
+        """
+        self.plans = plans
+        self.locations = [location for location in locations if location.get("name")]
+        self._severity_rank = {severity: rank for rank, severity in enumerate(VALID_SEVERITY_LEVELS)}
+        # dataType -> zone -> {severity: plan}
+        self._index = {}
+        for key, plan in plans.items():
+            data_type, zone, severity = key.split("|", 2)
+            self._index.setdefault(data_type, {}).setdefault(zone, {})[severity] = plan
+        self._nearest_zone = {}  # event zone -> library zone, for zones outside the grid
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Reads a library written by `build_library`.
+
+        Args:
+            path (str): The library file.
+
+        Returns:
+            PlanLibrary: The library.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If it is not a plan library.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        if not isinstance(document, dict) or document.get("version") != LIBRARY_VERSION:
+            raise ValueError(f"{path} is not a version {LIBRARY_VERSION} plan library.")
+        return cls(document.get("plans", {}), document.get("locations", BENGALURU_LOCATIONS))
+
+    def __len__(self):
+        return len(self.plans)
+
+    def _library_zone(self, zones: dict, event: dict):
+        """Returns the library zone closest to the event's location."""
+        location = event.get("location", {})
+        zone = location.get("zone", "")
+        if zone in zones:
+            return zone
+        nearest = self._nearest_zone.get(zone)
+        if nearest is None:
+            coordinates = location.get("coordinates") or {}
+            lat, lon = coordinates.get("lat"), coordinates.get("lon")
+            if lat is None or lon is None or not self.locations:
+                return next(iter(zones))
+            nearest = min(self.locations, key=lambda loc: _distance_km(lat, lon, loc["lat"], loc["lon"]))["name"]
+            with self._lock:
+                if len(self._nearest_zone) < 10000:
+                    self._nearest_zone[zone] = nearest
+        return nearest if nearest in zones else next(iter(zones))
+
+    def lookup(self, event: dict):
+        """
+        Finds the template plan for an event.
+
+        The zone is matched by name, or else by the nearest library zone; the
+        severity exactly, or else the closest one built. Mentions of the
+        template's zone are renamed to the event's zone.
+
+        Args:
+            event (dict): A validated event.
+
+        Returns:
+            dict | None: A copy of the template plan, or None if the library
+                         has nothing for the event's dataType.
+        """
+        zones = self._index.get(event.get("dataType"))
+        if not zones:
+            with self._lock:
+                self.misses += 1
+            return None
+        zone = self._library_zone(zones, event)
+        severities = zones[zone]
+        severity = event.get("severity")
+        plan = severities.get(severity)
+        if plan is None:
+            rank = self._severity_rank.get(severity, 0)
+            plan = severities[min(severities, key=lambda level: abs(self._severity_rank.get(level, 0) - rank))]
+        with self._lock:
+            self.hits += 1
+        event_zone = event.get("location", {}).get("zone", "")
+        if event_zone and event_zone != zone:
+            return _replace_zone(plan, zone, event_zone)
+        return copy.deepcopy(plan)
+
+    def stats(self) -> dict:
+        """Returns the library size and lookup outcomes."""
+        with self._lock:
+            return {"plans": len(self.plans), "hits": self.hits, "misses": self.misses}
+
+
+def representative_event(data_type: str, location: dict, severity: str, rng: random.Random) -> dict:
+    """
+    Returns a simulated event for one grid point.
+
+    Simulated readings are redrawn until they imply the requested severity,
+    so the plan is built from plausible data; the severity is set regardless.
+    """
+    from data_simulator import generate_event
+
+    for _ in range(REPRESENTATIVE_TRIES):
+        event = generate_event(data_type, rng)
+        if event["severity"] == severity:
+            break
+    event["eventId"] = f"library_{data_type}_{severity}".lower()
+    event["severity"] = severity
+    event["location"]["zone"] = location["name"]
+    event["location"]["coordinates"] = {"lat": location["lat"], "lon": location["lon"]}
+    return event
+
+
+def build_plan(event: dict):
+    """Runs perceive -> reason -> plan for one event; returns the plan or None."""
+    import model
+
+    diagnosis = model.reason(model.perceive(event), model.REASONING_EXAMPLES, event=event)
+    raw_output = model.plan(diagnosis, model.PLANNING_EXAMPLES, event=event)
+    try:
+        plan = json.loads(raw_output.strip().replace("```json", "").replace("```", ""))
+    except json.JSONDecodeError:
+        return None
+    return plan if isinstance(plan, dict) and plan.get("plan_title") else None
+
+
+def build_library(
+    output_path: str,
+    data_types: list = VALID_DATA_TYPES,
+    locations: list = BENGALURU_LOCATIONS,
+    severities: list = VALID_SEVERITY_LEVELS,
+    workers: int = 4,
+    seed: int = 0,
+) -> dict:
+    """
+    Builds a template plan for every grid point and writes the library.
+
+    Args:
+        output_path (str): Where to write the library JSON.
+        data_types (list): The dataTypes to cover.
+        locations (list): The zones to cover, with coordinates.
+        severities (list): The severities to cover.
+        workers (int): Grid points planned concurrently.
+        seed (int): Seed for the representative events.
+
+    Returns:
+        dict: {"plans": built, "failed": grid points without a valid plan,
+               "seconds": build time}.
+    """
+    import model
+
+    rng = random.Random(seed)
+    grid = [
+        (library_key(data_type, location["name"], severity), representative_event(data_type, location, severity, rng))
+        for data_type in data_types
+        for location in locations
+        for severity in severities
+    ]
+    backend_name = model.get_llm_backend().name
+    print(f"PLAN-LIBRARY: Building {len(grid)} template plans with the {backend_name} backend...")
+    started = time.perf_counter()
+    plans = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for (key, _), plan in zip(grid, pool.map(lambda item: build_plan(item[1]), grid)):
+            if plan is None:
+                failed.append(key)
+            else:
+                plans[key] = plan
+    document = {
+        "version": LIBRARY_VERSION,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "backend": backend_name,
+        "locations": locations,
+        "plans": plans,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=1)
+    seconds = time.perf_counter() - started
+    print(f"PLAN-LIBRARY: Wrote {len(plans)} plans to {output_path} in {seconds:.1f} s ({len(failed)} failed).")
+    for key in failed:
+        print(f"PLAN-LIBRARY: No valid plan for {key}")
+    return {"plans": len(plans), "failed": failed, "seconds": seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="plan_library.json", help="The library file to write.")
+    parser.add_argument("--workers", type=int, default=4, help="Grid points planned concurrently.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the representative events.")
+    args = parser.parse_args()
+    build_library(args.output, workers=args.workers, seed=args.seed)
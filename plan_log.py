@@ -0,0 +1,257 @@
+"""
+A durable, append-only on-disk log of the plans accepted by the protocol layer.
+
+Every stored plan is appended as one JSON line to the current log segment.
+Periodically the log is compacted: the plans still retained by the
+`PlanStore` are written to a snapshot file and the segments it covers are
+deleted. On startup the store is rebuilt from the snapshot plus the segments
+written after it, so a restart no longer loses plans (or forces every event
+to be re-planned by Gemini).
+
+Layout of the log directory:
+    snapshot.jsonl          - a header line, then one stored plan per line
+    segment-<first seq>.jsonl - plans appended since the last snapshot
+
+Each plan line is tab-separated: seq, expires_at, the four index values (see
+`plan_store.INDEXED_FIELDS`, empty when missing) and finally the payload JSON.
+The prefix carries everything the store needs, so replay never parses the
+payloads themselves. Neither normalized index values nor serialized JSON can
+contain a raw tab. A plan that was replaced by a later one is recorded as a
+removal line, "-<seq>"; snapshots contain no removals.
+"""
+
+import gc
+import json
+import logging
+import os
+import time
+
+from plan_store import INDEXED_FIELDS, StoredPlan
+
+SNAPSHOT_FILE = "snapshot.jsonl"
+SEGMENT_PREFIX = "segment-"
+
+
+def format_log_line(record) -> str:
+    """Serializes a `StoredPlan` as one log line (without the newline)."""
+    return "\t".join([str(record.seq), repr(record.expires_at), *record.index_keys, record.json])
+
+
+class PlanLog:
+    """
+    Append-only JSONL segments with group-committed fsyncs and snapshots.
+
+    Like `PlanStore`, the log is not thread-safe; the protocol layer calls it
+    under the same lock it uses for the store.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+        segment_max_bytes: int = 32 * 1024 * 1024,
+        compact_every: int = 10000,
+    ):
+        """
+        Args:
+            directory (str): Where the snapshot and segments are kept.
+            fsync_every (int): fsync after this many appends. 1 syncs every
+                               plan, 0 leaves syncing to the OS.
+            fsync_interval (float): Also fsync when this many seconds have
+                                    passed since the last sync.
+            segment_max_bytes (int): Start a new segment past this size.
+            compact_every (int): Appends between snapshots.
+        """
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_every = compact_every
+        self.appends_since_compaction = 0
+        self._segment = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _segment_names(self) -> list:
+        names = [
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl")
+        ]
+        return sorted(names, key=lambda name: int(name[len(SEGMENT_PREFIX):-len(".jsonl")]))
+
+    def _write(self, line: str, seq: int):
+        if self._segment is None or self._segment.tell() >= self.segment_max_bytes:
+            self._close_segment()
+            self._segment = open(
+                self._path(f"{SEGMENT_PREFIX}{seq}.jsonl"), "a", encoding="utf-8"
+            )
+
+        self._segment.write(line + "\n")
+        self._segment.flush()
+        self._unsynced += 1
+        self.appends_since_compaction += 1
+
+        if self.fsync_every and (
+            self._unsynced >= self.fsync_every
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self.sync()
+
+    def append(self, record):
+        """
+        Appends one stored plan to the log.
+
+        The line is always handed to the OS before returning, so it survives a
+        crash of the server process; surviving a machine crash depends on the
+        fsync policy.
+
+        Args:
+            record (StoredPlan): The plan as stored by the `PlanStore`.
+        """
+        self._write(format_log_line(record), record.seq)
+
+    def append_removal(self, seq: int, latest_seq: int):
+        """
+        Records that the plan `seq` was removed from the store.
+
+        Args:
+            seq (int): The removed plan's sequence number.
+            latest_seq (int): The store's latest sequence number, which names
+                              a new segment if one is started.
+        """
+        self._write(f"-{seq}", latest_seq)
+
+    def sync(self):
+        """Forces appended plans to stable storage."""
+        if self._segment is not None and self._unsynced:
+            os.fsync(self._segment.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self.sync()
+            self._segment.close()
+            self._segment = None
+
+    def close(self):
+        """Syncs and closes the current segment."""
+        self._close_segment()
+
+    @property
+    def needs_compaction(self) -> bool:
+        """True once enough plans were appended since the last snapshot."""
+        return self.appends_since_compaction >= self.compact_every
+
+    def compact(self, records: list, latest_seq: int):
+        """
+        Writes a snapshot of the retained plans and drops the covered segments.
+
+        The snapshot is written to a temporary file and atomically renamed, so
+        a crash mid-compaction leaves the previous snapshot and segments intact.
+
+        Args:
+            records (list): The `StoredPlan` records currently retained.
+            latest_seq (int): The highest sequence number issued so far.
+        """
+        self._close_segment()
+        header = json.dumps({"snapshot_seq": latest_seq, "created_at": time.time()})
+        temp_path = self._path(SNAPSHOT_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(header + "\n")
+            f.write("".join(format_log_line(record) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._path(SNAPSHOT_FILE))
+
+        for name in self._segment_names():
+            os.remove(self._path(name))
+        self.appends_since_compaction = 0
+        logging.info(f"Plan log compacted: {len(records)} plans snapshotted at seq {latest_seq}.")
+
+    def replay(self, store) -> int:
+        """
+        Rebuilds a `PlanStore` from the snapshot and the log tail.
+
+        The log is walked from its newest line back, applying removals, until
+        the store's `max_plans` is reached, so plans the store would evict
+        at once are never parsed; the survivors are then bulk-loaded with
+        `PlanStore.load`. A truncated or corrupt line (e.g. from a crash
+        mid-write) is skipped. Payloads are restored in serialized form and
+        parsed only when used.
+
+        Args:
+            store (PlanStore): An empty store to restore the plans into.
+
+        Returns:
+            int: The number of plans read from disk.
+        """
+        snapshot_seq = 0
+        restored = 0
+        field_count = 2 + len(INDEXED_FIELDS)
+        now = store.clock()
+        names = self._segment_names()
+        if os.path.exists(self._path(SNAPSHOT_FILE)):
+            names.insert(0, SNAPSHOT_FILE)
+            with open(self._path(SNAPSHOT_FILE), "r", encoding="utf-8") as f:
+                snapshot_seq = json.loads(f.readline())["snapshot_seq"]
+            store.latest_seq = max(store.latest_seq, snapshot_seq)
+        self.appends_since_compaction = 0
+
+        # Restoring creates one small object graph per plan; pausing the cyclic
+        # garbage collector avoids repeated full scans during a bulk load.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            kept = []  # newest first
+            removed = set()
+            # Files are read newest first, and only until the store is full.
+            for name in reversed(names):
+                is_snapshot = name == SNAPSHOT_FILE
+                with open(self._path(name), "r", encoding="utf-8") as f:
+                    if is_snapshot:
+                        f.readline()
+                    lines = f.readlines()
+                if not is_snapshot:
+                    self.appends_since_compaction += len(lines)
+                for line in reversed(lines):
+                    if not line.endswith("\n"):
+                        logging.warning(f"Skipping truncated line in plan log file {name}.")
+                        continue
+                    if line.startswith("-"):
+                        try:
+                            removed.add(int(line[1:]))
+                        except ValueError:
+                            logging.warning(f"Skipping unreadable line in plan log file {name}.")
+                        continue
+                    fields = line.split("\t", field_count)
+                    try:
+                        seq, expires_at = int(fields[0]), float(fields[1])
+                        plan_json = fields[field_count][:-1]
+                    except (ValueError, IndexError):
+                        logging.warning(f"Skipping unreadable line in plan log file {name}.")
+                        continue
+                    if not is_snapshot and seq <= snapshot_seq:
+                        continue
+                    restored += 1
+                    if seq > store.latest_seq:
+                        store.latest_seq = seq
+                    if seq in removed or (store.retention_factor > 0 and expires_at <= now):
+                        continue
+                    kept.append(StoredPlan(seq, plan_json, tuple(fields[2:field_count]), expires_at))
+                    if len(kept) == store.max_plans:
+                        break
+                if store.max_plans and len(kept) >= store.max_plans:
+                    break
+            kept.reverse()
+            store.load(kept)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return restored
@@ -0,0 +1,138 @@
+"""
+Tracks the agent's active plans, one per incident.
+
+A single global "current plan" makes independent incidents evict each other:
+a traffic event in one zone replaces the plan for a power outage in another,
+and the next power event re-plans from scratch. The registry keeps one plan
+per incident key, (crisis group, zone), so `adapt()` is asked only about the
+plan for the event's own incident. A plan expires after its source event's
+`validity_period_minutes`, after which the next event for that incident is
+planned again.
+
+The registry also records which incidents are being planned right now. A
+second event for the same incident does not start a parallel LLM round trip,
+and it does not hold a worker thread while it waits either: it is parked on
+the claim and handed back by `release`, to be queued again and decided
+against the fresh plan. Other incidents proceed in parallel.
+"""
+
+import threading
+import time
+
+
+class ActivePlanRegistry:
+    """Active plans keyed by incident, with expiry and in-flight tracking."""
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Args:
+            clock (callable): Returns the current time in seconds.
+        """
+        self.clock = clock
+        self.plans_stored = 0
+        self.plans_expired = 0
+        self.deferred = 0
+        self._plans = {}  # key -> (plan, expires_at)
+        self._in_flight = set()
+        self._parked = {}  # key -> items deferred until the claim is released
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        # Active incidents number in the tens, so a full sweep is cheap.
+        expired = [key for key, (_, expires_at) in self._plans.items() if expires_at <= now]
+        for key in expired:
+            del self._plans[key]
+        self.plans_expired += len(expired)
+
+    def get(self, key):
+        """
+        Returns the active plan for an incident.
+
+        Args:
+            key (tuple): The incident key.
+
+        Returns:
+            The plan, or None if there is none or it has expired.
+        """
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= self.clock():
+                del self._plans[key]
+                self.plans_expired += 1
+                return None
+            return entry[0]
+
+    def put(self, key, plan, validity_seconds: float):
+        """
+        Stores the plan for an incident, replacing any earlier one.
+
+        Args:
+            key (tuple): The incident key.
+            plan: The plan object, e.g. a `model.ClassifiedPlan`.
+            validity_seconds (float): How long the plan stays active.
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self._plans[key] = (plan, now + validity_seconds)
+            self.plans_stored += 1
+
+    def claim(self, key, park=None) -> tuple:
+        """
+        Marks an incident as being planned and returns its current plan.
+
+        Never waits. If another worker is already planning this incident, the
+        claim fails and `park` is held until that worker calls
+        `release(key)`, which returns it so the caller can queue it again. A
+        successful claim must be paired with `release(key)`.
+
+        Args:
+            key (tuple): The incident key.
+            park (optional): The caller's work item, deferred if the incident
+                             is being planned.
+
+        Returns:
+            tuple: (claimed, plan): whether the claim was taken, and the
+                   incident's active plan (None if there is none or the claim
+                   failed).
+        """
+        with self._lock:
+            if key in self._in_flight:
+                self.deferred += 1
+                if park is not None:
+                    self._parked.setdefault(key, []).append(park)
+                return False, None
+            self._in_flight.add(key)
+        return True, self.get(key)
+
+    def release(self, key) -> list:
+        """
+        Ends the planning claim taken by `claim(key)`.
+
+        Returns:
+            list: The items parked on the claim, in the order they arrived.
+        """
+        with self._lock:
+            self._in_flight.discard(key)
+            return self._parked.pop(key, [])
+
+    def active(self) -> dict:
+        """Returns {key: plan} for every plan that has not expired."""
+        with self._lock:
+            self._expire(self.clock())
+            return {key: plan for key, (plan, _) in self._plans.items()}
+
+    def stats(self) -> dict:
+        """Returns active/in-flight incident counts and running totals."""
+        with self._lock:
+            self._expire(self.clock())
+            return {
+                "active_plans": len(self._plans),
+                "in_flight": len(self._in_flight),
+                "plans_stored": self.plans_stored,
+                "plans_expired": self.plans_expired,
+                "deferred": self.deferred,
+                "parked": sum(len(items) for items in self._parked.values()),
+            }
@@ -0,0 +1,297 @@
+"""
+An indexed, bounded in-memory store for the plans received by the protocol layer.
+
+Plans are kept in arrival order under a monotonically increasing sequence
+number and serialized once when stored. Secondary indexes on the source
+event's `eventId`, `dataType`, `severity` and `location.zone` let queries
+touch only the matching plans, and retention is capped both by count and by
+age (derived from the event's `validity_period_minutes`), so memory stays flat
+during long shifts.
+"""
+
+import heapq
+import json
+import time
+from collections import OrderedDict, defaultdict
+from itertools import islice
+
+from data_schema import validity_seconds
+
+INDEXED_FIELDS = ("eventId", "dataType", "severity", "zone")
+
+
+def normalize_index_value(value) -> str:
+    """Normalizes a field value so lookups ignore case and runs of whitespace."""
+    return " ".join(str(value).split()).lower()
+
+
+def extract_index_keys(payload: dict) -> tuple:
+    """
+    Extracts the indexed field values from a `/recommend` payload.
+
+    The severity falls back to the plan's `priority` for payloads whose source
+    event carries no severity (as in the `static/` story files).
+
+    Args:
+        payload (dict): A payload with 'plan' and 'source_event' keys.
+
+    Returns:
+        tuple: The normalized values in `INDEXED_FIELDS` order, with "" for
+               fields missing from the payload.
+    """
+    source_event = payload.get("source_event") or {}
+    plan = payload.get("plan") or {}
+    raw_values = {
+        "eventId": source_event.get("eventId"),
+        "dataType": source_event.get("dataType"),
+        "severity": source_event.get("severity") or plan.get("priority"),
+        "zone": (source_event.get("location") or {}).get("zone"),
+    }
+    return tuple(
+        normalize_index_value(raw_values[field]) if raw_values[field] not in (None, "") else ""
+        for field in INDEXED_FIELDS
+    )
+
+
+class StoredPlan:
+    """
+    A plan held by the store together with its bookkeeping.
+
+    Plans restored from disk keep only their serialized form; the payload dict
+    is parsed on first access, since feeds and streams only need the JSON.
+    """
+
+    __slots__ = ("seq", "json", "index_keys", "expires_at", "_payload")
+
+    def __init__(self, seq: int, plan_json: str, index_keys: tuple, expires_at: float, payload: dict = None):
+        self.seq = seq
+        self.json = plan_json
+        self.index_keys = index_keys
+        self.expires_at = expires_at
+        self._payload = payload
+
+    @property
+    def payload(self) -> dict:
+        if self._payload is None:
+            self._payload = json.loads(self.json)
+        return self._payload
+
+
+class PlanStore:
+    """
+    Sequence-ordered plan storage with secondary indexes and eviction.
+
+    The store is not thread-safe; the protocol layer serializes access to it
+    with its own lock.
+    """
+
+    def __init__(self, max_plans: int = 5000, retention_factor: float = 1.0, clock=time.time):
+        """
+        Args:
+            max_plans (int): The maximum number of plans retained. The oldest
+                             plans are evicted first. 0 disables the cap.
+            retention_factor (float): How many validity periods a plan is kept
+                                      after it was received. 0 disables age
+                                      eviction.
+            clock (callable): Returns the current time in epoch seconds.
+        """
+        self.max_plans = max_plans
+        self.retention_factor = retention_factor
+        self.clock = clock
+        self.latest_seq = 0
+        self.evicted_count = 0
+        self._plans = OrderedDict()
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._index_list = [self._indexes[field] for field in INDEXED_FIELDS]
+        self._expiry_heap = []
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def add(self, payload: dict) -> StoredPlan:
+        """
+        Stores a new plan payload, stamping it with `seq` and `received_at`.
+
+        Args:
+            payload (dict): A validated `/recommend` payload. It is modified in
+                            place.
+
+        Returns:
+            StoredPlan: The stored record.
+        """
+        self.latest_seq += 1
+        payload["seq"] = self.latest_seq
+        received_at = payload.get("received_at")
+        if isinstance(received_at, bool) or not isinstance(received_at, (int, float)):
+            payload["received_at"] = self.clock()
+        expires_at = payload["received_at"] + validity_seconds(payload.get("source_event")) * self.retention_factor
+        record = StoredPlan(
+            payload["seq"], json.dumps(payload), extract_index_keys(payload), expires_at, payload
+        )
+        self._insert(record)
+        self.evict()
+        return record
+
+    def load(self, records: list):
+        """
+        Bulk-loads plans that were stored by `add` earlier, e.g. on replay.
+
+        The payloads are not parsed; the records carry the bookkeeping that
+        `add` computed for them. Plans past their retention age are skipped
+        and only the newest `max_plans` are kept, so nothing loaded is
+        evicted again, and the expiry heap is built once.
+
+        Args:
+            records (list): `StoredPlan` records in sequence order, all newer
+                            than the plans already in the store.
+        """
+        if self.retention_factor > 0:
+            now = self.clock()
+            records = [record for record in records if record.expires_at > now]
+        if self.max_plans and len(self._plans) + len(records) > self.max_plans:
+            records = records[-self.max_plans:]
+        seqs = [record.seq for record in records]
+        self._plans.update(zip(seqs, records))
+        # One column at a time: grouping into fresh buckets is much cheaper
+        # than a lookup per record and index.
+        for index, values in zip(self._index_list, zip(*(record.index_keys for record in records))):
+            buckets = defaultdict(dict)
+            for seq, value in zip(seqs, values):
+                buckets[value][seq] = None
+            buckets.pop("", None)
+            for value, bucket in buckets.items():
+                existing = index.get(value)
+                if existing is None:
+                    index[value] = bucket
+                else:
+                    existing.update(bucket)
+        if records:
+            self.latest_seq = max(self.latest_seq, records[-1].seq)
+        if self.retention_factor > 0:
+            self._expiry_heap.extend((record.expires_at, record.seq) for record in records)
+            heapq.heapify(self._expiry_heap)
+        self.evict()
+
+    def _insert(self, record: StoredPlan):
+        self._plans[record.seq] = record
+        for index, value in zip(self._index_list, record.index_keys):
+            if value:
+                index.setdefault(value, {})[record.seq] = None
+        if self.retention_factor > 0:
+            heapq.heappush(self._expiry_heap, (record.expires_at, record.seq))
+
+    def _remove(self, seq: int):
+        record = self._plans.pop(seq)
+        for index, value in zip(self._index_list, record.index_keys):
+            if value:
+                bucket = index[value]
+                del bucket[seq]
+                if not bucket:
+                    del index[value]
+        self.evicted_count += 1
+
+    def discard(self, seq: int) -> bool:
+        """
+        Removes a plan before it ages out, e.g. when a newer plan replaces it.
+
+        Args:
+            seq (int): The plan's sequence number.
+
+        Returns:
+            bool: True if the plan was retained and has been removed.
+        """
+        if seq not in self._plans:
+            return False
+        self._remove(seq)
+        return True
+
+    def evict(self):
+        """Drops plans past their retention age, then the oldest over the cap."""
+        now = self.clock()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, seq = heapq.heappop(heap)
+            if seq in self._plans:
+                self._remove(seq)
+        while self.max_plans and len(self._plans) > self.max_plans:
+            self._remove(next(iter(self._plans)))
+        # Entries for plans evicted by count are dropped lazily above; rebuild
+        # the heap if they start to dominate it.
+        if len(heap) > 2 * len(self._plans) + 64:
+            self._expiry_heap = [(record.expires_at, seq) for seq, record in self._plans.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def get(self, seq: int):
+        """Returns the stored record for `seq`, or None if it is not retained."""
+        return self._plans.get(seq)
+
+    def since(self, seq: int, limit: int = None) -> list:
+        """
+        Returns the retained plans with a sequence number greater than `seq`.
+
+        Args:
+            seq (int): The last sequence number the caller has seen.
+            limit (int, optional): The maximum number of plans to return.
+
+        Returns:
+            list: StoredPlan records in sequence order.
+        """
+        if not self._plans:
+            return []
+        first_seq = next(iter(self._plans))
+        if seq < first_seq:
+            records = iter(self._plans.values())
+        else:
+            # Walk the sequence range directly so the cost is proportional to
+            # the number of newer plans, not the size of the store.
+            records = (
+                self._plans[s] for s in range(seq + 1, self.latest_seq + 1) if s in self._plans
+            )
+        return list(islice(records, limit))
+
+    def query(self, since: int = 0, limit: int = None, **filters) -> list:
+        """
+        Returns the retained plans matching every given index filter.
+
+        Only the smallest matching index bucket is scanned; the other filters
+        are checked by dictionary membership.
+
+        Args:
+            since (int): Only plans with a greater sequence number are returned.
+            limit (int, optional): The maximum number of plans to return.
+            **filters: Values for any of `INDEXED_FIELDS`; None is ignored.
+
+        Returns:
+            list: StoredPlan records in sequence order.
+
+        Raises:
+            ValueError: If a filter names a field that is not indexed.
+        """
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter on unindexed field(s): {', '.join(sorted(unknown))}")
+
+        buckets = [
+            self._indexes[field].get(normalize_index_value(value), {})
+            for field, value in filters.items()
+            if value is not None
+        ]
+        if not buckets:
+            return self.since(since, limit)
+
+        buckets.sort(key=len)
+        smallest, others = buckets[0], buckets[1:]
+        matches = (
+            self._plans[seq]
+            for seq in smallest
+            if seq > since and all(seq in bucket for bucket in others)
+        )
+        return list(islice(matches, limit))
+
+    def summary(self) -> dict:
+        """Returns the number of retained plans per value of each indexed field."""
+        return {
+            field: {value: len(bucket) for value, bucket in index.items()}
+            for field, index in self._indexes.items()
+            if field != "eventId"
+        }
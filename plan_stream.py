@@ -0,0 +1,132 @@
+"""
+Incrementally parses an action plan while the LLM is still writing it.
+
+The planner answers with one JSON object:
+    {"plan_title": ..., "priority": ..., "steps": [{...}, {...}, ...]}
+`PlanStreamParser` is fed the response chunk by chunk and reports each
+top-level field as soon as its value is complete, and each entry of `steps`
+as soon as its closing brace arrives, so the first actionable step can reach
+operators long before the full plan has been generated.
+
+The parser only tracks string/escape state and nesting depth; every complete
+piece is handed to `json.loads`, so it accepts exactly what the final parse
+accepts. Text before the first "{" (e.g. a Markdown code fence) is ignored.
+Once the stream ends, the full text is still parsed as before and is the
+authoritative plan.
+"""
+
+import json
+
+
+class PlanStreamParser:
+    """Feeds on response chunks and reports completed plan fields and steps."""
+
+    def __init__(self, steps_field: str = "steps"):
+        """
+        Args:
+            steps_field (str): The top-level list whose entries are reported
+                               one by one.
+        """
+        self.steps_field = steps_field
+        self.plan = {}
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._done = False
+        self._member_start = None
+        self._member_key = None
+        self._in_steps = False
+        self._step_start = None
+
+    def feed(self, chunk: str) -> list:
+        """
+        Consumes the next chunk of the response.
+
+        Args:
+            chunk (str): The newly received text.
+
+        Returns:
+            list: (field, value) updates completed by this chunk, in order.
+                  A completed step is reported as ("step", step_dict); it is
+                  also appended to `plan[steps_field]`.
+        """
+        self._text += chunk
+        text = self._text
+        updates = []
+        i = self._pos
+        while i < len(text) and not self._done:
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 1:
+                    self._member_key = self._parse_key(text[self._member_start:i])
+                    self._in_steps = char == "[" and self._member_key == self.steps_field
+                elif self._depth == 2 and self._in_steps and char == "{":
+                    self._step_start = i
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._step_start is not None:
+                    self._complete_step(text[self._step_start:i + 1], updates)
+                    self._step_start = None
+                elif self._depth == 1:
+                    self._in_steps = False
+                elif self._depth == 0:
+                    self._complete_member(text[self._member_start:i], updates)
+                    self._done = True
+            elif char == "," and self._depth == 1:
+                self._complete_member(text[self._member_start:i], updates)
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return updates
+
+    @staticmethod
+    def _parse_key(member_text: str):
+        key_text, separator, _ = member_text.partition(":")
+        if not separator:
+            return None
+        try:
+            return json.loads(key_text)
+        except ValueError:
+            return None
+
+    def _complete_step(self, step_text: str, updates: list):
+        try:
+            step = json.loads(step_text)
+        except ValueError:
+            return
+        self.plan.setdefault(self.steps_field, []).append(step)
+        updates.append(("step", step))
+
+    def _complete_member(self, member_text: str, updates: list):
+        if not member_text.strip():
+            return
+        try:
+            member = json.loads("{" + member_text + "}")
+        except ValueError:
+            return
+        for key, value in member.items():
+            if key == self.steps_field:
+                # Entries were already reported one by one; keep the parsed
+                # list in case some of them were not objects. Anything but a
+                # list is left to the final parse to validate or repair.
+                if isinstance(value, list) and len(value) != len(self.plan.get(key, [])):
+                    self.plan[key] = value
+                continue
+            self.plan[key] = value
+            updates.append((key, value))
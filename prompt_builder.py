@@ -0,0 +1,203 @@
+"""
+Builds compact, token-budgeted prompts for the agent's LLM calls.
+
+Instead of pasting every few-shot example (as a Python list repr) and the full
+raw event into each prompt, the builder:
+- renders events in a compact canonical form with only the fields the model
+  needs (no metadata, no coordinates),
+- picks the few-shot examples tagged with the event's dataType from an
+  indexed example library, falling back to untagged general examples,
+- drops examples as needed to keep the prompt within a token budget, and
+- records the size of every prompt it builds (reported through a callback,
+  or printed in verbose mode).
+"""
+
+import json
+import threading
+
+from llm_backend import estimate_tokens
+
+# Fields of an event that are shown to the LLM, in the canonical order.
+CANONICAL_FIELDS = ("eventId", "dataType", "zone", "severity", "timestamp", "data", "interdependencies")
+
+
+def canonical_event(event: dict, include_id: bool = False) -> str:
+    """
+    Renders an event as compact JSON holding only what the LLM needs.
+
+    Args:
+        event (dict): The raw event.
+        include_id (bool): Keep the eventId (only useful for batched prompts).
+
+    Returns:
+        str: The compact canonical form.
+    """
+    compact = {
+        "eventId": event.get("eventId") if include_id else None,
+        "dataType": event.get("dataType"),
+        "zone": (event.get("location") or {}).get("zone"),
+        "severity": event.get("severity"),
+        "timestamp": event.get("timestamp"),
+        "data": event.get("data") or None,
+        "interdependencies": [
+            f"{link.get('relationship')}:{link.get('eventId')}"
+            for link in event.get("interdependencies") or []
+        ]
+        or None,
+    }
+    ordered = {field: compact[field] for field in CANONICAL_FIELDS if compact[field] is not None}
+    return json.dumps(ordered, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_example_text(text: str) -> str:
+    """Minifies example text that is JSON; other text is only stripped."""
+    text = text.strip()
+    try:
+        return json.dumps(json.loads(text), separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        return text
+
+
+class ExampleLibrary:
+    """
+    Few-shot examples indexed by the dataType they illustrate.
+
+    Each example is a dict with "input" and "output" and an optional
+    "dataType"; untagged examples are general fallbacks.
+    """
+
+    def __init__(self, examples: list):
+        """
+        Args:
+            examples (list): The few-shot example dictionaries.
+        """
+        self.source = examples
+        self.by_data_type = {}  # dataType -> [(rendered example, estimated tokens)]
+        self.general = []
+        for example in examples:
+            rendered = (
+                f"Input: {compact_example_text(example['input'])}\n"
+                f"Output: {compact_example_text(example['output'])}"
+            )
+            entry = (rendered, estimate_tokens(rendered))
+            data_type = example.get("dataType")
+            if data_type:
+                self.by_data_type.setdefault(data_type, []).append(entry)
+            else:
+                self.general.append(entry)
+
+    def select(self, data_types, token_budget: int, max_examples: int) -> list:
+        """
+        Picks the examples for a prompt.
+
+        Examples tagged with one of `data_types` come first, then general
+        ones. If the library has neither, examples for other dataTypes are
+        used so the model still sees the expected answer format. Examples
+        that would overrun the budget are skipped.
+
+        Args:
+            data_types (iterable): The dataTypes the prompt is about.
+            token_budget (int): Tokens available for examples.
+            max_examples (int): The most examples to include.
+
+        Returns:
+            list: Rendered example strings.
+        """
+        candidates = []
+        for data_type in dict.fromkeys(data_types):
+            candidates.extend(self.by_data_type.get(data_type, []))
+        candidates.extend(self.general)
+        if not candidates:
+            candidates = [entry for entries in self.by_data_type.values() for entry in entries]
+
+        selected = []
+        for rendered, tokens in candidates:
+            if len(selected) >= max_examples:
+                break
+            if tokens <= token_budget:
+                selected.append(rendered)
+                token_budget -= tokens
+        return selected
+
+
+class PromptBuilder:
+    """Assembles prompts within a token budget and tracks their sizes."""
+
+    def __init__(self, token_budget: int = 1500, max_examples: int = 2, observe_tokens=None, verbose: bool = False):
+        """
+        Args:
+            token_budget (int): The estimated token limit for a whole prompt.
+                                The instruction and data are always included;
+                                examples fill what is left.
+            max_examples (int): The most few-shot examples per prompt.
+            observe_tokens (callable, optional): Called as
+                `observe_tokens(kind, tokens)` with each prompt's estimated
+                size, e.g. with a labelled histogram.
+            verbose (bool): Also print the size of every prompt.
+        """
+        self.token_budget = token_budget
+        self.max_examples = max_examples
+        self.observe_tokens = observe_tokens
+        self.verbose = verbose
+        self._libraries = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def library_for(self, examples) -> ExampleLibrary:
+        """Returns the (cached) indexed library for a list of examples."""
+        if isinstance(examples, ExampleLibrary):
+            return examples
+        library = self._libraries.get(id(examples))
+        if library is None or library.source is not examples:
+            library = ExampleLibrary(examples)
+            self._libraries[id(examples)] = library
+        return library
+
+    def build(self, kind: str, instruction: str, examples, data_types, body: str, answer_label: str) -> str:
+        """
+        Builds a prompt and records its size.
+
+        Args:
+            kind (str): Which step the prompt is for, e.g. "reason".
+            instruction (str): The task description.
+            examples: A list of example dicts or an ExampleLibrary.
+            data_types (iterable): The dataTypes used to pick examples.
+            body (str): The labelled input, e.g. "Data:\\n{...}".
+            answer_label (str): The final line the model completes.
+
+        Returns:
+            str: The prompt.
+        """
+        fixed = f"{instruction}\n---\n{body}\n{answer_label}"
+        fixed_tokens = estimate_tokens(fixed)
+        selected = self.library_for(examples).select(
+            data_types, self.token_budget - fixed_tokens, self.max_examples
+        )
+        if selected:
+            prompt = f"{instruction}\nFollow these examples:\n" + "\n\n".join(selected) + f"\n---\n{body}\n{answer_label}"
+        else:
+            prompt = fixed
+
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            stats = self._stats.setdefault(kind, {"prompts": 0, "tokens_total": 0, "tokens_max": 0, "examples_total": 0})
+            stats["prompts"] += 1
+            stats["tokens_total"] += tokens
+            stats["tokens_max"] = max(stats["tokens_max"], tokens)
+            stats["examples_total"] += len(selected)
+        if self.observe_tokens is not None:
+            self.observe_tokens(kind, tokens)
+        if self.verbose:
+            print(f"AGENT-PROMPT: {kind} prompt ~{tokens} tokens with {len(selected)} example(s).")
+        return prompt
+
+    def stats(self) -> dict:
+        """Returns prompt counts and estimated token sizes per kind."""
+        with self._lock:
+            return {
+                kind: {
+                    **stats,
+                    "tokens_avg": stats["tokens_total"] / stats["prompts"] if stats["prompts"] else 0.0,
+                }
+                for kind, stats in self._stats.items()
+            }
@@ -5,10 +5,18 @@ It serves the main HTML page and provides endpoints for the frontend to
 fetch the latest action plans generated by the agent.
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
+from collections import OrderedDict
+import json
 import logging
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
+from metrics import REGISTRY
+from plan_log import PlanLog
+from plan_store import INDEXED_FIELDS, PlanStore
 load_dotenv()
 
 
@@ -20,10 +28,144 @@ logging.basicConfig(
 # -----------------------------
 
 # --- In-Memory Storage ---
-# A simple list to store all plans received during the server's runtime.
-all_received_plans = []
+# An indexed, bounded store of the plans received during the server's runtime.
+# Each plan is stamped with a sequence number ("seq") on arrival and
+# serialized exactly once. All access goes through `plans_lock`.
+plan_store = PlanStore(
+    max_plans=int(os.getenv("PLAN_STORE_MAX_PLANS", "5000")),
+    retention_factor=float(os.getenv("PLAN_RETENTION_FACTOR", "1.0")),
+)
+plans_lock = threading.Lock()
+
+# The `delivery_id`s of recently stored payloads. The agent's delivery is
+# at-least-once, so a batch re-sent after a timeout is stored only once. They
+# are rebuilt from the plan log on startup, so a batch re-sent across a
+# restart is recognized too.
+DELIVERY_DEDUP_SIZE = 10000
+recent_delivery_ids = OrderedDict()
+# -------------------------
+
+# --- Durable Plan Log ---
+# Accepted plans are appended to an on-disk log so a restart can rebuild the
+# store instead of re-running the agent. Set PLAN_LOG_DIR to "" to disable.
+PLAN_LOG_DIR = os.getenv("PLAN_LOG_DIR", "plan_log")
+plan_log = None
+if PLAN_LOG_DIR:
+    plan_log = PlanLog(
+        PLAN_LOG_DIR,
+        fsync_every=int(os.getenv("PLAN_LOG_FSYNC_EVERY", "64")),
+        compact_every=int(os.getenv("PLAN_LOG_COMPACT_EVERY", "10000")),
+    )
+    replay_started = time.perf_counter()
+    replayed_count = plan_log.replay(plan_store)
+    logging.info(
+        f"Restored {len(plan_store)} plans ({replayed_count} read) from '{PLAN_LOG_DIR}' "
+        f"in {(time.perf_counter() - replay_started) * 1000:.0f} ms."
+    )
+    # Parsed without caching the payloads on the records; this runs only once.
+    for record in plan_store.since(max(0, plan_store.latest_seq - DELIVERY_DEDUP_SIZE)):
+        delivery_id = json.loads(record.json).get("delivery_id")
+        if delivery_id:
+            recent_delivery_ids[delivery_id] = None
+
+# Recently built feed bodies, keyed by the page they cover. Dashboards polling
+# from the same cursor share one serialized response.
+FEED_CACHE_SIZE = 64
+feed_body_cache = OrderedDict()
 # -------------------------
 
+# --- Live Plan Stream ---
+# Every connected /stream-plans client owns a bounded buffer. The gevent worker
+# monkey-patches `threading` and `queue`, so a client blocked on its buffer
+# only parks its own greenlet.
+STREAM_CLIENT_BUFFER = int(os.getenv("STREAM_CLIENT_BUFFER", "256"))
+STREAM_HEARTBEAT_SECONDS = 15
+stream_subscribers = set()
+# ------------------------
+
+# --- Metrics ---
+# Request rates and latencies, plan store figures and (pushed by the agent
+# to /metrics/push) the agent's per-stage timings, served on /metrics.
+METRICS_PUSH_MAX_BYTES = 1 << 20
+HTTP_REQUESTS = REGISTRY.counter(
+    "bureaux_http_requests_total", "Protocol layer requests by endpoint, method and status.", ("endpoint", "method", "status")
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "bureaux_http_request_seconds", "Time to build each protocol layer response.", ("endpoint",)
+)
+REGISTRY.gauge("bureaux_plan_store_plans", "Plans retained in the plan store.", callback=lambda: len(plan_store))
+REGISTRY.counter("bureaux_plans_stored_total", "Plans stored since the store was created.", callback=lambda: plan_store.latest_seq)
+REGISTRY.counter("bureaux_plans_evicted_total", "Plans evicted or replaced in the plan store.", callback=lambda: plan_store.evicted_count)
+REGISTRY.gauge("bureaux_stream_clients", "Connected /stream-plans clients.", callback=lambda: len(stream_subscribers))
+REGISTRY.gauge(
+    "bureaux_agent_metrics_age_seconds",
+    "Seconds since the agent last pushed its metrics (-1 if it never did).",
+    callback=lambda: time.time() - agent_metrics["pushed_at"] if agent_metrics["pushed_at"] else -1,
+)
+agent_metrics = {"text": "", "pushed_at": 0.0}
+# ---------------
+
+
+class PlanSubscriber:
+    """A single streaming client and its bounded buffer of pending plans."""
+
+    def __init__(self, maxsize: int):
+        self.buffer = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, seq: int, plan_json: str):
+        """
+        Queues a plan for this client without ever blocking the publisher.
+
+        A client that falls a full buffer behind is flagged as overflowed; its
+        stream is closed once the buffer drains and the browser reconnects with
+        `Last-Event-ID`, picking up the missed plans from the feed history.
+
+        Args:
+            seq (int): The plan's sequence number.
+            plan_json (str): The plan payload, already serialized.
+        """
+        if self.overflowed:
+            return
+        try:
+            self.buffer.put_nowait((seq, plan_json))
+        except queue.Full:
+            self.overflowed = True
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    started = g.get("request_started")
+    if started is not None:
+        HTTP_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    return response
+
+
+def find_streaming_plan(event_id):
+    """
+    Returns the stored partial ("streaming") plan for an event, if any.
+
+    Must be called with `plans_lock` held.
+    """
+    if not event_id:
+        return None
+    for record in reversed(plan_store.query(eventId=event_id)):
+        if record.payload.get("plan_status") == "streaming":
+            return record
+    return None
+
+
+def format_sse(seq: int, plan_json: str) -> str:
+    """Formats a serialized plan as a Server-Sent Events message."""
+    return f"id: {seq}\nevent: plan\ndata: {plan_json}\n\n"
+
 
 @app.route("/")
 def dashboard():
@@ -33,33 +175,316 @@ def dashboard():
     return render_template("index.html", maps_api_key=google_api_key)
 
 
+def is_valid_payload(data) -> bool:
+    """True if a posted payload carries both a plan and its source event."""
+    return isinstance(data, dict) and "plan" in data and "source_event" in data
+
+
+def store_plan(data: dict):
+    """
+    Stores, logs and publishes one accepted plan payload.
+
+    While a plan is being generated the agent posts partial plans with
+    `plan_status: "streaming"` and finally the complete one with
+    `plan_status: "final"`. Each of them replaces the previous partial plan
+    for the same eventId: it is stored under a new seq, names the plan it
+    supersedes in `replaces`, and the old record is removed. Partial plans of
+    its `merged_events` (e.g. a provisional plan from the plan library posted
+    for an event that was then coalesced) are replaced and removed as well. A
+    partial plan that arrives after the final one (e.g. re-sent late) is
+    ignored.
+
+    When plan generation fails after partial plans were posted, the agent
+    posts `plan_status: "cancelled"` instead. It replaces the partial plans
+    the same way, so they are removed from the store and the dashboard drops
+    their card; with no partial plan left to replace, it is ignored.
+
+    A payload whose `delivery_id` was stored recently is a re-sent duplicate
+    and is ignored as well.
+
+    Must be called with `plans_lock` held; the caller checks for compaction.
+
+    Args:
+        data (dict): A validated `/recommend` payload.
+
+    Returns:
+        StoredPlan | None: The stored record, or None if it was ignored.
+    """
+    delivery_id = data.get("delivery_id")
+    if delivery_id:
+        if delivery_id in recent_delivery_ids:
+            return None
+        recent_delivery_ids[delivery_id] = None
+        if len(recent_delivery_ids) > DELIVERY_DEDUP_SIZE:
+            recent_delivery_ids.popitem(last=False)
+
+    replaced = []
+    if data.get("plan_status"):
+        event_id = data["source_event"].get("eventId")
+        if data["plan_status"] == "streaming" and event_id:
+            previous = plan_store.query(eventId=event_id)
+            if previous and previous[-1].payload.get("plan_status") == "final":
+                return None
+        for covered_id in (event_id, *data.get("merged_events", ())):
+            partial = find_streaming_plan(covered_id)
+            if partial is not None and partial not in replaced:
+                replaced.append(partial)
+        if data["plan_status"] == "cancelled" and not replaced:
+            return None
+        if replaced:
+            data["replaces"] = replaced[0].seq
+    record = plan_store.add(data)
+    for partial in replaced:
+        plan_store.discard(partial.seq)
+    if plan_log is not None:
+        plan_log.append(record)
+        for partial in replaced:
+            plan_log.append_removal(partial.seq, plan_store.latest_seq)
+    for subscriber in stream_subscribers:
+        subscriber.offer(record.seq, record.json)
+    return record
+
+
+def compact_plan_log_if_needed():
+    """Snapshots the plan log once enough plans were appended. Needs `plans_lock`."""
+    if plan_log is not None and plan_log.needs_compaction:
+        plan_log.compact(plan_store.since(0), plan_store.latest_seq)
+
+
 @app.route("/recommend", methods=["POST"])
 def handle_recommendation():
     """
     An endpoint for the agentic engine (main.py) to post new plans.
+
+    See `store_plan` for how streamed partial plans are replaced.
     """
-    global all_received_plans
     data = request.json
 
-    if not data or "plan" not in data or "source_event" not in data:
+    if not is_valid_payload(data):
         logging.error("Invalid data received. Missing 'plan' or 'source_event'.")
         return jsonify({"status": "error", "message": "Invalid data format"}), 400
 
-    all_received_plans.append(data)
+    with plans_lock:
+        record = store_plan(data)
+        compact_plan_log_if_needed()
 
     plan_title = data.get("plan", {}).get("plan_title", "N/A")
     event_id = data.get("source_event", {}).get("eventId", "N/A")
-    logging.info(f"New plan received and stored: '{plan_title}' for event {event_id}")
+    if record is None:
+        logging.info(f"Ignored duplicate or late partial plan for event {event_id}")
+    elif data.get("plan_status") == "cancelled":
+        logging.info(f"Plan generation cancelled for event {event_id}; partial plan removed")
+    elif data.get("plan_status") == "streaming":
+        logging.info(f"Partial plan stored: '{plan_title}' ({len(data['plan'].get('steps') or [])} steps) for event {event_id}")
+    else:
+        logging.info(f"New plan received and stored: '{plan_title}' for event {event_id}")
 
     return jsonify({"status": "success", "message": "Plan received and stored."})
 
 
+@app.route("/recommend/batch", methods=["POST"])
+def handle_recommendation_batch():
+    """
+    A bulk variant of `/recommend` that accepts NDJSON: one payload per line.
+
+    Valid lines are stored in order under a single lock acquisition; invalid
+    lines are reported back by line number (1-based) and do not fail the
+    rest of the batch.
+    """
+    accepted = 0
+    rejected = []
+    payloads = []
+    for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            rejected.append({"line": line_number, "message": "Not valid JSON"})
+            continue
+        if not is_valid_payload(data):
+            rejected.append({"line": line_number, "message": "Missing 'plan' or 'source_event'"})
+            continue
+        payloads.append(data)
+
+    with plans_lock:
+        for data in payloads:
+            if store_plan(data) is not None:
+                accepted += 1
+        compact_plan_log_if_needed()
+
+    logging.info(f"Batch received: {accepted} plans stored, {len(payloads) - accepted} ignored, {len(rejected)} rejected.")
+    return jsonify({"status": "success", "accepted": accepted, "ignored": len(payloads) - accepted, "rejected": rejected})
+
+
 @app.route("/get-all-plans", methods=["GET"])
 def get_all_plans():
     """
-    An endpoint for the dashboard frontend to fetch all received plans.
+    An endpoint for the dashboard frontend to fetch received plans.
+
+    Works as an incremental feed: `since` is the last sequence number the
+    client has already seen (default 0, i.e. everything) and the optional
+    `limit` caps how many plans are returned. Each page carries an ETag so an
+    unchanged poll is answered with 304 Not Modified and no body, and the
+    latest known sequence number is returned in the `X-Plan-Seq` header.
+    """
+    try:
+        since = max(int(request.args.get("since", 0)), 0)
+        limit = request.args.get("limit")
+        limit = max(int(limit), 1) if limit is not None else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "'since' and 'limit' must be integers"}), 400
+
+    with plans_lock:
+        plan_store.evict()
+        latest_seq = plan_store.latest_seq
+        etag = f"plans-{since}-{limit}-{latest_seq}-{plan_store.evicted_count}"
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            body = feed_body_cache.get(etag)
+            if body is None:
+                records = plan_store.since(since, limit)
+                body = "[" + ",".join(record.json for record in records) + "]"
+                feed_body_cache[etag] = body
+                if len(feed_body_cache) > FEED_CACHE_SIZE:
+                    feed_body_cache.popitem(last=False)
+            else:
+                feed_body_cache.move_to_end(etag)
+            response = Response(body, mimetype="application/json")
+
+    response.set_etag(etag)
+    response.headers["X-Plan-Seq"] = str(latest_seq)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/stream-plans", methods=["GET"])
+def stream_plans():
+    """
+    A Server-Sent Events endpoint that pushes each newly stored plan.
+
+    On connect the client first receives every plan after `since` (or after the
+    `Last-Event-ID` header the browser sends when it reconnects), then new
+    plans as `/recommend` accepts them. Comment heartbeats keep idle
+    connections open through proxies.
+    """
+    try:
+        since = int(request.headers.get("Last-Event-ID") or request.args.get("since", 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "'since' must be an integer"}), 400
+    since = max(since, 0)
+
+    subscriber = PlanSubscriber(STREAM_CLIENT_BUFFER)
+    with plans_lock:
+        # Registering and snapshotting the backlog under one lock guarantees
+        # the client sees every plan exactly once.
+        backlog = plan_store.since(since)
+        stream_subscribers.add(subscriber)
+    logging.info(f"Stream client connected from seq {since} ({len(stream_subscribers)} connected).")
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            for record in backlog:
+                yield format_sse(record.seq, record.json)
+            while not (subscriber.overflowed and subscriber.buffer.empty()):
+                try:
+                    seq, plan_json = subscriber.buffer.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(seq, plan_json)
+        finally:
+            with plans_lock:
+                stream_subscribers.discard(subscriber)
+            if subscriber.overflowed:
+                logging.warning("Stream client fell behind its buffer; closing so it resumes.")
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Serves the protocol layer's and the agent's metrics in the Prometheus
+    text format.
+    """
+    with plans_lock:
+        body = REGISTRY.render()
+    return Response(body + agent_metrics["text"], mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/metrics/push", methods=["POST"])
+def metrics_push():
+    """
+    An endpoint for the agent (main.py) to push its metrics, already rendered
+    in the Prometheus text format. The latest push replaces the previous one.
+    """
+    if (request.content_length or 0) > METRICS_PUSH_MAX_BYTES:
+        return jsonify({"status": "error", "message": "Metrics payload too large"}), 413
+    text = request.get_data(as_text=True)
+    if text and not text.endswith("\n"):
+        text += "\n"
+    agent_metrics["text"] = text
+    agent_metrics["pushed_at"] = time.time()
+    return jsonify({"status": "success"})
+
+
+@app.route("/ready", methods=["GET"])
+def readiness_probe():
+    """
+    A readiness probe: the server only answers once the plan store has been
+    rebuilt from the plan log, so reaching it at all means it is ready.
+    """
+    with plans_lock:
+        return jsonify({"ready": True, "plans": len(plan_store), "latest_seq": plan_store.latest_seq})
+
+
+@app.route("/plans", methods=["GET"])
+def query_plans():
+    """
+    An endpoint for operators to query stored plans through the store indexes.
+
+    Any combination of `eventId`, `dataType`, `severity` and `zone` may be
+    given (matched case-insensitively), e.g.
+    `/plans?dataType=traffic&severity=HIGH&zone=Silk Board Junction`.
+    `since` and `limit` page through the results as in `/get-all-plans`.
+    """
+    try:
+        since = max(int(request.args.get("since", 0)), 0)
+        limit = request.args.get("limit")
+        limit = max(int(limit), 1) if limit is not None else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "'since' and 'limit' must be integers"}), 400
+
+    filters = {field: request.args.get(field) for field in INDEXED_FIELDS}
+    with plans_lock:
+        plan_store.evict()
+        records = plan_store.query(since=since, limit=limit, **filters)
+        body = "[" + ",".join(record.json for record in records) + "]"
+    return Response(body, mimetype="application/json")
+
+
+@app.route("/plans/summary", methods=["GET"])
+def plans_summary():
+    """
+    An endpoint that reports how many plans are retained per indexed value.
     """
-    return jsonify(all_received_plans)
+    with plans_lock:
+        plan_store.evict()
+        return jsonify(
+            {
+                "retained": len(plan_store),
+                "latest_seq": plan_store.latest_seq,
+                "evicted": plan_store.evicted_count,
+                "by_field": plan_store.summary(),
+            }
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+"""
+Orders the agent's LLM work by severity and age, and paces it to the quota.
+
+`PriorityScheduler` is the queue in front of the agent workers (see
+`WorkerPool(queue=...)`). Events are served most severe first; ties, and
+events of different severity that have waited long enough, go by age: every
+`aging_seconds` of waiting raises an event one severity class, so a backlog
+of LOW events is delayed by a CRITICAL one but never starved. The effective
+priority, severity rank + wait / aging_seconds, orders two waiting events the
+same way at any moment, so it is a fixed heap key.
+
+Each event has a deadline, its `validity_period_minutes` after it was queued
+(counted from receipt, like plan validity, because replayed and generated
+events carry historical timestamps). With `deadline_from_timestamp=True` the
+validity also ends that long after the event's `timestamp`, whichever comes
+first, so a live event that was already stale on arrival (e.g. a backlog
+delivered after downtime) is not planned. An event popped past its
+deadline is flagged as expired so that the pool drops it or hands it to a
+cheaper handler. When the queue is full, an expired event is evicted first,
+otherwise the one with the lowest priority.
+
+`TokenBucket` enforces the LLM request quota, e.g. Vertex AI's requests per
+minute. When several calls wait for tokens, the most severe work is served
+first: the scheduler records the severity of the event a worker is handling
+(`current_priority()`), and `model.generate` acquires tokens with it.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from coalescer import SEVERITY_RANK
+from data_schema import VALID_SEVERITY_LEVELS, parse_timestamp, validity_seconds
+
+_task = threading.local()
+
+
+def current_priority() -> int:
+    """Returns the severity rank of the event the current worker is handling (0 if none)."""
+    return getattr(_task, "priority", 0)
+
+
+class TokenBucket:
+    """A token-bucket rate limiter whose waiters are served by priority."""
+
+    def __init__(self, rate_per_second: float, burst: float = 1, clock=time.monotonic):
+        """
+        Args:
+            rate_per_second (float): Tokens added per second.
+            burst (float): The most tokens that can accumulate.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = self.burst
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds_total = 0.0
+        self._updated = clock()
+        self._waiters = []  # heap of (-priority, sequence)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1, priority: int = 0, timeout: float = None) -> bool:
+        """
+        Takes tokens, waiting for them if needed.
+
+        Args:
+            tokens (float): The tokens needed, e.g. 1 per LLM request.
+            priority (int): Higher-priority waiters are served first.
+            timeout (float, optional): The longest to wait, in seconds.
+
+        Returns:
+            bool: True if the tokens were taken, False on timeout.
+        """
+        started = self.clock()
+        deadline = None if timeout is None else started + timeout
+        with self._condition:
+            self._refill(started)
+            if not self._waiters and self.tokens >= tokens:
+                self.tokens -= tokens
+                self.acquired += 1
+                return True
+            ticket = (-priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            self.throttled += 1
+            try:
+                while True:
+                    now = self.clock()
+                    self._refill(now)
+                    if self._waiters[0] == ticket and self.tokens >= tokens:
+                        self.tokens -= tokens
+                        self.acquired += 1
+                        self.wait_seconds_total += now - started
+                        return True
+                    if deadline is not None and now >= deadline:
+                        return False
+                    if self._waiters[0] == ticket:
+                        wait = max(0.001, (tokens - self.tokens) / self.rate_per_second)
+                    else:
+                        wait = None  # Woken when the waiter ahead is served.
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Returns tokens left, acquisitions and time spent throttled."""
+        with self._condition:
+            self._refill(self.clock())
+            return {
+                "rate_per_second": self.rate_per_second,
+                "tokens": self.tokens,
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "waiting": len(self._waiters),
+                "wait_seconds_total": self.wait_seconds_total,
+            }
+
+
+class PriorityScheduler:
+    """
+    A severity/age priority queue with validity deadlines, for `WorkerPool`.
+
+    Not thread-safe on its own: the pool calls it under its lock.
+    """
+
+    def __init__(
+        self,
+        event_fn=lambda item: item,
+        aging_seconds: float = 60.0,
+        observe_wait=None,
+        deadline_from_timestamp: bool = False,
+        clock=time.monotonic,
+        wall_clock=time.time,
+    ):
+        """
+        Args:
+            event_fn (callable): Returns the event of a queued item.
+            aging_seconds (float): Waiting this long raises an item by one
+                                   severity class. 0 orders by severity only
+                                   (then age within a class).
+            observe_wait (callable, optional): Called as
+                `observe_wait(severity, seconds)` for each item served, e.g.
+                with a labelled histogram.
+            deadline_from_timestamp (bool): Also end an item's validity
+                `validity_period_minutes` after its event's `timestamp`. Only
+                for live sources; historical events would all be expired.
+            clock (callable): Returns the current time in seconds. Must be the
+                              pool's clock (time.monotonic).
+            wall_clock (callable): Returns the current epoch time, against
+                                   which event timestamps are read.
+        """
+        self.event_fn = event_fn
+        self.aging_seconds = aging_seconds
+        self.observe_wait = observe_wait
+        self.deadline_from_timestamp = deadline_from_timestamp
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.expired = 0
+        self._heap = []  # (key, sequence, enqueued_at, deadline, severity, item)
+        self._sequence = itertools.count()
+        self._waits = {severity: [0, 0.0, 0.0] for severity in VALID_SEVERITY_LEVELS}  # count, total, max
+
+    def _key(self, rank: int, enqueued_at: float) -> float:
+        if self.aging_seconds > 0:
+            return enqueued_at / self.aging_seconds - rank
+        return -rank
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, enqueued_at: float, item):
+        """Queues an item; `enqueued_at` is the pool's monotonic submit time."""
+        event = self.event_fn(item)
+        severity = event.get("severity")
+        if severity not in SEVERITY_RANK:
+            severity = VALID_SEVERITY_LEVELS[0]
+        validity = validity_seconds(event)
+        deadline = enqueued_at + validity
+        if self.deadline_from_timestamp:
+            timestamp = parse_timestamp(event.get("timestamp"))
+            if not math.isnan(timestamp):
+                # The validity left now, moved onto the pool's clock. A re-queued
+                # item's enqueued_at is in the past, so it is not the base.
+                deadline = min(deadline, self.clock() + timestamp + validity - self.wall_clock())
+        # Equal keys (same severity, same instant) fall back to arrival order.
+        heapq.heappush(
+            self._heap,
+            (self._key(SEVERITY_RANK[severity], enqueued_at), next(self._sequence), enqueued_at, deadline, severity, item),
+        )
+
+    def pop(self) -> tuple:
+        """
+        Takes the highest-priority item.
+
+        Records its severity as the calling worker's `current_priority()`.
+
+        Returns:
+            tuple: (enqueued_at, item, expired), where `expired` is True if
+                   the item's deadline has passed.
+        """
+        _, _, enqueued_at, deadline, severity, item = heapq.heappop(self._heap)
+        now = self.clock()
+        expired = deadline <= now
+        if expired:
+            self.expired += 1
+        wait = now - enqueued_at
+        stats = self._waits[severity]
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+        if self.observe_wait is not None:
+            self.observe_wait(severity, wait)
+        _task.priority = SEVERITY_RANK[severity]
+        return enqueued_at, item, expired
+
+    def evict(self):
+        """Removes and returns an expired item if there is one, otherwise the lowest-priority item."""
+        now = self.clock()
+        index = next((i for i, entry in enumerate(self._heap) if entry[3] <= now), None)
+        if index is None:
+            index = max(range(len(self._heap)), key=lambda i: self._heap[i][:2])
+        item = self._heap[index][5]
+        self._heap[index] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        return item
+
+    def clear(self):
+        self._heap.clear()
+
+    def stats(self) -> dict:
+        """Returns queued counts and served wait times per severity class."""
+        queued = {severity: 0 for severity in VALID_SEVERITY_LEVELS}
+        for entry in self._heap:
+            queued[entry[4]] += 1
+        return {
+            "expired": self.expired,
+            "severity": {
+                severity: {
+                    "queued": queued[severity],
+                    "served": count,
+                    "avg_wait_ms": total / count * 1000 if count else 0.0,
+                    "max_wait_ms": longest * 1000,
+                }
+                for severity, (count, total, longest) in self._waits.items()
+            },
+        }
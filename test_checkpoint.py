@@ -0,0 +1,47 @@
+"""
+Regression tests for `checkpoint.EventCheckpoint`.
+
+Run with `python -m unittest test_checkpoint`.
+"""
+
+import unittest
+
+from checkpoint import EventCheckpoint, event_digest
+
+
+def make_event(severity):
+    return {"eventId": "evt_1", "dataType": "power_outage", "severity": severity}
+
+
+class ModifiedCopyInFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.checkpoint = EventCheckpoint("")
+        self.first, self.second = make_event("LOW"), make_event("HIGH")
+        self.assertTrue(self.checkpoint.admit(self.first))
+        # A modified copy arrives while the first one is being handled.
+        self.assertTrue(self.checkpoint.admit(self.second))
+
+    def test_handling_the_first_copy_does_not_mark_the_second(self):
+        self.checkpoint.mark_handled("evt_1", digest=event_digest(self.first))
+        self.assertFalse(self.checkpoint.admit(self.first))
+        # The second copy is still in flight, then released unhandled.
+        self.assertFalse(self.checkpoint.admit(self.second))
+        self.checkpoint.forget("evt_1", digest=event_digest(self.second))
+        self.assertTrue(self.checkpoint.admit(self.second))
+
+    def test_releasing_the_first_copy_keeps_the_second_pending(self):
+        self.checkpoint.forget("evt_1", digest=event_digest(self.first))
+        self.checkpoint.mark_handled("evt_1", digest=event_digest(self.second))
+        self.assertTrue(self.checkpoint.admit(self.first))
+        self.assertFalse(self.checkpoint.admit(self.second))
+
+    def test_without_a_digest_the_oldest_copy_is_marked(self):
+        self.checkpoint.mark_handled("evt_1")
+        self.checkpoint.forget("evt_1")
+        self.assertFalse(self.checkpoint.admit(self.first))
+        self.assertTrue(self.checkpoint.admit(self.second))
+        self.assertEqual(self.checkpoint.stats()["pending"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
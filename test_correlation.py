@@ -0,0 +1,91 @@
+"""
+Regression tests for `correlation.IncidentCorrelator`.
+
+Run with `python -m unittest test_correlation`.
+"""
+
+import unittest
+
+from correlation import IncidentCorrelator
+from data_schema import CAUSAL_LINKS, VALID_DATA_TYPES
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_event(event_id, data_type, minutes=10, caused_by=None, coordinates=None):
+    assert data_type in VALID_DATA_TYPES
+    event = {
+        "eventId": event_id,
+        "dataType": data_type,
+        "severity": "HIGH",
+        "validity_period_minutes": minutes,
+        "location": {"zone": "Koramangala", "coordinates": coordinates or {}},
+    }
+    if caused_by:
+        event["interdependencies"] = [{"eventId": caused_by, "relationship": "caused_by"}]
+    return event
+
+
+class CorrelatorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.correlator = IncidentCorrelator(radius_km=0, clock=self.clock)
+
+    def root_of(self, event_id):
+        return self.correlator.incident_of(event_id).root_event["eventId"]
+
+
+class ResentExpiredEventTest(CorrelatorTest):
+    def test_expired_event_rejoins_its_live_incident(self):
+        self.correlator.correlate(make_event("A", "weather", minutes=1))
+        incident = self.correlator.correlate(make_event("B", "power_outage", caused_by="A"))
+        self.clock.now = 120  # A expires, B keeps the incident alive.
+        self.assertIs(self.correlator.correlate(make_event("A", "weather", minutes=1)), incident)
+        self.assertEqual(set(incident.events), {"A", "B"})
+        self.assertEqual(self.correlator.stats()["incidents_started"], 2)
+
+    def test_expire_resend_expire(self):
+        self.correlator.correlate(make_event("A", "weather", minutes=1))
+        self.correlator.correlate(make_event("B", "power_outage", caused_by="A"))
+        self.clock.now = 120
+        self.correlator.correlate(make_event("A", "weather", minutes=1))
+        self.clock.now = 240  # A expires again; this used to raise KeyError.
+        incident = self.correlator.correlate(make_event("C", "traffic", caused_by="B"))
+        self.assertEqual(set(incident.events), {"B", "C"})
+        self.assertIsNone(self.correlator.incident_of("A"))
+        self.clock.now = 1200  # Everything expires.
+        self.correlator.correlate(make_event("D", "traffic", minutes=1))
+        self.assertEqual(self.correlator.stats()["incidents"], 1)
+
+
+class RerootingTest(CorrelatorTest):
+    def test_cause_arriving_after_its_effect_becomes_the_root(self):
+        self.assertIn(("power_outage", "caused_by"), CAUSAL_LINKS["weather"])
+        self.correlator.correlate(make_event("effect", "power_outage", caused_by="cause"))
+        self.assertEqual(self.root_of("effect"), "effect")
+        incident = self.correlator.correlate(make_event("cause", "weather"))
+        self.assertIs(self.correlator.incident_of("effect"), incident)
+        self.assertEqual(self.root_of("effect"), "cause")
+        self.assertEqual(set(incident.events), {"cause", "effect"})
+
+    def test_older_incident_leads_a_proximity_merge(self):
+        correlator = self.correlator = IncidentCorrelator(radius_km=1.0, clock=self.clock)
+        here = {"lat": 12.935, "lon": 77.624}
+        correlator.correlate(make_event("outage", "power_outage", coordinates=here))
+        correlator.correlate(make_event("metro", "public_transit_metro", coordinates={"lat": 12.936, "lon": 77.625}))
+        self.assertEqual(self.root_of("metro"), "outage")
+        # Unrelated dataTypes nearby stay apart.
+        correlator.correlate(make_event("market", "stock_market", coordinates=here))
+        self.assertEqual(self.root_of("market"), "market")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Regression tests for `delivery.PlanDelivery`'s spill file.
+
+Run with `python -m unittest test_delivery`.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from delivery import PlanDelivery
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return {"rejected": []}
+
+
+class RecordingSession:
+    """Stands in for `requests.Session`, recording the delivery_ids posted."""
+
+    def __init__(self):
+        self.delivered = []
+
+    def post(self, url, data, headers, timeout):
+        self.delivered += [json.loads(line)["delivery_id"] for line in data.decode("utf-8").splitlines()]
+        return FakeResponse()
+
+
+def write_payloads(path, delivery_ids):
+    with open(path, "w", encoding="utf-8") as f:
+        for delivery_id in delivery_ids:
+            f.write(json.dumps({"plan": {}, "source_event": {"eventId": delivery_id}, "delivery_id": delivery_id}) + "\n")
+
+
+class StaleSendingFileTest(unittest.TestCase):
+    def test_stale_sending_file_is_delivered_first(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "spill.jsonl")
+            # A crash mid re-send left these; newer plans were spilled since.
+            write_payloads(spill_path + ".sending", ["a", "b"])
+            write_payloads(spill_path, ["c"])
+            session = RecordingSession()
+            delivery = PlanDelivery("http://protocol/recommend/batch", spill_path=spill_path, session=session)
+            delivery.start()
+            delivery.stop()
+
+            self.assertEqual(session.delivered, ["a", "b", "c"])
+            self.assertFalse(os.path.exists(spill_path))
+            self.assertFalse(os.path.exists(spill_path + ".sending"))
+
+
+if __name__ == "__main__":
+    unittest.main()
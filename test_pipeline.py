@@ -0,0 +1,37 @@
+"""
+End-to-end regression tests for the agent pipeline, on the stub LLM backend.
+
+Run with `python -m unittest test_pipeline`.
+"""
+
+import contextlib
+import os
+import tempfile
+import unittest
+
+import bench_pipeline  # Configures the agent for a local run; import first.
+import plan_library
+
+
+class ProvisionalPlanTest(unittest.TestCase):
+    def test_no_provisional_plan_is_left_after_drain(self):
+        with tempfile.TemporaryDirectory() as directory:
+            library_path = os.path.join(directory, "plan_library.json")
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                plan_library.build_library(library_path)
+            os.environ["PLAN_LIBRARY_FILE"] = library_path
+            # Stories plus generated events, so correlation re-roots incidents.
+            events = bench_pipeline.load_stream(["static/*_events.json"], 500, seed=42)
+            results = bench_pipeline.run_pipeline(events, rate=0, timeout=120)
+
+        import main
+        import protocol
+
+        self.assertTrue(results["drained"])
+        self.assertEqual(main.provisional_plans, {})
+        streaming = [record for record in protocol.plan_store.since(0) if record.payload.get("plan_status") == "streaming"]
+        self.assertEqual(streaming, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
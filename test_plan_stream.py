@@ -0,0 +1,35 @@
+"""
+Regression tests for `plan_stream.PlanStreamParser`.
+
+Run with `python -m unittest test_plan_stream`.
+"""
+
+import unittest
+
+from plan_stream import PlanStreamParser
+
+
+def feed_in_chunks(text, size=7):
+    parser = PlanStreamParser()
+    updates = []
+    for start in range(0, len(text), size):
+        updates += parser.feed(text[start:start + size])
+    return parser, updates
+
+
+class MalformedStepsTest(unittest.TestCase):
+    def test_non_list_steps_are_skipped(self):
+        for steps in ("null", "3", '"none"', '{"action": "x"}'):
+            with self.subTest(steps=steps):
+                parser, updates = feed_in_chunks('{"plan_title": "Flood", "steps": ' + steps + ', "priority": "HIGH"}')
+                self.assertEqual(updates, [("plan_title", "Flood"), ("priority", "HIGH")])
+                self.assertNotIn("steps", parser.plan)
+
+    def test_steps_are_reported_one_by_one(self):
+        parser, updates = feed_in_chunks('```json\n{"plan_title": "Flood", "steps": [{"action_id": 1}, {"action_id": 2}]}')
+        self.assertEqual(updates, [("plan_title", "Flood"), ("step", {"action_id": 1}), ("step", {"action_id": 2})])
+        self.assertEqual(parser.plan["steps"], [{"action_id": 1}, {"action_id": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Regression tests for `scheduler.PriorityScheduler` deadlines.
+
+Run with `python -m unittest test_scheduler`.
+"""
+
+import unittest
+from datetime import datetime, timezone
+
+from scheduler import PriorityScheduler
+
+WALL_START = datetime(2026, 6, 1, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_event(event_id, timestamp, minutes=1):
+    return {
+        "eventId": event_id,
+        "dataType": "power_outage",
+        "severity": "HIGH",
+        "timestamp": timestamp,
+        "validity_period_minutes": minutes,
+    }
+
+
+def iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(100.0)
+        self.wall = FakeClock(WALL_START)
+
+    def scheduler(self, **kwargs):
+        return PriorityScheduler(clock=self.clock, wall_clock=self.wall, **kwargs)
+
+    def test_historical_event_is_not_expired_by_default(self):
+        scheduler = self.scheduler()
+        scheduler.push(self.clock(), make_event("old", "2025-01-01T00:00:00Z"))
+        _, item, expired = scheduler.pop()
+        self.assertEqual(item["eventId"], "old")
+        self.assertFalse(expired)
+
+    def test_stale_live_event_expires_with_timestamp_deadlines(self):
+        scheduler = self.scheduler(deadline_from_timestamp=True)
+        scheduler.push(self.clock(), make_event("stale", iso(self.wall() - 120)))
+        self.assertTrue(scheduler.pop()[2])
+
+    def test_requeued_item_keeps_its_remaining_validity(self):
+        scheduler = self.scheduler(deadline_from_timestamp=True)
+        enqueued_at = self.clock()
+        event = make_event("deferred", iso(self.wall()))
+        # Deferred for 30 s, then queued again with its first enqueue time.
+        self.clock.now += 30
+        self.wall.now += 30
+        scheduler.push(enqueued_at, event)
+        self.clock.now += 29
+        self.wall.now += 29
+        self.assertFalse(scheduler.pop()[2])
+        scheduler.push(enqueued_at, event)
+        self.clock.now += 2
+        self.wall.now += 2
+        self.assertTrue(scheduler.pop()[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
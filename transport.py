@@ -0,0 +1,374 @@
+"""
+Pluggable event transports between the data dispatcher and the agent.
+
+The dispatcher publishes events and the agent subscribes to them through
+whichever transport `create_transport()` selects, so the pipeline can run on
+one machine without cloud services:
+- firestore: the `live_urban_events` collection and its `on_snapshot`
+  listener (the production transport).
+- memory: an in-process bus, for running the dispatcher and the agent (or a
+  benchmark) in one process.
+- socket: NDJSON over a Unix domain socket, for a dispatcher and an agent in
+  separate processes on one machine. The subscriber listens on the socket,
+  so the agent has to be started first.
+
+Every transport keeps Firestore's change semantics. A subscriber's callback
+is called as `callback(documents, changes, read_time)`. Each change has a
+`.type.name` of "ADDED" for an eventId the transport has not seen before and
+"MODIFIED" for a re-published one, plus a `.document` with `.id`,
+`.to_dict()` and the `.update_time` it was published at. As with Firestore,
+a new subscriber is first sent the documents the transport already holds.
+The local transports remember the most recent `retain_documents` events for
+this.
+"""
+
+import enum
+import json
+import os
+import queue
+import socket
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import firestore_client
+
+TRANSPORT_NAMES = ("firestore", "memory", "socket")
+
+
+class ChangeType(enum.Enum):
+    """The kinds of document change a transport reports."""
+
+    ADDED = 1
+    MODIFIED = 2
+
+
+class EventDocument:
+    """A published event, shaped like a Firestore document snapshot."""
+
+    __slots__ = ("id", "update_time", "_data")
+
+    def __init__(self, event: dict, update_time: datetime):
+        self.id = event["eventId"]
+        self.update_time = update_time
+        self._data = event
+
+    @property
+    def exists(self) -> bool:
+        return True
+
+    def to_dict(self) -> dict:
+        """Returns the event. It is shared with other subscribers; do not modify it."""
+        return self._data
+
+
+class DocumentChange:
+    """One change to the event collection."""
+
+    __slots__ = ("type", "document")
+
+    def __init__(self, change_type: ChangeType, document: EventDocument):
+        self.type = change_type
+        self.document = document
+
+
+class EventTransport:
+    """The interface every transport implements."""
+
+    name = "base"
+
+    def connect(self):
+        """
+        Opens the transport ahead of first use.
+
+        Raises:
+            Exception: If the transport cannot be reached.
+        """
+
+    def is_ready(self) -> bool:
+        """True once the transport is connected."""
+        return True
+
+    def publish(self, events: list):
+        """
+        Publishes events, keyed by their eventId. Blocking is fine.
+
+        Args:
+            events (list): The events to publish, written as one batch.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, callback):
+        """
+        Calls `callback(documents, changes, read_time)` for published events.
+
+        Args:
+            callback (callable): The change listener; see the module docstring.
+
+        Returns:
+            A watch whose `unsubscribe()` stops the callbacks.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the transport's connections."""
+
+
+class FirestoreTransport(EventTransport):
+    """The `live_urban_events` Firestore collection."""
+
+    name = "firestore"
+
+    def __init__(self, collection: str = firestore_client.EVENT_COLLECTION):
+        """
+        Args:
+            collection (str): The Firestore collection holding the events.
+        """
+        self.collection = collection
+
+    def connect(self):
+        firestore_client.get_db()
+
+    def is_ready(self) -> bool:
+        return firestore_client.is_ready()
+
+    def publish(self, events: list):
+        db = firestore_client.get_db()
+        collection = db.collection(self.collection)
+        batch = db.batch()
+        for event in events:
+            batch.set(collection.document(event["eventId"]), event)
+        batch.commit()
+
+    def subscribe(self, callback):
+        return firestore_client.get_db().collection(self.collection).on_snapshot(callback)
+
+
+class _Subscription:
+    """Delivers queued change batches to one callback on its own thread."""
+
+    def __init__(self, transport, callback):
+        self.transport = transport
+        self.callback = callback
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="event-transport-subscriber", daemon=True)
+
+    def _run(self):
+        while True:
+            changes = self.queue.get()
+            if changes is None:
+                return
+            # Hand over everything that arrived meanwhile in one callback, as
+            # Firestore does for bursts of writes.
+            while True:
+                try:
+                    more = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self.queue.put(None)
+                    break
+                changes.extend(more)
+            try:
+                self.callback([change.document for change in changes], changes, datetime.now(timezone.utc))
+            except Exception as e:
+                print(f"TRANSPORT: Subscriber callback failed: {e}")
+
+    def unsubscribe(self):
+        """Stops delivering changes; changes still queued are dropped."""
+        self.transport._unsubscribe(self)
+        self.queue.put(None)
+
+
+class MemoryTransport(EventTransport):
+    """An in-process event bus with Firestore's ADDED/MODIFIED semantics."""
+
+    name = "memory"
+
+    def __init__(self, retain_documents: int = 100_000):
+        """
+        Args:
+            retain_documents (int): The most recent events kept to tell ADDED
+                                    from MODIFIED and to send to new
+                                    subscribers. An event re-published after
+                                    it was forgotten is reported as ADDED.
+        """
+        self.retain_documents = retain_documents
+        self.published = 0
+        self._documents = OrderedDict()  # eventId -> EventDocument
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def publish(self, events: list):
+        changes = []
+        update_time = datetime.now(timezone.utc)
+        with self._lock:
+            for event in events:
+                document = EventDocument(event, update_time)
+                change_type = ChangeType.MODIFIED if document.id in self._documents else ChangeType.ADDED
+                self._documents[document.id] = document
+                self._documents.move_to_end(document.id)
+                changes.append(DocumentChange(change_type, document))
+            while len(self._documents) > self.retain_documents:
+                self._documents.popitem(last=False)
+            self.published += len(changes)
+            if not changes:
+                return
+            for subscription in self._subscriptions:
+                subscription.queue.put(list(changes))
+
+    def subscribe(self, callback):
+        subscription = _Subscription(self, callback)
+        with self._lock:
+            existing = [DocumentChange(ChangeType.ADDED, document) for document in self._documents.values()]
+            if existing:
+                subscription.queue.put(existing)
+            self._subscriptions.append(subscription)
+        subscription.thread.start()
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def close(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.unsubscribe()
+
+
+class SocketTransport(EventTransport):
+    """
+    NDJSON events over a Unix domain socket.
+
+    The subscribing side listens on `path` from its first `subscribe()` and
+    feeds every line it receives into a `MemoryTransport`, which provides the
+    change semantics. The publishing side connects on first use and writes
+    one event per line; publishing fails while nobody is listening.
+    """
+
+    name = "socket"
+
+    def __init__(self, path: str = "/tmp/urban_events.sock", retain_documents: int = 100_000):
+        """
+        Args:
+            path (str): The socket file.
+            retain_documents (int): See `MemoryTransport`.
+        """
+        self.path = path
+        self._bus = MemoryTransport(retain_documents)
+        self._server = None
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _listen(self):
+        if self._server is not None:
+            return
+        if os.path.exists(self.path):
+            # A socket file left behind by an earlier run.
+            os.remove(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen()
+        self._server = server
+        threading.Thread(target=self._accept, name="event-socket-server", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return  # The server socket was closed.
+            threading.Thread(target=self._receive, args=(connection,), name="event-socket-reader", daemon=True).start()
+
+    def _receive(self, connection):
+        pending = b""
+        with connection:
+            while True:
+                try:
+                    data = connection.recv(1 << 16)
+                except OSError:
+                    return
+                if not data:
+                    return
+                *lines, pending = (pending + data).split(b"\n")
+                events = []
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError as e:
+                        print(f"TRANSPORT: Ignoring malformed event line: {e}")
+                        continue
+                    if isinstance(event, dict) and "eventId" in event:
+                        events.append(event)
+                    else:
+                        print("TRANSPORT: Ignoring an event line without an eventId.")
+                if events:
+                    self._bus.publish(events)
+
+    def publish(self, events: list):
+        body = "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+        with self._client_lock:
+            if self._client is None:
+                client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    client.connect(self.path)
+                except OSError:
+                    client.close()
+                    raise
+                self._client = client
+            try:
+                self._client.sendall(body)
+            except OSError:
+                # Reconnect on the next call.
+                self._client.close()
+                self._client = None
+                raise
+
+    def subscribe(self, callback):
+        self._listen()
+        return self._bus.subscribe(callback)
+
+    def close(self):
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self._bus.close()
+
+
+def create_transport(name: str = None) -> EventTransport:
+    """
+    Builds the transport selected by `name` or the EVENT_TRANSPORT variable.
+
+    The socket transport uses EVENT_SOCKET_PATH; the local transports keep
+    EVENT_RETAIN_DOCUMENTS recent events.
+
+    Args:
+        name (str, optional): One of TRANSPORT_NAMES. Defaults to "firestore".
+
+    Returns:
+        EventTransport: The configured transport.
+
+    Raises:
+        ValueError: If the transport name is unknown.
+    """
+    name = (name or os.getenv("EVENT_TRANSPORT", "firestore")).lower()
+    retain_documents = int(os.getenv("EVENT_RETAIN_DOCUMENTS", "100000"))
+
+    if name == "firestore":
+        return FirestoreTransport()
+    if name == "memory":
+        return MemoryTransport(retain_documents)
+    if name == "socket":
+        return SocketTransport(os.getenv("EVENT_SOCKET_PATH", "/tmp/urban_events.sock"), retain_documents)
+    raise ValueError(f"Unknown event transport '{name}'. Use one of {TRANSPORT_NAMES}.")
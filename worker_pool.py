@@ -0,0 +1,273 @@
+"""
+A bounded work queue served by a pool of worker threads.
+
+The Firestore listener hands events to this pool instead of running the
+agentic loop inline, so one slow Gemini call no longer stalls every later
+event or the listener thread itself. The queue is bounded; when it is full
+the configured overflow policy either drops a waiting item (the oldest, or
+whichever the queue chooses to evict) or rejects the new one. Queue depth,
+wait time and handling time are counted so operators can see when the pool
+needs more workers.
+
+The queue is FIFO by default. Any object with the interface of `FifoQueue`
+can replace it, e.g. `scheduler.PriorityScheduler`, which also flags items
+that waited past their deadline; those go to `expired_handler` instead of
+the handler, or are dropped. Dropped items are passed to `dropped_handler`,
+so their owner can release whatever it holds for them.
+"""
+
+import threading
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ("drop_oldest", "reject")
+
+
+class FifoQueue:
+    """The default first-in, first-out queue. The pool calls it under its lock."""
+
+    def __init__(self):
+        self._items = deque()
+
+    def __len__(self):
+        return len(self._items)
+
+    def push(self, enqueued_at: float, item):
+        self._items.append((enqueued_at, item))
+
+    def pop(self) -> tuple:
+        """Returns (enqueued_at, item, expired); FIFO items never expire."""
+        enqueued_at, item = self._items.popleft()
+        return enqueued_at, item, False
+
+    def evict(self):
+        """Drops the oldest item to make room and returns it."""
+        return self._items.popleft()[1]
+
+    def clear(self):
+        self._items.clear()
+
+
+class WorkerPool:
+    """A fixed number of threads consuming a bounded queue (FIFO by default)."""
+
+    def __init__(
+        self,
+        handler,
+        workers: int = 4,
+        queue_size: int = 100,
+        overflow: str = "drop_oldest",
+        name: str = "agent",
+        observe_wait=None,
+        queue=None,
+        expired_handler=None,
+        dropped_handler=None,
+    ):
+        """
+        Args:
+            handler (callable): Called with each submitted item on a worker
+                                thread. Exceptions are counted and logged.
+            workers (int): The number of worker threads.
+            queue_size (int): The maximum number of items waiting.
+            overflow (str): "drop_oldest" or "reject", applied when the queue
+                            is full. "drop_oldest" drops the item the queue
+                            evicts: the oldest for a FIFO queue.
+            name (str): A prefix for thread names and log lines.
+            observe_wait (callable, optional): Called with each item's queue
+                                               wait in seconds, e.g. a
+                                               histogram's `observe`.
+            queue (optional): The queue, e.g. a `scheduler.PriorityScheduler`.
+                              Defaults to a `FifoQueue`.
+            expired_handler (callable, optional): Called instead of `handler`
+                                                  with items the queue flags
+                                                  as expired. Without it they
+                                                  are dropped.
+            dropped_handler (callable, optional): Called with each item
+                                                  dropped from the queue:
+                                                  evicted when it is full, or
+                                                  expired without an
+                                                  `expired_handler`.
+
+        Raises:
+            ValueError: If `overflow` is not a known policy.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Use one of {OVERFLOW_POLICIES}.")
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.name = name
+        self.observe_wait = observe_wait
+        self.expired_handler = expired_handler
+        self.dropped_handler = dropped_handler
+        self._queue = queue if queue is not None else FifoQueue()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._busy = 0
+        self._counters = {
+            "submitted": 0,
+            "processed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "expired": 0,
+            "max_depth": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "handle_seconds_total": 0.0,
+            "handle_seconds_max": 0.0,
+        }
+
+    def start(self):
+        """Starts the worker threads."""
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"{self.name}-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item, enqueued_at: float = None) -> bool:
+        """
+        Queues an item for the workers without blocking the caller.
+
+        Args:
+            item: Passed to the handler as-is.
+            enqueued_at (float, optional): When the item was first queued
+                (time.monotonic), for an item that is queued again, so its
+                wait, priority and deadline count from then. Defaults to now.
+
+        Returns:
+            bool: False if the item was rejected because the queue is full.
+        """
+        dropped = None
+        with self._condition:
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "reject":
+                    self._counters["rejected"] += 1
+                    return False
+                dropped = self._queue.evict()
+                self._counters["dropped"] += 1
+            self._queue.push(time.monotonic() if enqueued_at is None else enqueued_at, item)
+            self._counters["submitted"] += 1
+            self._counters["max_depth"] = max(self._counters["max_depth"], len(self._queue))
+            self._condition.notify()
+        if dropped is not None:
+            self._drop(dropped)
+        return True
+
+    def _drop(self, item):
+        if self.dropped_handler is None:
+            return
+        try:
+            self.dropped_handler(item)
+        except Exception as e:
+            print(f"{self.name.upper()}-POOL: Dropped-item handler failed: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                enqueued_at, item, expired = self._queue.pop()
+                dropped = expired and self.expired_handler is None
+                if expired:
+                    self._counters["expired"] += 1
+                if dropped:
+                    self._counters["dropped"] += 1
+                    self._condition.notify_all()
+                else:
+                    self._busy += 1
+            if dropped:
+                self._drop(item)
+                continue
+
+            started = time.monotonic()
+            if self.observe_wait is not None:
+                self.observe_wait(started - enqueued_at)
+            failed = False
+            try:
+                (self.expired_handler if expired else self.handler)(item)
+            except Exception as e:
+                failed = True
+                print(f"{self.name.upper()}-POOL: Handler failed: {e}")
+            finished = time.monotonic()
+
+            with self._condition:
+                self._busy -= 1
+                counters = self._counters
+                counters["failed" if failed else "processed"] += 1
+                wait = started - enqueued_at
+                handle = finished - started
+                counters["wait_seconds_total"] += wait
+                counters["wait_seconds_max"] = max(counters["wait_seconds_max"], wait)
+                counters["handle_seconds_total"] += handle
+                counters["handle_seconds_max"] = max(counters["handle_seconds_max"], handle)
+                self._condition.notify_all()
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Waits until the queue is empty and no worker is busy.
+
+        Returns:
+            bool: True if the pool went idle before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stop(self, drain: bool = True, timeout: float = None):
+        """
+        Stops the workers.
+
+        Args:
+            drain (bool): Process the items still queued first; otherwise they
+                          are discarded (and counted as dropped).
+            timeout (float, optional): How long to wait for each worker.
+        """
+        with self._condition:
+            if not drain:
+                self._counters["dropped"] += len(self._queue)
+                self._queue.clear()
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def queue_stats(self) -> dict:
+        """Returns the queue's own statistics, if it keeps any."""
+        with self._condition:
+            return self._queue.stats() if hasattr(self._queue, "stats") else {}
+
+    def stats(self) -> dict:
+        """Returns queue depth, drop/reject counts and wait/handle latencies."""
+        with self._condition:
+            counters = dict(self._counters)
+            depth = len(self._queue)
+            busy = self._busy
+        done = counters["processed"] + counters["failed"]
+        return {
+            "workers": self.workers,
+            "busy": busy,
+            "queue_depth": depth,
+            "max_queue_depth": counters["max_depth"],
+            "submitted": counters["submitted"],
+            "processed": counters["processed"],
+            "failed": counters["failed"],
+            "dropped": counters["dropped"],
+            "rejected": counters["rejected"],
+            "expired": counters["expired"],
+            "avg_wait_ms": counters["wait_seconds_total"] / done * 1000 if done else 0.0,
+            "max_wait_ms": counters["wait_seconds_max"] * 1000,
+            "avg_handle_ms": counters["handle_seconds_total"] / done * 1000 if done else 0.0,
+            "max_handle_ms": counters["handle_seconds_max"] * 1000,
+        }